@@ -1,16 +1,255 @@
 import streamlit as st
 import json
+import logging
 import pandas as pd
+import numpy as np
+import atexit
+import base64
+import binascii
+import bisect
+import concurrent.futures
+import contextlib
+import copy
+import csv
+import functools
+import gzip
+import hashlib
+import heapq
+import hmac
+import importlib.util
+import io
+import itertools
 import os
+import queue
+import random
+import re
+import secrets
+import shutil
+import sqlite3
+import tempfile
+import threading
 import time
+import uuid
+
+try:
+    import fcntl # Advisory file locks; not available on Windows
+except ImportError:
+    fcntl = None
 
 # --- Configuration ---
 QUESTIONS_FILE = "questions_sample.json"
+QUESTIONS_DIR = "questions" # Sharded question bank: one file per quiz plus a manifest
+QUESTIONS_MANIFEST = os.path.join(QUESTIONS_DIR, "manifest.json")
+QUIZ_SETTINGS_FILE = "quiz_settings.json" # Per-quiz question draw settings of the JSON backends (see Question Pools)
 USERS_FILE = "users.json"
 USER_PROGRESS_FILE = "user_progress.json"
+USER_PROGRESS_JOURNAL = "user_progress.journal.jsonl"
+ATTEMPTS_FILE = "attempts.jsonl" # Append-only attempt history: one immutable record per completed quiz attempt
+PROGRESS_PERSISTENCE = "journal" # "journal" appends one record per change, "snapshot" rewrites the whole file
+PROGRESS_JOURNAL_COMPACT_BYTES = 1_000_000 # Fold the journal back into the snapshot once it grows past this size
+PROGRESS_WRITE_BEHIND = True # Persist progress changes in batches on a background writer thread (see ProgressWriter)
+PROGRESS_FLUSH_INTERVAL_SECONDS = 0.05 # How long the writer gathers changes before one combined flush
+PROGRESS_WRITE_QUEUE_SIZE = 10_000 # Pending changes allowed before submitting sessions wait for the writer
+PROGRESS_WRITE_TIMEOUT_SECONDS = 30
+STORAGE_BACKEND = "json" # "json" for the flat files above, "sqlite" for SQLITE_DB_FILE (see manage.py import-json)
+SQLITE_DB_FILE = "nai.sqlite3"
+DATA_REVALIDATE_SECONDS = 2.0 # How often the shared data store checks files for outside changes
+QUESTIONS_PAGE_SIZE_OPTIONS = [10, 25, 50, 100] # Page sizes offered in the admin question list
+QUESTIONS_PAGE_SIZE = 25
+QUESTION_SEARCH_RESULTS = 50 # Matches listed by the Manage Questions search
+DUPLICATE_SIMILARITY = 0.7 # Estimated shingle overlap (Jaccard) at which questions count as near-duplicates
+DUPLICATE_MINHASH_BANDS = 16 # LSH bands x rows = MinHash values per question; 16 x 4 finds ~99% of pairs at 0.7 similarity
+DUPLICATE_MINHASH_ROWS = 4
+DUPLICATE_BUCKET_LIMIT = 500 # Batch scans skip LSH buckets larger than this: they hold questions sharing boilerplate, not duplicates
+PERFORMANCE_PAGE_SIZE = 100 # Rows per page in the View Trainee Performance tables
+LEADERBOARD_SIZE = 10 # Students listed on each leaderboard (ties at the cut-off are counted, not listed)
+LEADERBOARD_CHUNK_ENTRIES = 1000 # Leaderboard entries per sorted chunk; a result update shifts one chunk, not the whole board
+EXPORT_CHUNK_ROWS = 5000 # Rows streamed per chunk when exporting performance data
+EXPORT_SPOOL_BYTES = 8 * 1024 * 1024 # Exports larger than this are spooled to a temp file on disk
+PASSWORD_HASH_SCHEME = "scrypt" # "scrypt" or "pbkdf2_sha256"; tune the costs below with benchmarks/kdf_benchmark.py
+PASSWORD_SCRYPT_N = 2 ** 14 # scrypt CPU/memory cost (uses 128 * n * r bytes per hash)
+PASSWORD_SCRYPT_R = 8
+PASSWORD_SCRYPT_P = 1
+PASSWORD_PBKDF2_ITERATIONS = 600_000
+PASSWORD_WORKERS = min(4, os.cpu_count() or 1) # Password hashes computed at once, however many people log in together
+PASSWORD_VERIFY_TIMEOUT_SECONDS = 30
+CHECKPOINTS_DIR = "checkpoints" # Answers of quizzes in progress, so they can be resumed (see QuizCheckpoints)
+CHECKPOINT_TTL_SECONDS = 7 * 24 * 3600 # Unfinished quizzes untouched for this long are no longer offered for resume
+CHECKPOINT_GC_INTERVAL_SECONDS = 3600
+METRICS_ENABLED = False # Record per-stage timings and I/O (see the Instrumentation section)
+METRICS_FILE = "metrics.prom" # Prometheus text-format export, e.g. for node_exporter's textfile collector
+METRICS_EXPORT_SECONDS = 15.0
+
+logger = logging.getLogger(__name__)
+
+# --- Instrumentation ---
+# Opt-in (METRICS_ENABLED) timing of reruns, pages and file helpers. Each stage records a call count,
+# a wall-time histogram and the bytes its file helpers read and wrote (nested stages roll their bytes
+# up into the enclosing one). Metrics are kept per server process, written to METRICS_FILE in the
+# Prometheus text format every METRICS_EXPORT_SECONDS by a background thread, and shown on the hidden admin Diagnostics
+# page (open the app with ?diagnostics in the URL). When disabled, every hook returns immediately.
+METRICS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0) # Histogram upper bounds, in seconds
+_metrics_local = threading.local() # Per-thread stack of the stages being timed
+
+class Metrics:
+    """Process-wide per-stage call counts, wall-time histograms and I/O byte totals.
+
+    A daemon thread writes METRICS_FILE every METRICS_EXPORT_SECONDS (and once more at exit) when
+    anything changed, so an export never runs, or fails, inside a stage being measured.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._changed = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def observe(self, stage, seconds, read_bytes=0, written_bytes=0):
+        with self._lock:
+            totals = self._stages.get(stage)
+            if totals is None:
+                totals = self._stages[stage] = {"count": 0, "seconds": 0.0, "buckets": [0] * (len(METRICS_BUCKETS) + 1), "read_bytes": 0, "written_bytes": 0}
+            totals["count"] += 1
+            totals["seconds"] += seconds
+            totals["buckets"][bisect.bisect_left(METRICS_BUCKETS, seconds)] += 1
+            totals["read_bytes"] += read_bytes
+            totals["written_bytes"] += written_bytes
+            self._changed = True
+
+    def _run(self):
+        while not self._stop.wait(METRICS_EXPORT_SECONDS):
+            self._export_changes()
+        self._export_changes()
+
+    def _export_changes(self):
+        with self._lock:
+            changed, self._changed = self._changed, False
+        if changed:
+            self.export()
+
+    def close(self):
+        """Stops the exporter thread after a final export."""
+        self._stop.set()
+        self._thread.join(timeout=METRICS_EXPORT_SECONDS)
+
+    def snapshot(self):
+        """Returns a copy of the per-stage totals."""
+        with self._lock:
+            return {stage: dict(totals, buckets=list(totals["buckets"])) for stage, totals in self._stages.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+    def prometheus_text(self):
+        """Renders the metrics in the Prometheus text exposition format."""
+        stages = [(stage.replace("\\", "\\\\").replace('"', '\\"'), totals) for stage, totals in sorted(self.snapshot().items())]
+        lines = ["# HELP nai_stage_seconds Wall time spent per stage.", "# TYPE nai_stage_seconds histogram"]
+        for label, totals in stages:
+            cumulative = 0
+            for bound, count in zip(METRICS_BUCKETS + (float("inf"),), totals["buckets"]):
+                cumulative += count
+                lines.append(f'nai_stage_seconds_bucket{{stage="{label}",le="{"+Inf" if bound == float("inf") else bound}"}} {cumulative}')
+            lines.append(f'nai_stage_seconds_sum{{stage="{label}"}} {totals["seconds"]:.6f}')
+            lines.append(f'nai_stage_seconds_count{{stage="{label}"}} {totals["count"]}')
+        for metric, key, help_text in (
+            ("nai_stage_read_bytes_total", "read_bytes", "Bytes read from data files per stage."),
+            ("nai_stage_written_bytes_total", "written_bytes", "Bytes written to data files per stage."),
+        ):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            lines += [f'{metric}{{stage="{label}"}} {totals[key]}' for label, totals in stages]
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        """Atomically writes METRICS_FILE, so a node exporter textfile collector never reads a partial file.
+
+        Metrics are best effort: a failed write is logged and returns False instead of raising.
+        """
+        try:
+            write_file_atomic(METRICS_FILE, lambda f: f.write(self.prometheus_text()))
+        except OSError as exc:
+            logger.warning("Couldn't export metrics to %s: %s", METRICS_FILE, exc)
+            return False
+        return True
+
+@st.cache_resource
+def get_metrics():
+    """Returns the Metrics shared by every session of this server process."""
+    return Metrics()
+
+def histogram_percentile(buckets, fraction):
+    """Estimates a percentile (in seconds) as the upper bound of the histogram bucket that contains it."""
+    target = fraction * sum(buckets)
+    cumulative = 0
+    for bound, count in zip(METRICS_BUCKETS + (float("inf"),), buckets):
+        cumulative += count
+        if count and cumulative >= target:
+            return bound
+    return 0.0
+
+class _StageTimer:
+    """Times one stage and collects the bytes counted by count_io() while it runs."""
+    __slots__ = ("stage", "started", "read_bytes", "written_bytes")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        stack = getattr(_metrics_local, "stack", None)
+        if stack is None:
+            stack = _metrics_local.stack = []
+        stack.append(self)
+        self.read_bytes = self.written_bytes = 0
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.started
+        stack = _metrics_local.stack
+        stack.pop()
+        if stack: # Nested stage: its I/O also counts towards the enclosing stage
+            stack[-1].read_bytes += self.read_bytes
+            stack[-1].written_bytes += self.written_bytes
+        get_metrics().observe(self.stage, seconds, self.read_bytes, self.written_bytes)
+        return False
+
+def measure(stage):
+    """Context manager that records the enclosed block as stage."""
+    return _StageTimer(stage) if METRICS_ENABLED else contextlib.nullcontext()
+
+def instrumented(stage=None):
+    """Decorator that records every call of the function as stage (default: the function's name)."""
+    def decorator(func):
+        name = stage or func.__name__
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not METRICS_ENABLED:
+                return func(*args, **kwargs)
+            with _StageTimer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count_io(read_bytes=0, written_bytes=0):
+    """Adds file bytes read/written to the innermost stage being timed on this thread."""
+    if METRICS_ENABLED:
+        stack = getattr(_metrics_local, "stack", None)
+        if stack:
+            stack[-1].read_bytes += read_bytes
+            stack[-1].written_bytes += written_bytes
 
 # --- Custom CSS for a Clean, Modern, and Professional Professional Look with Theme Support ---
-def apply_custom_css(theme):
+# Both theme stylesheets are compiled once per process: minified, content-hashed and written to
+# static/, which Streamlit serves at app/static/ when server.enableStaticServing is on (see
+# .streamlit/config.toml). Each rerun then only sends a <link> to the current theme's sheet, and
+# the theme toggle swaps that reference. Without static serving the minified CSS is inlined.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+def theme_stylesheet(theme):
+    """Returns the full (unminified) stylesheet for the "light" or "dark" theme."""
     # Define CSS variables for both light and dark themes
     # These variables will be used throughout the CSS for consistent styling
     light_theme_vars = """
@@ -43,8 +282,7 @@ def apply_custom_css(theme):
         --info-bg: #2A5A6A; --info-text: #BBDEFB; --info-border: #1976D2;
     """
 
-    st.markdown(f"""
-        <style>
+    return f"""
             @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;600;700&family=Poppins:wght@400;600;700&display=swap');
 
             /* Apply selected theme variables */
@@ -205,147 +443,3087 @@ def apply_custom_css(theme):
                 border-radius: 50%;
             }}
 
-            /* Expander (for admin section) */
-            .streamlit-expanderHeader {{
-                background-color: var(--accent-light);
-                border-radius: var(--border-radius);
-                padding: 0.9rem 1.8rem; /* More padding */
-                font-weight: 600;
-                color: var(--primary-color);
-                border: none;
-                box-shadow: var(--shadow);
-                transition: all 0.2s ease-in-out;
-            }}
-            .streamlit-expanderHeader:hover {{
-                filter: brightness(1.1); /* Slightly brighter on hover */
-                transform: translateY(-2px);
-            }}
+            /* Expander (for admin section) */
+            .streamlit-expanderHeader {{
+                background-color: var(--accent-light);
+                border-radius: var(--border-radius);
+                padding: 0.9rem 1.8rem; /* More padding */
+                font-weight: 600;
+                color: var(--primary-color);
+                border: none;
+                box-shadow: var(--shadow);
+                transition: all 0.2s ease-in-out;
+            }}
+            .streamlit-expanderHeader:hover {{
+                filter: brightness(1.1); /* Slightly brighter on hover */
+                transform: translateY(-2px);
+            }}
+
+            /* Sidebar styling */
+            .stSidebar > div:first-child {{
+                background-color: var(--card-background); /* Sidebar uses card background */
+                padding: 2.5rem 2rem; /* More padding */
+                box-shadow: var(--shadow);
+                border-radius: var(--border-radius);
+                transition: background-color 0.4s ease, box-shadow 0.4s ease;
+            }}
+            .stSidebar .stButton > button {{
+                width: 100%;
+                margin-bottom: 0.75rem; /* More space between sidebar buttons */
+            }}
+
+            /* Metrics */
+            [data-testid="stMetric"] {{
+                background-color: var(--card-background);
+                padding: 1.5rem; /* More padding */
+                border-radius: var(--border-radius);
+                box-shadow: var(--shadow);
+                text-align: center;
+                margin-bottom: 1.5rem;
+            }}
+            [data-testid="stMetric"] > div > div:first-child {{
+                color: var(--secondary-color);
+                font-size: 1rem; /* Slightly larger label */
+            }}
+            [data-testid="stMetric"] > div > div:last-child {{
+                color: var(--primary-color);
+                font-size: 2.2rem; /* Larger value */
+                font-weight: 700;
+            }}
+
+            /* Success/Error/Info messages */
+            .stAlert {{
+                border-radius: var(--border-radius);
+                padding: 1.2rem; /* More padding */
+                margin-bottom: 1.2rem;
+                font-size: 1.05rem; /* Slightly larger text */
+            }}
+            .stAlert.success {{
+                background-color: var(--success-bg);
+                color: var(--success-text);
+                border-color: var(--success-border);
+            }}
+            .stAlert.error {{
+                background-color: var(--error-bg);
+                color: var(--error-text);
+                border-color: var(--error-border);
+            }}
+            .stAlert.info {{
+                background-color: var(--info-bg);
+                color: var(--info-text);
+                border-color: var(--info-border);
+            }}
+
+            /* Logo Container (for login page) */
+            .logo-container {{
+                text-align: center;
+                margin-bottom: 2.5rem; /* More margin below logo */
+                padding-bottom: 1.5rem;
+                border-bottom: 1px solid var(--border-color); /* Use dynamic border color */
+            }}
+            /* Fixed button container at the bottom for quiz */
+            .fixed-bottom-buttons {{
+                position: fixed;
+                bottom: 0;
+                left: 0;
+                right: 0;
+                width: 100%;
+                background-color: var(--card-background); /* Match card background */
+                padding: 1rem 2rem;
+                box-shadow: rgba(0, 0, 0, 0.2) 0px -5px 15px -3px; /* Shadow above buttons */
+                display: flex;
+                justify-content: flex-end; /* Align to the right */
+                gap: 1rem; /* Space between buttons */
+                z-index: 1000; /* Ensure buttons are on top */
+                border-top-left-radius: var(--border-radius);
+                border-top-right-radius: var(--border-radius);
+            }}
+            .fixed-bottom-buttons .stButton {{
+                flex-grow: 0; /* Prevent buttons from growing */
+                flex-shrink: 0; /* Prevent buttons from shrinking */
+                width: auto; /* Allow button width to be determined by content + padding */
+            }}
+            .fixed-bottom-buttons .stButton > button {{
+                width: auto; /* Make buttons fill their flex container */
+                min-width: 180px; /* Ensure a minimum width for better appearance */
+            }}
+
+            /* Adjust main content padding when fixed buttons are present */
+            .main {{
+                padding-bottom: 6rem; /* Add padding to main content to prevent overlap with fixed buttons */
+            }}
+
+            /* Hide the internal Streamlit buttons that are triggered by custom HTML */
+            /* Targeting the container div of the button by its data-testid */
+            [data-testid="stButton-submit_answer_internal_btn"],
+            [data-testid="stButton-next_question_internal_btn"] {{
+                display: none !important;
+            }}
+            /* Hide the internal submit/next/finish button that is triggered by custom HTML */
+            [data-testid="stButton-next_question_submit_quiz_internal_btn"] {{
+                display: none !important;
+            }}
+    """
+
+def minify_css(css):
+    """Strips comments and insignificant whitespace from a stylesheet."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+@st.cache_resource
+def compile_theme_stylesheets():
+    """Minifies both themes and writes them to static/ under content-hashed names.
+
+    Returns {theme: {"css": minified CSS, "href": URL of the static file, or None if it couldn't be written}}.
+    """
+    sheets = {}
+    for theme in ("light", "dark"):
+        css = minify_css(theme_stylesheet(theme))
+        filename = f"theme-{theme}.{hashlib.sha256(css.encode('utf-8')).hexdigest()[:12]}.css"
+        href = None
+        try:
+            os.makedirs(STATIC_DIR, exist_ok=True)
+            path = os.path.join(STATIC_DIR, filename)
+            if not os.path.exists(path):
+                write_file_atomic(path, lambda f: f.write(css))
+            for stale in os.listdir(STATIC_DIR): # Sheets left behind by earlier versions of the CSS
+                if stale.startswith(f"theme-{theme}.") and stale.endswith(".css") and stale != filename:
+                    with contextlib.suppress(OSError):
+                        os.remove(os.path.join(STATIC_DIR, stale))
+            href = f"app/static/{filename}"
+        except OSError:
+            pass # Read-only deployment: fall back to inlining the CSS
+        sheets[theme] = {"css": css, "href": href}
+    return sheets
+
+@instrumented()
+def apply_custom_css(theme):
+    """Links (or, without static file serving, inlines) the compiled stylesheet for theme."""
+    sheet = compile_theme_stylesheets()[theme]
+    if sheet["href"] and st.get_option("server.enableStaticServing"):
+        st.markdown(f'<link rel="stylesheet" href="{sheet["href"]}">', unsafe_allow_html=True)
+    else:
+        st.markdown(f"<style>{sheet['css']}</style>", unsafe_allow_html=True)
+
+# --- Helper Functions for JSON files ---
+@instrumented()
+def load_json_file(filepath, default_content={}):
+    """Loads data from a JSON file, creating it with default content if it doesn't exist."""
+    if not os.path.exists(filepath):
+        with file_lock(filepath):
+            if not os.path.exists(filepath):
+                write_json_atomic(filepath, default_content)
+                return default_content
+    with open(filepath, "r") as f:
+        data = json.load(f)
+        count_io(read_bytes=f.tell())
+        return data
+
+def write_file_atomic(filepath, write, binary=False):
+    """Calls write(f) on a temp file next to filepath, fsyncs it and swaps it in, so readers never see a partial file.
+
+    The temp file is removed if anything fails. binary=True opens it in binary mode, otherwise as UTF-8 text.
+    """
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(filepath) + ".", suffix=".tmp", dir=os.path.dirname(os.path.abspath(filepath)))
+    try:
+        with os.fdopen(fd, "wb") if binary else os.fdopen(fd, "w", encoding="utf-8") as f:
+            write(f)
+            count_io(written_bytes=f.tell())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, filepath)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temp_path)
+        raise
+
+def write_json_atomic(filepath, data, compact=False):
+    """Atomically writes data to a JSON file (see write_file_atomic)."""
+    if compact:
+        write_file_atomic(filepath, lambda f: json.dump(data, f, separators=(",", ":")))
+    else:
+        write_file_atomic(filepath, lambda f: json.dump(data, f, indent=2))
+
+def append_jsonl(filepath, records):
+    """Appends records to a JSON Lines file in one write and fsyncs it before returning.
+
+    If the file ends in a record torn by a failed or interrupted append, a newline is written
+    first, so the new records start on their own line and readers only skip the torn one.
+    """
+    with open(filepath, "ab+") as f:
+        lines = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records).encode("utf-8")
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                lines = b"\n" + lines
+        f.write(lines)
+        count_io(written_bytes=len(lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+@instrumented()
+def save_json_file(filepath, data, compact=False):
+    """Atomically saves data to a JSON file and refreshes the shared in-memory copy.
+
+    compact=True drops indentation, which matters for the large progress file.
+    """
+    with file_lock(filepath):
+        write_json_atomic(filepath, data, compact)
+        get_data_store().refresh(filepath, data)
+
+def update_json_file(filepath, loader, mutate, watch_paths=()):
+    """Read-modify-write of a shared data file, serialised by the file's lock.
+
+    The shared copy is re-validated against the file on disk while the lock is held, so changes
+    written by another process since our last read are merged in instead of being overwritten.
+    mutate(data) edits a private shallow copy, which replaces the shared one only once it is saved:
+    other sessions never see unsaved changes or a dict changing while they iterate it. The copy
+    shares everything below the top level with the saved data, so a mutator may add, replace or
+    remove top-level entries but must copy a nested container before editing it.
+    Returns whatever mutate(data) returns.
+    """
+    with file_lock(filepath):
+        data = copy.copy(get_data_store().read(filepath, loader, watch_paths, revalidate=True))
+        result = mutate(data)
+        save_json_file(filepath, data)
+    return result
+
+class _FileLock:
+    """Re-entrant lock for one data file: a thread lock within this process plus an flock across processes."""
+
+    def __init__(self, filepath):
+        self._thread_lock = threading.RLock()
+        self._lock_path = filepath + ".lock"
+        self._depth = 0
+        self._lock_file = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        self._depth += 1
+        if self._depth == 1 and fcntl is not None:
+            try:
+                self._lock_file = open(self._lock_path, "a")
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                self._release()
+                raise
+        return self
+
+    def __exit__(self, *exc_info):
+        self._release()
+
+    def _release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._lock_file is not None:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+        self._thread_lock.release()
+
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+def file_lock(filepath):
+    """Returns the advisory lock that serialises all writers of filepath."""
+    with _file_locks_guard:
+        if filepath not in _file_locks:
+            _file_locks[filepath] = _FileLock(filepath)
+        return _file_locks[filepath]
+
+def file_signature(filepath):
+    """Returns a cheap (mtime, size) fingerprint of a file, or None if it doesn't exist."""
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+# --- Process-wide Shared Data Store ---
+class SharedDataStore:
+    """Keeps one parsed copy of every data file for all sessions of this process.
+
+    Entries are re-validated against the file's (mtime, size) signature at most once
+    every DATA_REVALIDATE_SECONDS, so ordinary reruns do no disk I/O at all. Writes
+    made through save_json_file refresh the entry directly and bump the version counter.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = {}  # filepath -> {"data", "paths", "signature", "checked_at"}
+        self._load_counts = {}  # filepath -> number of times it was (re)loaded from disk
+        self.version = 0
+
+    @staticmethod
+    def _signature(paths):
+        return tuple(file_signature(path) for path in paths)
+
+    def read(self, filepath, loader, watch_paths=(), revalidate=False):
+        """Returns the cached data for filepath, calling loader() only when the file changed.
+
+        watch_paths lists extra files (such as a journal) whose changes also invalidate the entry.
+        revalidate=True skips the DATA_REVALIDATE_SECONDS grace period, as writers must.
+        """
+        with self._lock:
+            entry = self._entries.get(filepath)
+            now = time.monotonic()
+            if entry is not None and not revalidate and now - entry["checked_at"] < DATA_REVALIDATE_SECONDS:
+                return entry["data"]
+            paths = (filepath,) + tuple(watch_paths)
+            signature = self._signature(paths)
+            if entry is not None and entry["signature"] == signature:
+                entry["checked_at"] = now
+                return entry["data"]
+        # Load without holding the store lock (loaders may take file locks). The signature was taken
+        # before loading, so a file that changes mid-load is simply picked up by the next check.
+        data = loader()
+        with self._lock:
+            current = self._entries.get(filepath)
+            if current is not entry:
+                return current["data"] # Another thread refreshed the entry while we were loading
+            self._entries[filepath] = {"data": data, "paths": paths, "signature": signature, "checked_at": now}
+            self._load_counts[filepath] = self._load_counts.get(filepath, 0) + 1
+            self.version += 1
+            return data
+
+    def load_count(self, filepath):
+        """Returns how often filepath was loaded from disk; writes made through refresh() don't count."""
+        with self._lock:
+            return self._load_counts.get(filepath, 0)
+
+    def refresh(self, filepath, data):
+        """Records data that was just written to filepath so other sessions see it without a reload."""
+        with self._lock:
+            entry = self._entries.get(filepath)
+            paths = entry["paths"] if entry is not None else (filepath,)
+            self._entries[filepath] = {"data": data, "paths": paths, "signature": self._signature(paths), "checked_at": time.monotonic()}
+            self.version += 1
+
+@st.cache_resource
+def get_data_store():
+    """Returns the single SharedDataStore shared by every session of this server process."""
+    return SharedDataStore()
+
+def load_users_file():
+    """Loads the user accounts, creating the file with the default admin account if needed."""
+    if os.path.exists(USERS_FILE):
+        return load_json_file(USERS_FILE)
+    return load_json_file(USERS_FILE, {"admin": {"password_hash": hash_password("adminpassword"), "role": "admin"}})
+
+def load_questions_file():
+    """Loads the question bank, converting the old list format to the multi-quiz format."""
+    if not os.path.exists(QUESTIONS_FILE):
+        initial_questions_data = {"SAP Security Quiz": []}
+        save_json_file(QUESTIONS_FILE, initial_questions_data)
+        return initial_questions_data
+    with open(QUESTIONS_FILE, "r") as f:
+        initial_questions_data = json.load(f)
+    if isinstance(initial_questions_data, list):
+        # This conversion warning should now appear after set_page_config
+        st.warning(f"Converting '{QUESTIONS_FILE}' from old list format to new multi-quiz format. Please review.")
+        initial_questions_data = {"SAP Security Quiz": initial_questions_data}
+        save_json_file(QUESTIONS_FILE, initial_questions_data)
+    if assign_question_ids(initial_questions_data):
+        save_json_file(QUESTIONS_FILE, initial_questions_data)
+    return initial_questions_data
+
+def new_question_id():
+    """Returns a new persistent question ID."""
+    return uuid.uuid4().hex[:12]
+
+def assign_question_ids(questions_data):
+    """Gives every question without an "id" a new one. Returns True if any ID was assigned."""
+    assigned = False
+    for quiz_questions in questions_data.values():
+        for position, question in enumerate(quiz_questions):
+            if not question.get("id"):
+                quiz_questions[position] = {"id": new_question_id(), **question}
+                assigned = True
+    return assigned
+
+def load_questions_manifest():
+    """Loads the sharded question bank manifest: {"quizzes": [{"quiz_id", "file", "question_count", "revision"}]}.
+
+    revision counts the writes to the quiz's shard; manifests written before it existed lack it.
+    """
+    return load_json_file(QUESTIONS_MANIFEST, {"quizzes": []})
+
+def question_shard_filename(quiz_id):
+    """Returns a filesystem-safe, collision-free shard file name for a quiz."""
+    slug = re.sub(r"[^a-z0-9]+", "-", quiz_id.lower()).strip("-")[:40] or "quiz"
+    return f"{slug}-{hashlib.sha1(quiz_id.encode('utf-8')).hexdigest()[:8]}.json"
+
+def shard_question_bank():
+    """Splits QUESTIONS_FILE into per-quiz shard files plus a manifest. Returns the number of quizzes.
+
+    The manifest is written last, so the app keeps using the single file until all shards exist.
+    """
+    questions_data = load_questions_file()
+    os.makedirs(QUESTIONS_DIR, exist_ok=True)
+    manifest = {"quizzes": []}
+    for quiz_id, quiz_questions in questions_data.items():
+        filename = question_shard_filename(quiz_id)
+        save_json_file(os.path.join(QUESTIONS_DIR, filename), quiz_questions)
+        manifest["quizzes"].append({"quiz_id": quiz_id, "file": filename, "question_count": len(quiz_questions)})
+    save_json_file(QUESTIONS_MANIFEST, manifest)
+    return len(manifest["quizzes"])
+
+# --- Question Pools ---
+# A quiz's questions form a pool. Each attempt draws "draw_count" of them (all of them, in stored order,
+# when it is unset) with an RNG seeded by user, quiz and attempt, so a draw can be reproduced for review
+# or resume. With "stratify_by_topic" the draw keeps each topic's share of the pool. The backends keep a
+# QuestionPool per quiz (IDs and topics only), so drawing never copies the question texts.
+DEFAULT_QUIZ_SETTINGS = {"draw_count": None, "stratify_by_topic": False}
+
+def load_quiz_settings_file():
+    """Loads the per-quiz settings of the JSON backends: quiz_id -> {"draw_count", "stratify_by_topic"}."""
+    return load_json_file(QUIZ_SETTINGS_FILE, {})
+
+class QuestionPool:
+    """Sampling index over one quiz's questions: IDs in stored order, and grouped by topic."""
+
+    def __init__(self, questions):
+        # questions: (question ID, topic) pairs in stored order
+        self.ids = []
+        self.by_topic = {}
+        for question_id, topic in questions:
+            self.ids.append(question_id)
+            self.by_topic.setdefault(topic or "", []).append(question_id)
+
+    def draw(self, count, seed, stratify=False):
+        """Returns the IDs of count questions drawn with random.Random(seed).
+
+        Every question, in stored order, when count is unset or covers the whole pool.
+        """
+        if not count or count >= len(self.ids):
+            return list(self.ids)
+        rng = random.Random(seed)
+        if not stratify or len(self.by_topic) < 2:
+            return rng.sample(self.ids, count)
+        # Largest-remainder allocation of count across topics, in proportion to their size
+        topics = sorted(self.by_topic)
+        quotas = {topic: count * len(self.by_topic[topic]) // len(self.ids) for topic in topics}
+        by_remainder = sorted(topics, key=lambda topic: (-(count * len(self.by_topic[topic]) % len(self.ids)), topic))
+        for topic in by_remainder[:count - sum(quotas.values())]:
+            quotas[topic] += 1
+        drawn = [question_id for topic in topics for question_id in rng.sample(self.by_topic[topic], quotas[topic])]
+        rng.shuffle(drawn)
+        return drawn
+
+def attempt_seed(username, quiz_id, attempt_id):
+    """Seed of an attempt's question draw; the same user, quiz and attempt always draw the same questions."""
+    return int.from_bytes(hashlib.sha256(f"{username}\0{quiz_id}\0{attempt_id}".encode("utf-8")).digest()[:8], "big")
+
+def draw_quiz_questions(storage, quiz_id, username, attempt_id):
+    """Returns the questions of one attempt, drawn from the quiz's pool according to its settings."""
+    settings = storage.get_quiz_settings(quiz_id)
+    question_ids = storage.question_pool(quiz_id).draw(settings["draw_count"], attempt_seed(username, quiz_id, attempt_id), settings["stratify_by_topic"])
+    return storage.get_questions_by_id(quiz_id, question_ids)
+
+# --- Password Hashing ---
+# User records store {"password_hash", "role"}; the hash string carries its scheme, cost and salt
+# ("scrypt$n$r$p$salt$hash" or "pbkdf2_sha256$iterations$salt$hash"), so the cost can be raised
+# later and older hashes are upgraded on the next successful login. Records that still hold a
+# plaintext "password" (before manage.py hash-passwords) keep working and are upgraded the same way.
+# The KDF is deliberately slow, so it runs on a small shared worker pool rather than on every
+# session's script thread at once (hashlib releases the GIL while it works).
+def hash_password(password, scheme=None, cost=None):
+    """Returns a salted hash string for password. cost is scrypt's n or PBKDF2's iteration count."""
+    scheme = scheme or PASSWORD_HASH_SCHEME
+    salt = secrets.token_bytes(16)
+    if scheme == "scrypt":
+        n = cost or PASSWORD_SCRYPT_N
+        derived = hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=PASSWORD_SCRYPT_R, p=PASSWORD_SCRYPT_P, maxmem=256 * n * PASSWORD_SCRYPT_R, dklen=32)
+        params = f"{n}${PASSWORD_SCRYPT_R}${PASSWORD_SCRYPT_P}"
+    elif scheme == "pbkdf2_sha256":
+        params = str(cost or PASSWORD_PBKDF2_ITERATIONS)
+        derived = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, int(params))
+    else:
+        raise ValueError(f"Unknown password hash scheme '{scheme}'.")
+    return f"{scheme}${params}${base64.b64encode(salt).decode()}${base64.b64encode(derived).decode()}"
+
+def check_password_hash(password, password_hash):
+    """Returns True if password matches a hash string from hash_password(); a malformed hash matches nothing."""
+    try:
+        scheme, *params, salt, expected = password_hash.split("$")
+        salt, expected = base64.b64decode(salt), base64.b64decode(expected)
+        if scheme == "scrypt":
+            n, r, p = (int(value) for value in params)
+            derived = hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=len(expected))
+        elif scheme == "pbkdf2_sha256":
+            derived = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, int(params[0]), dklen=len(expected))
+        else:
+            return False
+    except (ValueError, IndexError, binascii.Error): # Truncated, mis-encoded or with impossible parameters
+        return False
+    return hmac.compare_digest(derived, expected)
+
+def verify_password(password, user):
+    """Checks password against a user record; user=None still spends one KDF run so unknown IDs take as long."""
+    if user is None:
+        hash_password(password)
+        return False
+    if "password_hash" in user:
+        return check_password_hash(password, user["password_hash"])
+    return hmac.compare_digest(user["password"].encode("utf-8"), password.encode("utf-8")) # Not yet migrated
+
+def password_needs_rehash(user):
+    """True for plaintext records and hashes made with a different scheme or cost than configured."""
+    if "password_hash" not in user:
+        return True
+    current = {
+        "scrypt": f"scrypt${PASSWORD_SCRYPT_N}${PASSWORD_SCRYPT_R}${PASSWORD_SCRYPT_P}$",
+        "pbkdf2_sha256": f"pbkdf2_sha256${PASSWORD_PBKDF2_ITERATIONS}$",
+    }[PASSWORD_HASH_SCHEME]
+    return not user["password_hash"].startswith(current)
+
+@st.cache_resource
+def get_password_executor():
+    """Returns the process-wide worker pool that runs password hashing and verification."""
+    return concurrent.futures.ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="password-kdf")
+
+def hash_passwords(passwords):
+    """Hashes several passwords on the worker pool; returns the hashes in the same order."""
+    return list(get_password_executor().map(hash_password, passwords))
+
+def authenticate(storage, username, password):
+    """Returns the user record if the credentials are valid, else None.
+
+    Raises concurrent.futures.TimeoutError if the worker pool is too busy to answer in time.
+    """
+    user = storage.get_user(username) # Served from the in-memory user index
+    if not get_password_executor().submit(verify_password, password, user).result(timeout=PASSWORD_VERIFY_TIMEOUT_SECONDS):
+        return None
+    if password_needs_rehash(user):
+        storage.update_password_hashes({username: hash_passwords([password])[0]})
+    return user
+
+def migrate_password_hashes(storage):
+    """Replaces every plaintext password with a salted hash in one write. Returns the number of accounts migrated."""
+    plaintext = {username: user["password"] for username, user in storage.get_users().items() if "password_hash" not in user}
+    if plaintext:
+        storage.update_password_hashes(dict(zip(plaintext, hash_passwords(plaintext.values()))))
+    return len(plaintext)
+
+# --- User Progress Journal ---
+# In "journal" mode every progress change is appended to USER_PROGRESS_JOURNAL as one JSON line
+# instead of rewriting the whole progress file. All changes are idempotent, so replaying a journal
+# over a snapshot that already contains some of its records (e.g. after a crash mid-compaction) is safe.
+def apply_progress_change(progress, change):
+    """Applies a single journal record to an in-memory progress dict."""
+    op = change["op"]
+    if op == "record_attempt" and "attempt" in change:
+        attempt = change["attempt"]
+        user_quizzes = progress.setdefault(attempt["username"], {})
+        user_quizzes[attempt["quiz_id"]] = summarize_attempt(user_quizzes.get(attempt["quiz_id"]), attempt)
+    elif op == "record_attempt": # Written before attempts had IDs: the record replaces the result
+        progress.setdefault(change["username"], {})[change["quiz_id"]] = change["record"]
+    elif op == "add_user":
+        progress.setdefault(change["username"], {})
+    elif op == "add_users":
+        for username in change["usernames"]:
+            progress.setdefault(username, {})
+    elif op == "remove_user":
+        progress.pop(change["username"], None)
+    elif op == "remove_users":
+        for username in change["usernames"]:
+            progress.pop(username, None)
+    elif op == "remove_quiz":
+        for user_quizzes in progress.values():
+            if isinstance(user_quizzes, dict):
+                user_quizzes.pop(change["quiz_id"], None)
+
+def copy_progress_for_change(progress, change):
+    """Replaces the per-user dicts that change will edit with copies, so apply_progress_change()
+    leaves the dicts shared with readers alone. progress itself must be a private (shallow) copy."""
+    op = change["op"]
+    if op == "record_attempt":
+        username = change["attempt"]["username"] if "attempt" in change else change["username"]
+        if isinstance(progress.get(username), dict):
+            progress[username] = dict(progress[username])
+    elif op == "remove_quiz":
+        for username, user_quizzes in progress.items():
+            if isinstance(user_quizzes, dict) and change["quiz_id"] in user_quizzes:
+                progress[username] = dict(user_quizzes)
+
+@instrumented()
+def load_user_progress():
+    """Loads the progress snapshot and replays any journal records written since the last compaction."""
+    progress = load_json_file(USER_PROGRESS_FILE, {})
+    if os.path.exists(USER_PROGRESS_JOURNAL):
+        with open(USER_PROGRESS_JOURNAL, "r") as f:
+            for line in f:
+                count_io(read_bytes=len(line))
+                if not line.strip():
+                    continue
+                try:
+                    change = json.loads(line)
+                except json.JSONDecodeError:
+                    continue # A record torn by a failed or interrupted append; appends after it start on a new line
+                apply_progress_change(progress, change)
+    return progress
+
+@instrumented()
+def append_progress_journal(changes):
+    """Appends change records to the journal in one write and fsyncs it before returning."""
+    append_jsonl(USER_PROGRESS_JOURNAL, changes)
+
+def compact_progress_journal(progress):
+    """Folds the journal into a fresh snapshot and truncates it. Callers hold the progress file lock."""
+    save_json_file(USER_PROGRESS_FILE, progress, compact=True)
+    open(USER_PROGRESS_JOURNAL, "w").close()
+    get_data_store().refresh(USER_PROGRESS_FILE, progress)
+
+@instrumented()
+def persist_progress_changes(changes):
+    """Applies progress changes, in order, to a copy of the shared progress data and persists them in one flush.
+
+    Runs under the progress file lock after re-validating the shared copy, so records appended by
+    other sessions or processes are replayed first and never lost. The copy replaces the shared
+    data only once the flush succeeded: if it fails, nothing was committed and a retry starts over.
+    """
+    store = get_data_store()
+    with file_lock(USER_PROGRESS_FILE):
+        progress = dict(store.read(USER_PROGRESS_FILE, load_user_progress, watch_paths=(USER_PROGRESS_JOURNAL,), revalidate=True))
+        journal = []
+        attempts = []
+        for change in changes:
+            if change["op"] == "commit_attempt":
+                change = number_attempt(progress, change["attempt"])
+                if change is None:
+                    continue # Already committed, e.g. by an earlier rerun of the same session
+                attempts.append(change["attempt"])
+            copy_progress_for_change(progress, change)
+            apply_progress_change(progress, change)
+            journal.append(change)
+        if not journal:
+            return
+        if attempts:
+            append_attempt_history(attempts) # The history is written first; the summary is derived from it
+        if PROGRESS_PERSISTENCE != "journal":
+            save_json_file(USER_PROGRESS_FILE, progress, compact=True)
+            return
+        append_progress_journal(journal)
+        store.refresh(USER_PROGRESS_FILE, progress)
+        if os.path.getsize(USER_PROGRESS_JOURNAL) >= PROGRESS_JOURNAL_COMPACT_BYTES:
+            compact_progress_journal(progress)
+
+class ProgressWriter:
+    """Write-behind persistence: a background thread that flushes queued progress changes in batches.
+
+    Sessions submit changes to a bounded queue and wait on the returned future, which resolves once
+    the flush containing the change is durable. The writer gathers everything submitted within
+    PROGRESS_FLUSH_INTERVAL_SECONDS into one persist_progress_changes() call, so a burst of quiz
+    submissions costs one lock, one write and one fsync instead of one each, and a session's wait
+    doesn't grow with the number of others saving at the same time. Pending changes are flushed
+    when the process exits.
+    """
+    _STOP = object()
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=PROGRESS_WRITE_QUEUE_SIZE)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="progress-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, change):
+        """Queues a change and returns a future that resolves once it has been persisted."""
+        future = concurrent.futures.Future()
+        if self._closed: # Shutting down: write it directly
+            persist_progress_changes([change])
+            future.set_result(True)
+            return future
+        try:
+            self._queue.put((change, future), timeout=PROGRESS_WRITE_TIMEOUT_SECONDS) # Waits while the queue is full
+        except queue.Full:
+            raise concurrent.futures.TimeoutError("The progress writer is too busy to accept the change.")
+        return future
+
+    def close(self):
+        """Flushes everything queued so far and stops the writer thread."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put((self._STOP, None))
+            self._thread.join(timeout=PROGRESS_WRITE_TIMEOUT_SECONDS)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            if batch[0][0] is not self._STOP:
+                time.sleep(PROGRESS_FLUSH_INTERVAL_SECONDS) # Let a burst of submissions gather into this flush
+            with contextlib.suppress(queue.Empty):
+                while True:
+                    batch.append(self._queue.get_nowait())
+            stopping = any(change is self._STOP for change, _ in batch)
+            pending = [(change, future) for change, future in batch if change is not self._STOP]
+            if not pending:
+                continue
+            try:
+                persist_progress_changes([change for change, _ in pending])
+            except Exception as exc:
+                for _, future in pending:
+                    future.set_exception(exc)
+            else:
+                for _, future in pending:
+                    future.set_result(True)
+
+@st.cache_resource
+def get_progress_writer():
+    """Returns the ProgressWriter shared by every session of this server process."""
+    return ProgressWriter()
+
+def commit_progress_change(change):
+    """Persists one progress change, returning once it is durable.
+
+    With write-behind, raises concurrent.futures.TimeoutError if that takes longer than
+    PROGRESS_WRITE_TIMEOUT_SECONDS. The change may still be written afterwards, so callers retry
+    with the same change: committing an attempt ID twice is a no-op.
+    """
+    if not PROGRESS_WRITE_BEHIND:
+        persist_progress_changes([change])
+        return
+    get_progress_writer().submit(change).result(timeout=PROGRESS_WRITE_TIMEOUT_SECONDS)
+
+# --- Attempt History ---
+# Every completed attempt is an immutable record {"attempt_id", "username", "quiz_id", "number", "score",
+# "total", "answers_log", "completed_at"}. The attempt ID is chosen when the quiz starts, so committing the
+# same attempt twice is a no-op. The per-quiz progress record is only a summary derived from these records:
+# the latest attempt (score, total, answers_log, attempt_id), the best result and the number of attempts.
+def new_attempt_id():
+    """Returns a new attempt ID."""
+    return uuid.uuid4().hex
+
+def new_attempt_record(username, quiz_id, record):
+    """Builds the immutable attempt record for a quiz result {"attempt_id", "score", "total", "answers_log"}."""
+    return {
+        "attempt_id": record["attempt_id"],
+        "username": username,
+        "quiz_id": quiz_id,
+        "score": record["score"],
+        "total": record["total"],
+        "answers_log": record.get("answers_log", []),
+        "completed_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+def summary_attempt_count(summary):
+    """Number of attempts a per-quiz summary covers; results saved before attempt IDs count as one."""
+    if not isinstance(summary, dict) or "score" not in summary:
+        return 0
+    return summary.get("attempts", 1 if summary.get("attempted") else 0)
+
+def summarize_attempt(summary, attempt):
+    """Folds a numbered attempt into a per-quiz summary and returns the new summary.
+
+    Folding an attempt the summary already covers returns it unchanged, so replaying a journal
+    over a snapshot that already contains some of its attempts is safe.
+    """
+    count = summary_attempt_count(summary)
+    if attempt["number"] <= count:
+        return summary
+    best_score, best_total = attempt["score"], attempt["total"]
+    if count:
+        previous_best = (summary.get("best_score", summary["score"]), summary.get("best_total", summary["total"]))
+        if best_total == 0 or previous_best[0] * best_total > best_score * previous_best[1]: # Compared by accuracy
+            best_score, best_total = previous_best
+    return {
+        "score": attempt["score"],
+        "total": attempt["total"],
+        "attempted": True,
+        "answers_log": attempt["answers_log"],
+        "attempt_id": attempt["attempt_id"],
+        "attempts": attempt["number"],
+        "best_score": best_score,
+        "best_total": best_total,
+        "completed_at": attempt["completed_at"],
+    }
+
+def number_attempt(progress, attempt):
+    """Returns the journal record committing an attempt, or None if it is already the latest one."""
+    summary = progress.get(attempt["username"], {}).get(attempt["quiz_id"])
+    if isinstance(summary, dict) and summary.get("attempt_id") == attempt["attempt_id"]:
+        return None
+    return {"op": "record_attempt", "attempt": dict(attempt, number=summary_attempt_count(summary) + 1)}
+
+@instrumented()
+def append_attempt_history(attempts):
+    """Appends attempt records to ATTEMPTS_FILE in one write. Callers hold the progress file lock."""
+    append_jsonl(ATTEMPTS_FILE, attempts)
+
+def prune_attempt_history(keep):
+    """Rewrites ATTEMPTS_FILE without the attempts for which keep(attempt) is false."""
+    with file_lock(USER_PROGRESS_FILE):
+        if not os.path.exists(ATTEMPTS_FILE):
+            return
+        with open(ATTEMPTS_FILE, "rb") as f:
+            lines = [line for line in f if line.strip()]
+        kept = []
+        for line in lines:
+            with contextlib.suppress(json.JSONDecodeError): # Torn records are dropped here
+                if keep(json.loads(line)):
+                    kept.append(line if line.endswith(b"\n") else line + b"\n")
+        if len(kept) != len(lines):
+            write_file_atomic(ATTEMPTS_FILE, lambda f: f.writelines(kept), binary=True)
+
+def iter_attempt_history():
+    """Yields every attempt record in ATTEMPTS_FILE once, oldest first, skipping torn records."""
+    if not os.path.exists(ATTEMPTS_FILE):
+        return
+    seen = set()
+    with open(ATTEMPTS_FILE, "rb") as f:
+        for line in f:
+            count_io(read_bytes=len(line))
+            try:
+                attempt = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if attempt["attempt_id"] not in seen: # Re-appended after a failed commit
+                seen.add(attempt["attempt_id"])
+                yield attempt
+
+class AttemptHistory:
+    """In-memory index over ATTEMPTS_FILE that is kept current by reading only what was appended.
+
+    The index holds each attempt's number, score, total, time and file offset; the full record,
+    with its answers_log, is read from the file only when a past attempt is opened for review.
+    """
+
+    def __init__(self, filepath):
+        self._filepath = filepath
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, identity):
+        self._identity = identity # (device, inode) of the indexed file; a rewrite replaces the inode
+        self._offset = 0
+        self._entries = {} # attempt_id -> entry
+        self._by_user_quiz = {} # (username, quiz_id) -> [entry, ...] in commit order
+
+    def _catch_up(self):
+        try:
+            stat = os.stat(self._filepath)
+        except FileNotFoundError:
+            self._reset(None)
+            return
+        if (stat.st_dev, stat.st_ino) != self._identity or stat.st_size < self._offset:
+            self._reset((stat.st_dev, stat.st_ino))
+        if stat.st_size == self._offset:
+            return
+        with open(self._filepath, "rb") as f:
+            f.seek(self._offset)
+            data = f.read(stat.st_size - self._offset)
+        count_io(read_bytes=len(data))
+        data = data[:data.rfind(b"\n") + 1] # A record still being appended is read next time
+        offset = self._offset
+        for line in data.splitlines(keepends=True):
+            with contextlib.suppress(json.JSONDecodeError): # A record torn by a crash mid-append
+                attempt = json.loads(line)
+                if attempt["attempt_id"] not in self._entries: # Re-appended after a failed commit
+                    entry = {key: attempt[key] for key in ("attempt_id", "number", "score", "total", "completed_at")}
+                    entry["offset"] = offset
+                    self._entries[attempt["attempt_id"]] = entry
+                    self._by_user_quiz.setdefault((attempt["username"], attempt["quiz_id"]), []).append(entry)
+            offset += len(line)
+        self._offset = offset
+
+    def attempts(self, username, quiz_id):
+        """Returns the index entries of a user's attempts at a quiz, oldest first."""
+        with self._lock:
+            self._catch_up()
+            return [dict(entry) for entry in self._by_user_quiz.get((username, quiz_id), [])]
+
+    def read(self, attempt_id):
+        """Returns the full attempt record, or None if there is no such attempt."""
+        with self._lock:
+            self._catch_up()
+            entry = self._entries.get(attempt_id)
+            if entry is None:
+                return None
+            with open(self._filepath, "rb") as f:
+                f.seek(entry["offset"])
+                line = f.readline()
+            count_io(read_bytes=len(line))
+            with contextlib.suppress(json.JSONDecodeError):
+                attempt = json.loads(line)
+                if attempt["attempt_id"] == attempt_id:
+                    return attempt
+            return None # Rewritten by another process since the index was read
+
+# --- Storage Backends ---
+# Pages never touch the data files directly; they go through the backend returned by get_storage().
+class StorageBackend:
+    """Interface shared by all storage backends.
+
+    Listeners registered with add_listener() get storage_changed(event, **details) after every
+    committed change made through this backend: "attempt_recorded" (username, quiz_id, record),
+    "user_added" (username, record), "user_deleted" (username), "quiz_deleted" (quiz_id),
+    "questions_added" (quiz_id, questions), "question_updated" (quiz_id, question) and
+    "question_deleted" (quiz_id, question_id). Changes made by other processes are not reported;
+    generation() and question_generation() change instead.
+    """
+
+    def __init__(self):
+        self._listeners = []
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def _notify(self, event, **details):
+        for listener in self._listeners:
+            listener.storage_changed(event, **details)
+
+    def generation(self):
+        """Returns a token that changes whenever users or progress were reloaded from outside this process."""
+        raise NotImplementedError
+
+    def question_generation(self):
+        """Returns a token that changes whenever the question bank was reloaded from outside this process."""
+        raise NotImplementedError
+
+    # Questions
+    def list_quizzes(self):
+        raise NotImplementedError
+
+    def get_questions(self, quiz_id):
+        raise NotImplementedError
+
+    def create_quiz(self, quiz_id):
+        raise NotImplementedError
+
+    def delete_quiz(self, quiz_id):
+        """Deletes a quiz, its questions and all student progress recorded for it."""
+        raise NotImplementedError
+
+    def question_counts(self):
+        """Returns a dict of quiz_id -> number of questions."""
+        return {quiz_id: len(self.get_questions(quiz_id)) for quiz_id in self.list_quizzes()}
+
+    def get_question_index(self, quiz_id):
+        """Returns a dict of question ID -> question for one quiz."""
+        return {question["id"]: question for question in self.get_questions(quiz_id)}
+
+    def get_questions_by_id(self, quiz_id, question_ids):
+        """Returns the questions with the given IDs, in that order, skipping IDs that no longer exist."""
+        index = self.get_question_index(quiz_id)
+        return [index[question_id] for question_id in question_ids if question_id in index]
+
+    def question_pool(self, quiz_id):
+        """Returns the QuestionPool of a quiz, built once and rebuilt only after its questions change."""
+        raise NotImplementedError
+
+    def get_quiz_settings(self, quiz_id):
+        """Returns {"draw_count", "stratify_by_topic"} for a quiz (see DEFAULT_QUIZ_SETTINGS)."""
+        raise NotImplementedError
+
+    def update_quiz_settings(self, quiz_id, settings):
+        raise NotImplementedError
+
+    def add_question(self, quiz_id, question):
+        """Appends a question; the question dict must already carry its "id" (and may carry a "topic")."""
+        raise NotImplementedError
+
+    def add_questions(self, quiz_id, questions):
+        """Appends several questions (each with its "id") in one write."""
+        raise NotImplementedError
+
+    def update_question(self, quiz_id, question_id, question):
+        raise NotImplementedError
+
+    def delete_question(self, quiz_id, question_id):
+        raise NotImplementedError
+
+    # Users
+    def get_users(self):
+        """Returns a dict of username -> {"password_hash", "role"} (or "password" before migration)."""
+        raise NotImplementedError
+
+    def get_user(self, username):
+        return self.get_users().get(username)
+
+    def add_user(self, username, record):
+        """Creates a user together with an empty progress record."""
+        raise NotImplementedError
+
+    def delete_user(self, username):
+        """Deletes a user and their progress."""
+        raise NotImplementedError
+
+    def add_users(self, records):
+        """Creates several users (username -> record) and their empty progress in one batched write."""
+        raise NotImplementedError
+
+    def delete_users(self, usernames):
+        """Deletes several users and their progress in one batched write."""
+        raise NotImplementedError
+
+    def update_password_hashes(self, hashes):
+        """Stores new password hashes (username -> hash) in one write, dropping any plaintext password."""
+        raise NotImplementedError
+
+    # Progress
+    def get_user_progress(self, username):
+        """Returns a dict of quiz_id -> per-quiz summary for one user (see the Attempt History section).
+
+        Each summary has "score", "total", "attempted" and "answers_log" of the latest attempt, plus
+        "attempt_id", "attempts", "best_score" and "best_total" for results committed with an attempt ID.
+        """
+        raise NotImplementedError
+
+    def ensure_user_progress(self, username):
+        raise NotImplementedError
+
+    def record_attempt(self, username, quiz_id, record):
+        """Commits a completed attempt {"attempt_id", "score", "total", "answers_log"} and updates the summary.
+
+        Committing an attempt ID that is already the latest for the quiz changes nothing.
+        """
+        raise NotImplementedError
+
+    def attempt_history(self, username, quiz_id):
+        """Returns a user's attempts at a quiz, oldest first, as {"attempt_id", "number", "score", "total", "completed_at"}."""
+        raise NotImplementedError
+
+    def get_attempt(self, attempt_id):
+        """Returns the full attempt record, including its answers_log, or None."""
+        raise NotImplementedError
+
+    def iter_attempts(self):
+        """Yields (username, quiz_id, record) for every stored quiz result."""
+        raise NotImplementedError
+
+    def iter_answer_logs(self):
+        """Yields (username, quiz_id, attempt_id, answers_log) for every committed attempt, oldest first.
+
+        Results saved before attempt IDs have no history record; their summary's log is yielded
+        with attempt_id None.
+        """
+        raise NotImplementedError
+
+    def rewrite_answer_logs(self, transform):
+        """Replaces every stored answers_log with transform(quiz_id, answers_log) in one write."""
+        raise NotImplementedError
+
+    def performance_rows(self):
+        """Returns ([(username, quiz_id, score, total), ...], [username, ...]) for all students.
+
+        The first list holds every attempted quiz, the second the students without any attempt.
+        """
+        raise NotImplementedError
+
+
+class JsonStorage(StorageBackend):
+    """Flat JSON files shared through the process-wide SharedDataStore."""
+
+    def __init__(self):
+        super().__init__()
+        # Per-quiz question ID indexes: quiz_id -> (question list they were built from, index)
+        self._index_lock = threading.Lock()
+        self._indexes = {}
+        self._pools = {} # quiz_id -> (question list it was built from, QuestionPool); dropped on every edit
+        self._history = AttemptHistory(ATTEMPTS_FILE)
+
+    def _questions(self):
+        return get_data_store().read(QUESTIONS_FILE, load_questions_file)
+
+    def _users(self):
+        return get_data_store().read(USERS_FILE, load_users_file)
+
+    def _progress(self):
+        return get_data_store().read(USER_PROGRESS_FILE, load_user_progress, watch_paths=(USER_PROGRESS_JOURNAL,))
+
+    def _update_questions(self, mutate):
+        return update_json_file(QUESTIONS_FILE, load_questions_file, mutate)
+
+    def _update_quiz_questions(self, quiz_id, mutate):
+        """Read-modify-write of one quiz's question list; mutate(quiz_questions) edits a copy of it in place."""
+        def mutate_quiz(questions):
+            quiz_questions = questions[quiz_id] = list(questions[quiz_id]) # The other quizzes stay shared
+            return mutate(quiz_questions)
+        return self._update_questions(mutate_quiz)
+
+    def _update_users(self, mutate):
+        return update_json_file(USERS_FILE, load_users_file, mutate)
+
+    def _quiz_settings(self):
+        return get_data_store().read(QUIZ_SETTINGS_FILE, load_quiz_settings_file)
+
+    def generation(self):
+        self._users(), self._progress() # Re-validates both files against disk
+        store = get_data_store()
+        return (store.load_count(USERS_FILE), store.load_count(USER_PROGRESS_FILE))
+
+    def question_generation(self):
+        self._questions() # Re-validates the file against disk
+        return get_data_store().load_count(QUESTIONS_FILE)
+
+    def list_quizzes(self):
+        return list(self._questions().keys())
+
+    def get_questions(self, quiz_id):
+        return self._questions().get(quiz_id, [])
+
+    def create_quiz(self, quiz_id):
+        self._update_questions(lambda questions: questions.setdefault(quiz_id, []))
+
+    def delete_quiz(self, quiz_id):
+        self._update_questions(lambda questions: questions.pop(quiz_id, None))
+        self._forget_quiz(quiz_id)
+
+    def _forget_quiz(self, quiz_id):
+        """Drops everything else kept for a quiz whose questions were just deleted."""
+        self._forget_quiz_caches(quiz_id)
+        if quiz_id in self._quiz_settings():
+            update_json_file(QUIZ_SETTINGS_FILE, load_quiz_settings_file, lambda settings: settings.pop(quiz_id, None))
+        commit_progress_change({"op": "remove_quiz", "quiz_id": quiz_id})
+        prune_attempt_history(lambda attempt: attempt["quiz_id"] != quiz_id)
+        self._notify("quiz_deleted", quiz_id=quiz_id)
+
+    def get_question_index(self, quiz_id):
+        # Built once per saved question list; the mutators below drop it so it is rebuilt from the new list
+        quiz_questions = self.get_questions(quiz_id)
+        with self._index_lock:
+            source, index = self._indexes.get(quiz_id, (None, None))
+            if source is not quiz_questions:
+                index = {question["id"]: question for question in quiz_questions}
+                self._indexes[quiz_id] = (quiz_questions, index)
+            return index
+
+    def _forget_quiz_caches(self, quiz_id):
+        """Drops a quiz's question index and pool; they are rebuilt from the saved list on demand."""
+        with self._index_lock:
+            self._indexes.pop(quiz_id, None)
+            self._pools.pop(quiz_id, None)
+
+    def question_pool(self, quiz_id):
+        quiz_questions = self.get_questions(quiz_id)
+        with self._index_lock:
+            source, pool = self._pools.get(quiz_id, (None, None))
+            if source is not quiz_questions:
+                pool = QuestionPool((question["id"], question.get("topic")) for question in quiz_questions)
+                self._pools[quiz_id] = (quiz_questions, pool)
+            return pool
+
+    def get_quiz_settings(self, quiz_id):
+        return dict(DEFAULT_QUIZ_SETTINGS, **self._quiz_settings().get(quiz_id, {}))
+
+    def update_quiz_settings(self, quiz_id, settings):
+        def mutate(all_settings):
+            all_settings[quiz_id] = {key: settings[key] for key in DEFAULT_QUIZ_SETTINGS}
+        update_json_file(QUIZ_SETTINGS_FILE, load_quiz_settings_file, mutate)
+
+    def add_question(self, quiz_id, question):
+        def mutate(quiz_questions):
+            quiz_questions.append(question)
+        self._update_quiz_questions(quiz_id, mutate)
+        self._forget_quiz_caches(quiz_id)
+        self._notify("questions_added", quiz_id=quiz_id, questions=[question])
+
+    def add_questions(self, quiz_id, questions):
+        def mutate(quiz_questions):
+            quiz_questions.extend(questions)
+        self._update_quiz_questions(quiz_id, mutate)
+        self._forget_quiz_caches(quiz_id)
+        self._notify("questions_added", quiz_id=quiz_id, questions=questions)
+
+    def update_question(self, quiz_id, question_id, question):
+        def mutate(quiz_questions):
+            position = next(i for i, q in enumerate(quiz_questions) if q["id"] == question_id)
+            quiz_questions[position] = dict(question, id=question_id)
+        self._update_quiz_questions(quiz_id, mutate)
+        self._forget_quiz_caches(quiz_id)
+        self._notify("question_updated", quiz_id=quiz_id, question=dict(question, id=question_id))
+
+    def delete_question(self, quiz_id, question_id):
+        def mutate(quiz_questions):
+            quiz_questions[:] = [q for q in quiz_questions if q["id"] != question_id]
+        self._update_quiz_questions(quiz_id, mutate)
+        self._forget_quiz_caches(quiz_id)
+        self._notify("question_deleted", quiz_id=quiz_id, question_id=question_id)
+
+    def get_users(self):
+        return self._users()
+
+    def add_user(self, username, record):
+        def mutate(users):
+            users[username] = record
+        self._update_users(mutate)
+        self.ensure_user_progress(username)
+        self._notify("user_added", username=username, record=record)
+
+    def delete_user(self, username):
+        self._update_users(lambda users: users.pop(username, None))
+        if username in self._progress():
+            commit_progress_change({"op": "remove_user", "username": username})
+            prune_attempt_history(lambda attempt: attempt["username"] != username)
+        self._notify("user_deleted", username=username)
+
+    def add_users(self, records):
+        self._update_users(lambda users: users.update(records))
+        commit_progress_change({"op": "add_users", "usernames": list(records)})
+        for username, record in records.items():
+            self._notify("user_added", username=username, record=record)
+
+    def delete_users(self, usernames):
+        def mutate(users):
+            for username in usernames:
+                users.pop(username, None)
+        self._update_users(mutate)
+        commit_progress_change({"op": "remove_users", "usernames": list(usernames)})
+        removed = set(usernames)
+        prune_attempt_history(lambda attempt: attempt["username"] not in removed)
+        for username in usernames:
+            self._notify("user_deleted", username=username)
+
+    def update_password_hashes(self, hashes):
+        def mutate(users):
+            for username, password_hash in hashes.items():
+                if username in users:
+                    users[username] = {"password_hash": password_hash, "role": users[username]["role"]}
+        self._update_users(mutate)
+
+    def get_user_progress(self, username):
+        return self._progress().get(username, {})
+
+    def ensure_user_progress(self, username):
+        if username not in self._progress():
+            commit_progress_change({"op": "add_user", "username": username})
+
+    def record_attempt(self, username, quiz_id, record):
+        summary = self.get_user_progress(username).get(quiz_id)
+        if isinstance(summary, dict) and summary.get("attempt_id") == record["attempt_id"]:
+            return # Already committed; the writer also drops duplicates that race past this check
+        commit_progress_change({"op": "commit_attempt", "attempt": new_attempt_record(username, quiz_id, record)})
+        self._notify("attempt_recorded", username=username, quiz_id=quiz_id, record=self.get_user_progress(username)[quiz_id])
+
+    def attempt_history(self, username, quiz_id):
+        return self._history.attempts(username, quiz_id)
+
+    def get_attempt(self, attempt_id):
+        return self._history.read(attempt_id)
+
+    def iter_answer_logs(self):
+        progress = self._progress()
+        for attempt in iter_attempt_history():
+            summary = progress.get(attempt["username"], {}).get(attempt["quiz_id"])
+            if attempt["number"] <= summary_attempt_count(summary): # Skips records of a flush that failed
+                yield attempt["username"], attempt["quiz_id"], attempt["attempt_id"], attempt["answers_log"]
+        for username, quiz_id, summary in self.iter_attempts():
+            if "attempt_id" not in summary:
+                yield username, quiz_id, None, summary.get("answers_log", [])
+
+    def iter_attempts(self):
+        for username, user_quizzes in list(self._progress().items()):
+            for quiz_id, quiz_data in list(user_quizzes.items()):
+                # Skip entries from the legacy flat progress format, which are not per-quiz dicts
+                if isinstance(quiz_data, dict) and "score" in quiz_data:
+                    yield username, quiz_id, quiz_data
+
+    def rewrite_answer_logs(self, transform):
+        with file_lock(USER_PROGRESS_FILE):
+            progress = get_data_store().read(USER_PROGRESS_FILE, load_user_progress, watch_paths=(USER_PROGRESS_JOURNAL,), revalidate=True)
+            progress = { # Rewritten as new dicts: the shared ones change only once the snapshot is saved
+                username: {
+                    quiz_id: dict(quiz_data, answers_log=transform(quiz_id, quiz_data["answers_log"]))
+                    if isinstance(quiz_data, dict) and quiz_data.get("answers_log") else quiz_data
+                    for quiz_id, quiz_data in user_quizzes.items()
+                } if isinstance(user_quizzes, dict) else user_quizzes
+                for username, user_quizzes in progress.items()
+            }
+            # Written as a fresh snapshot so the journal doesn't carry the old, larger records
+            compact_progress_journal(progress)
+
+    def performance_rows(self):
+        progress = self._progress()
+        attempted_rows = []
+        not_attempted = []
+        for username, user_data in list(self._users().items()): # Snapshot, as other sessions may add users meanwhile
+            if user_data["role"] != "student":
+                continue
+            has_attempted_any_quiz = False
+            for quiz_id, quiz_data in progress.get(username, {}).items():
+                # Ensure quiz_data is a dictionary before trying to use .get()
+                if isinstance(quiz_data, dict) and quiz_data.get("attempted"):
+                    has_attempted_any_quiz = True
+                    attempted_rows.append((username, quiz_id, quiz_data["score"], quiz_data["total"]))
+            if not has_attempted_any_quiz:
+                not_attempted.append(username)
+        return attempted_rows, not_attempted
+
+
+class ShardedJsonStorage(JsonStorage):
+    """JsonStorage with the question bank split into one file per quiz under QUESTIONS_DIR.
+
+    A small manifest lists the quizzes, their shard files and question counts. Shards are
+    only loaded (and then cached) when a quiz is actually opened, and edits rewrite only the
+    affected shard plus the manifest entry.
+    """
+
+    def _manifest(self):
+        return get_data_store().read(QUESTIONS_MANIFEST, load_questions_manifest)
+
+    def _update_manifest(self, mutate):
+        return update_json_file(QUESTIONS_MANIFEST, load_questions_manifest, mutate)
+
+    def _shard_path(self, quiz_id):
+        entry = next((entry for entry in self._manifest()["quizzes"] if entry["quiz_id"] == quiz_id), None)
+        return os.path.join(QUESTIONS_DIR, entry["file"]) if entry else None
+
+    def list_quizzes(self):
+        return [entry["quiz_id"] for entry in self._manifest()["quizzes"]]
+
+    def question_counts(self):
+        return {entry["quiz_id"]: entry["question_count"] for entry in self._manifest()["quizzes"]}
+
+    def question_generation(self):
+        # Every shard write also bumps its manifest entry's revision (see _update_quiz_questions), so
+        # the manifest's load count covers shards that were never loaded here. Only shards already
+        # cached are re-validated, and their first load is not a change (load counts only grow, so
+        # the sum of the reloads changes whenever any of them does).
+        store = get_data_store()
+        shard_reloads = 0
+        for quiz_id in self.list_quizzes():
+            shard_path = self._shard_path(quiz_id)
+            if store.load_count(shard_path):
+                self.get_questions(quiz_id)
+                shard_reloads += store.load_count(shard_path) - 1
+        return (store.load_count(QUESTIONS_MANIFEST), shard_reloads)
+
+    def get_questions(self, quiz_id):
+        shard_path = self._shard_path(quiz_id)
+        if shard_path is None:
+            return []
+        return get_data_store().read(shard_path, lambda: load_json_file(shard_path, []))
+
+    def create_quiz(self, quiz_id):
+        def mutate(manifest):
+            if not any(entry["quiz_id"] == quiz_id for entry in manifest["quizzes"]):
+                manifest["quizzes"] = manifest["quizzes"] + [{"quiz_id": quiz_id, "file": question_shard_filename(quiz_id), "question_count": 0}]
+        self._update_manifest(mutate)
+        shard_path = self._shard_path(quiz_id)
+        if not os.path.exists(shard_path):
+            save_json_file(shard_path, [])
+
+    def delete_quiz(self, quiz_id):
+        shard_path = self._shard_path(quiz_id)
+        self._update_manifest(lambda manifest: manifest.update(quizzes=[entry for entry in manifest["quizzes"] if entry["quiz_id"] != quiz_id]))
+        if shard_path is not None:
+            with file_lock(shard_path), contextlib.suppress(FileNotFoundError):
+                os.remove(shard_path)
+        self._forget_quiz(quiz_id)
+
+    def _update_quiz_questions(self, quiz_id, mutate):
+        shard_path = self._shard_path(quiz_id)
+        if shard_path is None:
+            raise KeyError(quiz_id)
+        def mutate_shard(quiz_questions):
+            mutate(quiz_questions)
+            return len(quiz_questions)
+        question_count = update_json_file(shard_path, lambda: load_json_file(shard_path, []), mutate_shard)
+        def mutate_manifest(manifest):
+            manifest["quizzes"] = [
+                # revision lets other processes see the edit without loading the shard
+                dict(entry, question_count=question_count, revision=entry.get("revision", 0) + 1) if entry["quiz_id"] == quiz_id else entry
+                for entry in manifest["quizzes"]
+            ]
+        self._update_manifest(mutate_manifest)
+
+
+class SqliteStorage(StorageBackend):
+    """Single SQLite database in WAL mode; every edit or attempt is a single-row write."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS quizzes (
+            quiz_id TEXT PRIMARY KEY,
+            position INTEGER NOT NULL,
+            draw_count INTEGER,
+            stratify_by_topic INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            question_id TEXT NOT NULL,
+            quiz_id TEXT NOT NULL REFERENCES quizzes(quiz_id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            question TEXT NOT NULL,
+            options TEXT NOT NULL,
+            correct_option TEXT NOT NULL,
+            explanation TEXT NOT NULL,
+            topic TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX IF NOT EXISTS idx_questions_quiz ON questions(quiz_id, position);
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_questions_question_id ON questions(question_id);
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            password TEXT NOT NULL DEFAULT '',
+            password_hash TEXT,
+            role TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS attempts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            quiz_id TEXT NOT NULL,
+            score INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            attempted INTEGER NOT NULL,
+            answers_log TEXT NOT NULL,
+            attempt_id TEXT,
+            attempt_count INTEGER NOT NULL DEFAULT 1,
+            best_score INTEGER,
+            best_total INTEGER,
+            completed_at TEXT
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_attempts_user_quiz ON attempts(username, quiz_id);
+        CREATE INDEX IF NOT EXISTS idx_attempts_quiz ON attempts(quiz_id);
+        CREATE TABLE IF NOT EXISTS attempt_history (
+            attempt_id TEXT PRIMARY KEY,
+            username TEXT NOT NULL,
+            quiz_id TEXT NOT NULL,
+            number INTEGER NOT NULL,
+            score INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            answers_log TEXT NOT NULL,
+            completed_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_attempt_history_user_quiz ON attempt_history(username, quiz_id, number);
+    """
+    # Per-quiz summary row of a user (see summarize_attempt); rows are replaced as attempts are committed
+    SUMMARY_UPSERT = (
+        "INSERT INTO attempts (username, quiz_id, score, total, attempted, answers_log, attempt_id, attempt_count, best_score, best_total, completed_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(username, quiz_id) DO UPDATE SET score = excluded.score, total = excluded.total, "
+        "attempted = excluded.attempted, answers_log = excluded.answers_log, attempt_id = excluded.attempt_id, attempt_count = excluded.attempt_count, "
+        "best_score = excluded.best_score, best_total = excluded.best_total, completed_at = excluded.completed_at"
+    )
+
+    def __init__(self, db_path):
+        super().__init__()
+        # One connection shared by all sessions; the lock serialises access to it
+        self._db_path = db_path
+        self._lock = threading.RLock()
+        self._users_cache = None # username -> record, dropped on every user write
+        self._users_generation = None
+        self._pools = {} # quiz_id -> (data_version, QuestionPool); dropped on every question edit here
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._migrate_schema()
+        self._conn.executescript(self.SCHEMA)
+        if self._conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0:
+            self._conn.execute("INSERT INTO users (username, password_hash, role) VALUES ('admin', ?, 'admin')", (hash_password("adminpassword"),))
+
+    def _migrate_schema(self):
+        """Brings databases created by older versions up to the current SCHEMA."""
+        columns = [row["name"] for row in self._conn.execute("PRAGMA table_info(questions)")]
+        if columns and "question_id" not in columns:
+            self._conn.execute("ALTER TABLE questions ADD COLUMN question_id TEXT NOT NULL DEFAULT ''")
+            rowids = [row["id"] for row in self._conn.execute("SELECT id FROM questions")]
+            self._conn.executemany("UPDATE questions SET question_id = ? WHERE id = ?", [(new_question_id(), rowid) for rowid in rowids])
+        columns = [row["name"] for row in self._conn.execute("PRAGMA table_info(questions)")]
+        if columns and "topic" not in columns:
+            self._conn.execute("ALTER TABLE questions ADD COLUMN topic TEXT NOT NULL DEFAULT ''")
+        columns = [row["name"] for row in self._conn.execute("PRAGMA table_info(quizzes)")]
+        if columns and "draw_count" not in columns:
+            self._conn.execute("ALTER TABLE quizzes ADD COLUMN draw_count INTEGER")
+            self._conn.execute("ALTER TABLE quizzes ADD COLUMN stratify_by_topic INTEGER NOT NULL DEFAULT 0")
+        columns = [row["name"] for row in self._conn.execute("PRAGMA table_info(users)")]
+        if columns and "password_hash" not in columns:
+            self._conn.execute("ALTER TABLE users ADD COLUMN password_hash TEXT")
+        columns = [row["name"] for row in self._conn.execute("PRAGMA table_info(attempts)")]
+        if columns and "attempt_id" not in columns:
+            for column in ("attempt_id TEXT", "attempt_count INTEGER NOT NULL DEFAULT 1", "best_score INTEGER", "best_total INTEGER", "completed_at TEXT"):
+                self._conn.execute(f"ALTER TABLE attempts ADD COLUMN {column}")
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Runs the enclosed statements as one write transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def generation(self):
+        # data_version only changes when another connection (e.g. manage.py) commits to the database
+        return self._query("PRAGMA data_version")[0][0]
+
+    def question_generation(self):
+        return self.generation()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _question_from_row(row):
+        question = {
+            "id": row["question_id"],
+            "question": row["question"],
+            "options": json.loads(row["options"]),
+            "correct_option": row["correct_option"],
+            "explanation": row["explanation"],
+        }
+        if row["topic"]:
+            question["topic"] = row["topic"]
+        return question
+
+    @staticmethod
+    def _question_params(question):
+        return (question["question"], json.dumps(question["options"]), question["correct_option"], question["explanation"], question.get("topic", ""))
+
+    def list_quizzes(self):
+        return [row["quiz_id"] for row in self._query("SELECT quiz_id FROM quizzes ORDER BY position")]
+
+    def question_counts(self):
+        rows = self._query("SELECT z.quiz_id, COUNT(q.id) AS question_count FROM quizzes z LEFT JOIN questions q ON q.quiz_id = z.quiz_id GROUP BY z.quiz_id ORDER BY z.position")
+        return {row["quiz_id"]: row["question_count"] for row in rows}
+
+    def get_questions(self, quiz_id):
+        rows = self._query("SELECT * FROM questions WHERE quiz_id = ? ORDER BY position", (quiz_id,))
+        return [self._question_from_row(row) for row in rows]
+
+    def create_quiz(self, quiz_id):
+        with self.transaction() as conn:
+            conn.execute("INSERT INTO quizzes (quiz_id, position) VALUES (?, (SELECT COALESCE(MAX(position), -1) + 1 FROM quizzes))", (quiz_id,))
+
+    def delete_quiz(self, quiz_id):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM quizzes WHERE quiz_id = ?", (quiz_id,))
+            conn.execute("DELETE FROM attempts WHERE quiz_id = ?", (quiz_id,))
+            conn.execute("DELETE FROM attempt_history WHERE quiz_id = ?", (quiz_id,))
+            self._pools.pop(quiz_id, None)
+        self._notify("quiz_deleted", quiz_id=quiz_id)
+
+    def add_question(self, quiz_id, question):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO questions (question_id, quiz_id, position, question, options, correct_option, explanation, topic) "
+                "VALUES (?, ?, (SELECT COALESCE(MAX(position), -1) + 1 FROM questions WHERE quiz_id = ?), ?, ?, ?, ?, ?)",
+                (question["id"], quiz_id, quiz_id) + self._question_params(question),
+            )
+            self._pools.pop(quiz_id, None)
+        self._notify("questions_added", quiz_id=quiz_id, questions=[question])
+
+    def add_questions(self, quiz_id, questions):
+        with self.transaction() as conn:
+            start = conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM questions WHERE quiz_id = ?", (quiz_id,)).fetchone()[0]
+            conn.executemany(
+                "INSERT INTO questions (question_id, quiz_id, position, question, options, correct_option, explanation, topic) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(question["id"], quiz_id, start + i) + self._question_params(question) for i, question in enumerate(questions)],
+            )
+            self._pools.pop(quiz_id, None)
+        self._notify("questions_added", quiz_id=quiz_id, questions=questions)
+
+    def update_question(self, quiz_id, question_id, question):
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE questions SET question = ?, options = ?, correct_option = ?, explanation = ?, topic = ? WHERE quiz_id = ? AND question_id = ?",
+                self._question_params(question) + (quiz_id, question_id),
+            )
+            self._pools.pop(quiz_id, None)
+        self._notify("question_updated", quiz_id=quiz_id, question=dict(question, id=question_id))
+
+    def delete_question(self, quiz_id, question_id):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM questions WHERE quiz_id = ? AND question_id = ?", (quiz_id, question_id))
+            self._pools.pop(quiz_id, None)
+        self._notify("question_deleted", quiz_id=quiz_id, question_id=question_id)
+
+    def get_questions_by_id(self, quiz_id, question_ids):
+        found = {}
+        for start in range(0, len(question_ids), 500): # Stays well under SQLite's bound-parameter limit
+            chunk = question_ids[start:start + 500]
+            # Looked up through the unique question_id index; filtering on quiz_id in SQL makes SQLite scan the quiz instead
+            rows = self._query(f"SELECT * FROM questions WHERE question_id IN ({', '.join('?' * len(chunk))})", chunk)
+            found.update((row["question_id"], self._question_from_row(row)) for row in rows if row["quiz_id"] == quiz_id)
+        return [found[question_id] for question_id in question_ids if question_id in found]
+
+    def question_pool(self, quiz_id):
+        with self._lock:
+            version = self.generation() # Edits committed by another connection change data_version
+            cached = self._pools.get(quiz_id)
+            if cached is None or cached[0] != version:
+                rows = self._conn.execute("SELECT question_id, topic FROM questions WHERE quiz_id = ? ORDER BY position", (quiz_id,)).fetchall()
+                cached = (version, QuestionPool((row["question_id"], row["topic"]) for row in rows))
+                self._pools[quiz_id] = cached
+            return cached[1]
+
+    def get_quiz_settings(self, quiz_id):
+        rows = self._query("SELECT draw_count, stratify_by_topic FROM quizzes WHERE quiz_id = ?", (quiz_id,))
+        if not rows:
+            return dict(DEFAULT_QUIZ_SETTINGS)
+        return {"draw_count": rows[0]["draw_count"], "stratify_by_topic": bool(rows[0]["stratify_by_topic"])}
+
+    def update_quiz_settings(self, quiz_id, settings):
+        with self.transaction() as conn:
+            conn.execute("UPDATE quizzes SET draw_count = ?, stratify_by_topic = ? WHERE quiz_id = ?", (settings["draw_count"], int(settings["stratify_by_topic"]), quiz_id))
+
+    @staticmethod
+    def _user_params(username, record):
+        return (username, record.get("password", ""), record.get("password_hash"), record["role"])
+
+    def get_users(self):
+        # Kept in memory so logins don't query the database; rebuilt after a user write here or a commit elsewhere
+        with self._lock:
+            generation = self.generation()
+            if self._users_cache is None or generation != self._users_generation:
+                rows = self._conn.execute("SELECT username, password, password_hash, role FROM users ORDER BY rowid").fetchall()
+                self._users_cache = {
+                    row["username"]: {"password_hash": row["password_hash"], "role": row["role"]} if row["password_hash"] else {"password": row["password"], "role": row["role"]}
+                    for row in rows
+                }
+                self._users_generation = generation
+            return self._users_cache
+
+    def get_user(self, username):
+        return self.get_users().get(username)
+
+    @contextlib.contextmanager
+    def _users_transaction(self):
+        with self.transaction() as conn:
+            self._users_cache = None
+            yield conn
+
+    def add_user(self, username, record):
+        with self._users_transaction() as conn:
+            conn.execute("INSERT INTO users (username, password, password_hash, role) VALUES (?, ?, ?, ?)", self._user_params(username, record))
+        self._notify("user_added", username=username, record=record)
+
+    def delete_user(self, username):
+        with self._users_transaction() as conn:
+            conn.execute("DELETE FROM users WHERE username = ?", (username,))
+            conn.execute("DELETE FROM attempts WHERE username = ?", (username,))
+            conn.execute("DELETE FROM attempt_history WHERE username = ?", (username,))
+        self._notify("user_deleted", username=username)
+
+    def add_users(self, records):
+        with self._users_transaction() as conn:
+            conn.executemany(
+                "INSERT INTO users (username, password, password_hash, role) VALUES (?, ?, ?, ?)",
+                [self._user_params(username, record) for username, record in records.items()],
+            )
+        for username, record in records.items():
+            self._notify("user_added", username=username, record=record)
+
+    def delete_users(self, usernames):
+        with self._users_transaction() as conn:
+            conn.executemany("DELETE FROM users WHERE username = ?", [(username,) for username in usernames])
+            conn.executemany("DELETE FROM attempts WHERE username = ?", [(username,) for username in usernames])
+            conn.executemany("DELETE FROM attempt_history WHERE username = ?", [(username,) for username in usernames])
+        for username in usernames:
+            self._notify("user_deleted", username=username)
+
+    def update_password_hashes(self, hashes):
+        with self._users_transaction() as conn:
+            conn.executemany("UPDATE users SET password = '', password_hash = ? WHERE username = ?", [(password_hash, username) for username, password_hash in hashes.items()])
+
+    @staticmethod
+    def _summary_from_row(row):
+        summary = {
+            "score": row["score"],
+            "total": row["total"],
+            "attempted": bool(row["attempted"]),
+            "answers_log": json.loads(row["answers_log"]),
+        }
+        if row["attempt_id"] is not None: # Rows saved before attempt IDs carry only the result
+            summary.update(attempt_id=row["attempt_id"], attempts=row["attempt_count"], best_score=row["best_score"], best_total=row["best_total"], completed_at=row["completed_at"])
+        return summary
+
+    @staticmethod
+    def _summary_params(username, quiz_id, summary):
+        return (
+            username, quiz_id, summary["score"], summary["total"], int(summary.get("attempted", False)), json.dumps(summary.get("answers_log", [])),
+            summary.get("attempt_id"), summary_attempt_count(summary), summary.get("best_score"), summary.get("best_total"), summary.get("completed_at"),
+        )
+
+    @staticmethod
+    def _history_params(attempt):
+        return (attempt["attempt_id"], attempt["username"], attempt["quiz_id"], attempt["number"], attempt["score"], attempt["total"], json.dumps(attempt["answers_log"]), attempt["completed_at"])
+
+    def get_user_progress(self, username):
+        rows = self._query("SELECT * FROM attempts WHERE username = ? ORDER BY id", (username,))
+        return {row["quiz_id"]: self._summary_from_row(row) for row in rows}
+
+    def ensure_user_progress(self, username):
+        pass # Users without attempt rows simply have no progress yet
+
+    def record_attempt(self, username, quiz_id, record):
+        with self.transaction() as conn:
+            row = conn.execute("SELECT * FROM attempts WHERE username = ? AND quiz_id = ?", (username, quiz_id)).fetchone()
+            summary = self._summary_from_row(row) if row else None
+            attempt = dict(new_attempt_record(username, quiz_id, record), number=summary_attempt_count(summary) + 1)
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO attempt_history (attempt_id, username, quiz_id, number, score, total, answers_log, completed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                self._history_params(attempt),
+            ).rowcount
+            if inserted: # Otherwise this attempt was committed before and nothing changes
+                summary = summarize_attempt(summary, attempt)
+                conn.execute(self.SUMMARY_UPSERT, self._summary_params(username, quiz_id, summary))
+        if inserted:
+            self._notify("attempt_recorded", username=username, quiz_id=quiz_id, record=summary)
+
+    def attempt_history(self, username, quiz_id):
+        rows = self._query("SELECT attempt_id, number, score, total, completed_at FROM attempt_history WHERE username = ? AND quiz_id = ? ORDER BY number", (username, quiz_id))
+        return [dict(row) for row in rows]
+
+    def get_attempt(self, attempt_id):
+        rows = self._query("SELECT * FROM attempt_history WHERE attempt_id = ?", (attempt_id,))
+        if not rows:
+            return None
+        attempt = dict(rows[0])
+        attempt["answers_log"] = json.loads(attempt["answers_log"])
+        return attempt
+
+    def _stream_rows(self, sql):
+        # Streams through a separate read connection in chunks, so large exports neither load every
+        # row at once nor hold the shared connection's lock (WAL lets readers run alongside writers)
+        conn = sqlite3.connect(self._db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            cursor = conn.execute(sql)
+            while True:
+                rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            conn.close()
+
+    def iter_attempts(self):
+        for row in self._stream_rows("SELECT * FROM attempts ORDER BY id"):
+            yield row["username"], row["quiz_id"], self._summary_from_row(row)
+
+    def iter_answer_logs(self):
+        for row in self._stream_rows("SELECT username, quiz_id, attempt_id, answers_log FROM attempt_history ORDER BY rowid"):
+            yield row["username"], row["quiz_id"], row["attempt_id"], json.loads(row["answers_log"])
+        for row in self._stream_rows("SELECT username, quiz_id, answers_log FROM attempts WHERE attempt_id IS NULL ORDER BY id"):
+            yield row["username"], row["quiz_id"], None, json.loads(row["answers_log"])
+
+    def rewrite_answer_logs(self, transform):
+        with self.transaction() as conn:
+            for table, key in (("attempts", "id"), ("attempt_history", "attempt_id")):
+                rows = conn.execute(f"SELECT {key}, quiz_id, answers_log FROM {table}").fetchall()
+                conn.executemany(
+                    f"UPDATE {table} SET answers_log = ? WHERE {key} = ?",
+                    [(json.dumps(transform(row["quiz_id"], json.loads(row["answers_log"]))), row[key]) for row in rows],
+                )
+
+    def performance_rows(self):
+        rows = self._query(
+            "SELECT u.username, a.quiz_id, a.score, a.total FROM users u "
+            "LEFT JOIN attempts a ON a.username = u.username AND a.attempted = 1 "
+            "WHERE u.role = 'student' ORDER BY u.rowid, a.id"
+        )
+        attempted_rows = [(row["username"], row["quiz_id"], row["score"], row["total"]) for row in rows if row["quiz_id"] is not None]
+        not_attempted = [row["username"] for row in rows if row["quiz_id"] is None]
+        return attempted_rows, not_attempted
+
+
+@st.cache_resource
+def get_storage():
+    """Returns the storage backend selected by STORAGE_BACKEND, shared by all sessions."""
+    if STORAGE_BACKEND == "sqlite":
+        return SqliteStorage(SQLITE_DB_FILE)
+    if os.path.exists(QUESTIONS_MANIFEST): # Question bank sharded by 'manage.py shard-questions'
+        return ShardedJsonStorage()
+    return JsonStorage()
+
+def import_json_into_sqlite(db_path):
+    """One-shot import of the JSON question bank, users and progress into a SQLite database.
+
+    Existing rows for the imported quizzes and users are replaced. Returns a dict of row counts.
+    """
+    json_storage = ShardedJsonStorage() if os.path.exists(QUESTIONS_MANIFEST) else JsonStorage()
+    # Loading through JsonStorage also assigns question IDs, which carry over into the database
+    questions_data = {quiz_id: json_storage.get_questions(quiz_id) for quiz_id in json_storage.list_quizzes()}
+    users_data = load_json_file(USERS_FILE, {})
+    progress_data = load_user_progress()
+
+    storage = SqliteStorage(db_path)
+    counts = {"quizzes": 0, "questions": 0, "users": 0, "attempts": 0}
+    with storage.transaction() as conn:
+        for quiz_id, quiz_questions in questions_data.items():
+            conn.execute("DELETE FROM quizzes WHERE quiz_id = ?", (quiz_id,))
+            settings = json_storage.get_quiz_settings(quiz_id)
+            conn.execute(
+                "INSERT INTO quizzes (quiz_id, position, draw_count, stratify_by_topic) VALUES (?, ?, ?, ?)",
+                (quiz_id, counts["quizzes"], settings["draw_count"], int(settings["stratify_by_topic"])),
+            )
+            counts["quizzes"] += 1
+            conn.executemany(
+                "INSERT INTO questions (question_id, quiz_id, position, question, options, correct_option, explanation, topic) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(q["id"], quiz_id, position) + SqliteStorage._question_params(q) for position, q in enumerate(quiz_questions)],
+            )
+            counts["questions"] += len(quiz_questions)
+        for username, user_data in users_data.items():
+            conn.execute(
+                "INSERT OR REPLACE INTO users (username, password, password_hash, role) VALUES (?, ?, ?, ?)",
+                SqliteStorage._user_params(username, user_data),
+            )
+            counts["users"] += 1
+        for username, user_quizzes in progress_data.items():
+            for quiz_id, quiz_data in user_quizzes.items():
+                # Skip entries from the legacy flat progress format, which are not per-quiz dicts
+                if not isinstance(quiz_data, dict) or "score" not in quiz_data:
+                    continue
+                conn.execute(SqliteStorage.SUMMARY_UPSERT, SqliteStorage._summary_params(username, quiz_id, quiz_data))
+                counts["attempts"] += 1
+                for entry in json_storage.attempt_history(username, quiz_id):
+                    conn.execute(
+                        "INSERT OR REPLACE INTO attempt_history (attempt_id, username, quiz_id, number, score, total, answers_log, completed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        SqliteStorage._history_params(json_storage.get_attempt(entry["attempt_id"])),
+                    )
+    return counts
+
+# --- Storage Listeners ---
+class _StorageListener:
+    """Base of the views built once from storage and then kept current by its events.
+
+    Subclasses implement _rebuild() and _apply_event(event, details), both called with the lock
+    held. A view is rebuilt only when _source_generation() shows another process changed the data.
+    """
+
+    def __init__(self, storage):
+        self._storage = storage
+        self._lock = threading.RLock()
+        self._generation = None
+        self._built = False
+        storage.add_listener(self)
+
+    def _source_generation(self):
+        return self._storage.generation()
+
+    def _rebuild(self):
+        raise NotImplementedError
+
+    def _apply_event(self, event, details):
+        raise NotImplementedError
+
+    @contextlib.contextmanager
+    def _current(self):
+        """Holds the lock with the view brought up to date."""
+        with self._lock:
+            generation = self._source_generation()
+            if not self._built or generation != self._generation:
+                self._rebuild()
+                self._generation = generation
+                self._built = True
+            yield
+
+    def storage_changed(self, event, **details):
+        with self._lock:
+            if self._built: # Before the first read there is nothing to update; that read builds from storage
+                self._apply_event(event, details)
+
+class _QuestionIndex(_StorageListener):
+    """Base of the views indexing every question of every quiz (QuestionSearch, DuplicateIndex).
+
+    Numbers the questions as docs in quiz and question order and follows the question events and
+    storage.question_generation(). Subclasses index a doc in _index(doc, quiz_id, question), which
+    returns its entry (quiz_id, question_id, question text, ...), and drop it in _unindex(doc, entry).
+    """
+
+    def _source_generation(self):
+        return self._storage.question_generation()
+
+    def _rebuild(self):
+        self._docs = {} # doc number -> entry
+        self._doc_numbers = {} # (quiz_id, question_id) -> doc number
+        self._quiz_docs = {} # quiz_id -> {doc number}
+        self._next_doc = 0
+        for quiz_id in self._storage.list_quizzes():
+            for question in self._storage.get_questions(quiz_id):
+                self._add(quiz_id, question)
+
+    def _index(self, doc, quiz_id, question):
+        raise NotImplementedError
+
+    def _unindex(self, doc, entry):
+        raise NotImplementedError
+
+    def _add(self, quiz_id, question):
+        doc = self._next_doc
+        self._next_doc += 1
+        self._docs[doc] = self._index(doc, quiz_id, question)
+        self._doc_numbers[(quiz_id, question["id"])] = doc
+        self._quiz_docs.setdefault(quiz_id, set()).add(doc)
+
+    def _remove(self, quiz_id, question_id):
+        doc = self._doc_numbers.pop((quiz_id, question_id), None)
+        if doc is None:
+            return
+        self._quiz_docs[quiz_id].discard(doc)
+        self._unindex(doc, self._docs.pop(doc))
+
+    def _apply_event(self, event, details):
+        if event == "questions_added":
+            for question in details["questions"]:
+                self._add(details["quiz_id"], question)
+        elif event == "question_updated":
+            self._remove(details["quiz_id"], details["question"]["id"])
+            self._add(details["quiz_id"], details["question"])
+        elif event == "question_deleted":
+            self._remove(details["quiz_id"], details["question_id"])
+        elif event == "quiz_deleted":
+            for doc in list(self._quiz_docs.get(details["quiz_id"], ())):
+                self._remove(details["quiz_id"], self._docs[doc][1])
+            self._quiz_docs.pop(details["quiz_id"], None)
+
+# --- Performance Summary ---
+class PerformanceSummary(_StorageListener):
+    """Materialized per-student and per-quiz performance totals for View Trainee Performance.
+
+    Kept current in O(1) per committed attempt or user change (deleting a quiz touches only the
+    students who took it).
+    """
+
+    def _empty_totals(self):
+        return {"attempts": 0, "score_sum": 0, "total_sum": 0}
+
+    def _rebuild(self):
+        self.students = {}  # username -> totals, for every student account
+        self.quizzes = {}  # quiz_id -> totals
+        self.results = {}  # username -> {quiz_id: (score, total)}
+        self.quiz_takers = {}  # quiz_id -> {username: None}, to undo a quiz deletion per taker
+        self.attempted = {}  # Ordered sets (dicts with None values) of student usernames
+        self.not_attempted = {}
+        self.result_count = 0
+        attempted_rows, not_attempted = self._storage.performance_rows() # One indexed query on SQLite
+        for username, quiz_id, score, total in attempted_rows:
+            self._add_student(username)
+            self._set_score(username, quiz_id, score, total)
+        for username in not_attempted:
+            self._add_student(username)
+
+    def _add_student(self, username):
+        if username not in self.students:
+            self.students[username] = self._empty_totals()
+            self.results[username] = {}
+            self.not_attempted[username] = None
+
+    def _apply(self, username, quiz_id, score, total, sign):
+        for totals in (self.students[username], self.quizzes.setdefault(quiz_id, self._empty_totals())):
+            totals["attempts"] += sign
+            totals["score_sum"] += sign * score
+            totals["total_sum"] += sign * total
+        self.result_count += sign
+        if self.students[username]["attempts"] == 0:
+            self.attempted.pop(username, None)
+            self.not_attempted[username] = None
+        else:
+            self.not_attempted.pop(username, None)
+            self.attempted[username] = None
+
+    def _set_score(self, username, quiz_id, score, total):
+        if username not in self.students:
+            return
+        previous = self.results[username].get(quiz_id)
+        if previous is not None:
+            self._apply(username, quiz_id, previous[0], previous[1], -1)
+        self.results[username][quiz_id] = (score, total)
+        self.quiz_takers.setdefault(quiz_id, {})[username] = None
+        self._apply(username, quiz_id, score, total, 1)
+
+    def _remove_result(self, username, quiz_id):
+        score, total = self.results[username].pop(quiz_id)
+        self.quiz_takers.get(quiz_id, {}).pop(username, None)
+        self._apply(username, quiz_id, score, total, -1)
+
+    def _apply_event(self, event, details):
+        if event == "attempt_recorded" and details["record"].get("attempted"):
+            self._set_score(details["username"], details["quiz_id"], details["record"]["score"], details["record"]["total"])
+        elif event == "user_added" and details["record"]["role"] == "student":
+            self._add_student(details["username"])
+        elif event == "user_deleted" and details["username"] in self.students:
+            username = details["username"]
+            for quiz_id in list(self.results[username]):
+                self._remove_result(username, quiz_id)
+            del self.students[username], self.results[username]
+            self.not_attempted.pop(username, None)
+        elif event == "quiz_deleted":
+            quiz_id = details["quiz_id"]
+            for username in list(self.quiz_takers.get(quiz_id, {})):
+                self._remove_result(username, quiz_id)
+            self.quizzes.pop(quiz_id, None)
+            self.quiz_takers.pop(quiz_id, None)
+
+    def overview(self):
+        """Returns headline counts and the overall accuracy across all results."""
+        with self._current():
+            score_sum = sum(totals["score_sum"] for totals in self.quizzes.values())
+            total_sum = sum(totals["total_sum"] for totals in self.quizzes.values())
+            return {
+                "students": len(self.students),
+                "attempted": len(self.attempted),
+                "not_attempted": len(self.not_attempted),
+                "results": self.result_count,
+                "accuracy": (score_sum / total_sum * 100) if total_sum > 0 else 0,
+            }
+
+    def quiz_rows(self):
+        """Returns one summary row per quiz that has results."""
+        with self._current():
+            return [
+                {
+                    "Quiz Name": quiz_id,
+                    "Students": totals["attempts"],
+                    "Average Score": f"{totals['score_sum'] / totals['attempts']:.2f}" if totals["attempts"] else "0.00",
+                    "Accuracy": f"{(totals['score_sum'] / totals['total_sum'] * 100) if totals['total_sum'] > 0 else 0:.2f}%",
+                }
+                for quiz_id, totals in self.quizzes.items() if totals["attempts"]
+            ]
+
+    def iter_attempted_rows(self):
+        """Yields (username, quiz_id, score, total) for every result, grouped by student."""
+        with self._current():
+            rows = [(username, quiz_id, score, total) for username in self.attempted for quiz_id, (score, total) in self.results[username].items()]
+        yield from rows
+
+    def attempted_rows_page(self, offset, limit):
+        """Returns up to limit (username, quiz_id, score, total) rows starting at offset."""
+        with self._current():
+            rows = (
+                (username, quiz_id, score, total)
+                for username in self.attempted for quiz_id, (score, total) in self.results[username].items()
+            )
+            return list(itertools.islice(rows, offset, offset + limit))
+
+    def not_attempted_page(self, offset, limit):
+        with self._current():
+            return list(itertools.islice(self.not_attempted, offset, offset + limit))
+
+    def not_attempted_usernames(self):
+        with self._current():
+            return list(self.not_attempted)
+
+@st.cache_resource
+def get_performance_summary():
+    """Returns the process-wide PerformanceSummary, kept current by storage events."""
+    return PerformanceSummary(get_storage())
+
+def performance_row(username, quiz_id, score, total):
+    """Formats one attempted-quiz row for display and CSV export."""
+    accuracy = (score / total * 100) if total > 0 else 0
+    return {
+        "Student ID": username,
+        "Quiz Name": quiz_id,
+        "Score": f"{score} / {total}",
+        "Accuracy": f"{accuracy:.2f}%"
+    }
+
+def attempted_students_csv():
+    """Builds the attempted-students CSV; only called when the download is requested."""
+    rows = (performance_row(*row).values() for row in get_performance_summary().iter_attempted_rows())
+    return build_export_file(rows, ["Student ID", "Quiz Name", "Score", "Accuracy"], "CSV")
+
+def not_attempted_students_csv():
+    """Builds the not-attempted-students CSV; only called when the download is requested."""
+    rows = ((username,) for username in get_performance_summary().not_attempted_usernames())
+    return build_export_file(rows, ["Student ID"], "CSV")
+
+# --- Leaderboards ---
+LEADERBOARD_OVERALL = None # Board key of the overall leaderboard; quiz boards are keyed by quiz_id
+
+class _RankedBoard:
+    """Sorted list of (negated metric, username) entries, stored as chunks of about LEADERBOARD_CHUNK_ENTRIES.
+
+    Adding or removing an entry bisects the chunk maxima and shifts one chunk, so a result update
+    no longer moves the whole board. A rank adds up the lengths of the chunks before its own.
+    """
+
+    def __init__(self, entries):
+        # entries: already sorted
+        self._chunks = [entries[start:start + LEADERBOARD_CHUNK_ENTRIES] for start in range(0, len(entries), LEADERBOARD_CHUNK_ENTRIES)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._len = len(entries)
+
+    def __len__(self):
+        return self._len
+
+    def add(self, entry):
+        if not self._chunks:
+            self._chunks, self._maxes = [[entry]], [entry]
+        else:
+            index = min(bisect.bisect_left(self._maxes, entry), len(self._maxes) - 1)
+            chunk = self._chunks[index]
+            bisect.insort(chunk, entry)
+            self._maxes[index] = chunk[-1]
+            if len(chunk) > 2 * LEADERBOARD_CHUNK_ENTRIES:
+                half = len(chunk) // 2
+                self._chunks[index:index + 1] = [chunk[:half], chunk[half:]]
+                self._maxes[index:index + 1] = [chunk[half - 1], chunk[-1]]
+        self._len += 1
+
+    def remove(self, entry):
+        index = bisect.bisect_left(self._maxes, entry)
+        chunk = self._chunks[index]
+        del chunk[bisect.bisect_left(chunk, entry)]
+        if chunk:
+            self._maxes[index] = chunk[-1]
+        else:
+            del self._chunks[index], self._maxes[index]
+        self._len -= 1
+
+    def bisect_left(self, key):
+        """Returns the number of entries sorting before key."""
+        index = bisect.bisect_left(self._maxes, key)
+        if index == len(self._maxes):
+            return self._len
+        return sum(len(chunk) for chunk in self._chunks[:index]) + bisect.bisect_left(self._chunks[index], key)
+
+    def head(self, limit):
+        """Returns the first limit entries."""
+        return list(itertools.islice(itertools.chain.from_iterable(self._chunks), limit))
+
+class Leaderboards(_StorageListener):
+    """Per-quiz and overall rankings of students' best results, for the Leaderboard page.
+
+    A quiz board ranks students by the accuracy of their best attempt; the overall board by the
+    sum of their best scores. Each board is a _RankedBoard of (negated metric, username), so the
+    top of a board is its head and a student's rank one bisect. Tied students share the rank of
+    the first of them (1, 2, 2, 4).
+    """
+
+    def _rebuild(self):
+        self._best = {} # username -> {quiz_id: (best score, best total)}, for every student account
+        self._boards = {} # board key -> _RankedBoard of (negated metric, username)
+        self._metrics = {} # board key -> {username: negated metric}
+        for username, user_data in self._storage.get_users().items():
+            self._add_student(username, user_data)
+        for username, quiz_id, record in self._storage.iter_attempts():
+            if username in self._best and record.get("attempted"):
+                self._best[username][quiz_id] = self._best_result(record)
+        for username, results in self._best.items(): # Sort each board once rather than inserting one by one
+            for quiz_id, (score, total) in results.items():
+                self._metrics.setdefault(quiz_id, {})[username] = self._quiz_metric(score, total)
+            if results:
+                self._metrics.setdefault(LEADERBOARD_OVERALL, {})[username] = self._overall_metric(results)
+        self._boards = {board: _RankedBoard(sorted((metric, username) for username, metric in metrics.items())) for board, metrics in self._metrics.items()}
+
+    @staticmethod
+    def _best_result(record):
+        return record.get("best_score", record["score"]), record.get("best_total", record["total"])
+
+    @staticmethod
+    def _quiz_metric(score, total):
+        return -(score / total) if total > 0 else 0.0
+
+    @staticmethod
+    def _overall_metric(results):
+        return -sum(score for score, _ in results.values())
+
+    def _add_student(self, username, user_data):
+        if user_data["role"] == "student":
+            self._best.setdefault(username, {})
+
+    def _place(self, board, username, metric):
+        if self._metrics.get(board, {}).get(username) == metric:
+            return # A retake that didn't beat the best result leaves the board as it is
+        self._unplace(board, username)
+        self._boards.setdefault(board, _RankedBoard([])).add((metric, username))
+        self._metrics.setdefault(board, {})[username] = metric
+
+    def _unplace(self, board, username):
+        metric = self._metrics.get(board, {}).pop(username, None)
+        if metric is None:
+            return
+        entries = self._boards[board]
+        entries.remove((metric, username))
+        if not entries:
+            del self._boards[board], self._metrics[board]
+
+    def _place_overall(self, username):
+        results = self._best[username]
+        if results:
+            self._place(LEADERBOARD_OVERALL, username, self._overall_metric(results))
+        else:
+            self._unplace(LEADERBOARD_OVERALL, username)
+
+    def _set_result(self, username, quiz_id, record):
+        if username not in self._best or not record.get("attempted"):
+            return
+        score, total = self._best[username][quiz_id] = self._best_result(record)
+        self._place(quiz_id, username, self._quiz_metric(score, total))
+        self._place_overall(username)
+
+    def _apply_event(self, event, details):
+        if event == "attempt_recorded":
+            self._set_result(details["username"], details["quiz_id"], details["record"])
+        elif event == "user_added":
+            self._add_student(details["username"], details["record"])
+        elif event == "user_deleted" and details["username"] in self._best:
+            username = details["username"]
+            for quiz_id in self._best.pop(username):
+                self._unplace(quiz_id, username)
+            self._unplace(LEADERBOARD_OVERALL, username)
+        elif event == "quiz_deleted":
+            quiz_id = details["quiz_id"]
+            for username in list(self._metrics.get(quiz_id, ())):
+                self._unplace(quiz_id, username)
+                del self._best[username][quiz_id]
+                self._place_overall(username)
+
+    def _rank(self, board, metric):
+        return self._boards[board].bisect_left((metric,)) + 1 # (metric,) sorts before every entry with that metric
+
+    def _row(self, board, username, rank):
+        results = self._best[username]
+        if board is LEADERBOARD_OVERALL:
+            score, total = sum(score for score, _ in results.values()), sum(total for _, total in results.values())
+            return {"rank": rank, "username": username, "score": score, "total": total, "quizzes": len(results)}
+        score, total = results[board]
+        return {"rank": rank, "username": username, "score": score, "total": total}
+
+    def boards(self):
+        """Returns the quiz IDs that have a leaderboard (at least one ranked student)."""
+        with self._current():
+            return [board for board in self._boards if board is not LEADERBOARD_OVERALL]
+
+    def top(self, board=LEADERBOARD_OVERALL, limit=LEADERBOARD_SIZE):
+        """Returns (the first limit rows of a board, number of further students tied with the last row).
+
+        Each row is {"rank", "username", "score", "total"} (plus "quizzes" on the overall board).
+        """
+        with self._current():
+            entries = self._boards.get(board, _RankedBoard([]))
+            rows, rank, previous_metric = [], 0, None
+            for position, (metric, username) in enumerate(entries.head(limit), start=1):
+                if metric != previous_metric:
+                    rank, previous_metric = position, metric
+                rows.append(self._row(board, username, rank))
+            if len(entries) <= limit:
+                return rows, 0
+            tied = entries.bisect_left((previous_metric, "\U0010ffff")) - limit # Entries after the last row with its metric
+            return rows, max(tied, 0)
+
+    def standing(self, username, board=LEADERBOARD_OVERALL):
+        """Returns a student's row on a board plus "of" (students ranked), or None if not on it."""
+        with self._current():
+            metric = self._metrics.get(board, {}).get(username)
+            if metric is None:
+                return None
+            return dict(self._row(board, username, self._rank(board, metric)), of=len(self._boards[board]))
+
+@st.cache_resource
+def get_leaderboards():
+    """Returns the process-wide Leaderboards, kept current by storage events."""
+    return Leaderboards(get_storage())
+
+# --- Performance Export ---
+# Exports stream rows from storage in chunks of EXPORT_CHUNK_ROWS straight into the output
+# file (a spooled temp file for downloads, the target file for manage.py), so no DataFrame of
+# every attempt is ever built. Parquet output needs the optional pyarrow package.
+EXPORT_FORMATS = {
+    "CSV": {"extension": "csv", "mime": "text/csv"},
+    "CSV (gzip)": {"extension": "csv.gz", "mime": "application/gzip"},
+    "Parquet": {"extension": "parquet", "mime": "application/vnd.apache.parquet"},
+}
+
+def available_export_formats():
+    """Returns the EXPORT_FORMATS names usable here; Parquet only when pyarrow is installed."""
+    return [name for name in EXPORT_FORMATS if name != "Parquet" or importlib.util.find_spec("pyarrow") is not None]
+
+SUMMARY_EXPORT_COLUMNS = ["Student ID", "Quiz Name", "Score", "Total", "Accuracy (%)"]
+DETAIL_EXPORT_COLUMNS = ["Student ID", "Quiz Name", "Attempt ID", "Question No", "Question ID", "Question", "Selected Answer", "Correct Answer", "Is Correct"]
+
+def iter_summary_export_rows(storage):
+    """Yields one row per attempted quiz, straight from the progress store."""
+    for username, quiz_id, record in storage.iter_attempts():
+        if record.get("attempted"):
+            accuracy = (record["score"] / record["total"] * 100) if record["total"] > 0 else 0
+            yield (username, quiz_id, record["score"], record["total"], round(accuracy, 2))
+
+def iter_detail_export_rows(storage):
+    """Yields one row per logged answer of every attempt, with question text re-hydrated from the bank.
+
+    Results saved before attempt IDs have an empty Attempt ID.
+    """
+    question_indexes = {}
+    for username, quiz_id, attempt_id, answers_log in storage.iter_answer_logs():
+        if quiz_id not in question_indexes:
+            question_indexes[quiz_id] = storage.get_question_index(quiz_id)
+        for number, (entry, answer) in enumerate(zip(answers_log, hydrate_answer_log(answers_log, question_indexes[quiz_id])), start=1):
+            question_id = entry.get("q") if isinstance(entry.get("q"), str) else ""
+            yield (username, quiz_id, attempt_id or "", number, question_id, answer["question"], answer["selected_answer"], answer["correct_answer"], answer["is_correct"])
+
+def iter_row_chunks(rows, chunk_size):
+    """Groups an iterator of rows into lists of at most chunk_size rows."""
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def write_export(rows, columns, export_format, binary_file):
+    """Streams rows into binary_file as CSV, gzip-compressed CSV or Parquet."""
+    if export_format == "Parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs the optional 'pyarrow' package (pip install pyarrow).")
+        writer = None
+        for chunk in iter_row_chunks(rows, EXPORT_CHUNK_ROWS):
+            table = pa.Table.from_pydict({column: list(values) for column, values in zip(columns, zip(*chunk))})
+            if writer is None:
+                writer = pq.ParquetWriter(binary_file, table.schema)
+            writer.write_table(table.cast(writer.schema))
+        if writer is None: # No rows: still produce a valid file with the column names
+            writer = pq.ParquetWriter(binary_file, pa.schema([(column, pa.string()) for column in columns]))
+        writer.close()
+        return
+    compressed = gzip.GzipFile(fileobj=binary_file, mode="wb") if export_format == "CSV (gzip)" else None
+    text_file = io.TextIOWrapper(compressed or binary_file, encoding="utf-8", newline="")
+    csv_writer = csv.writer(text_file)
+    csv_writer.writerow(columns)
+    for chunk in iter_row_chunks(rows, EXPORT_CHUNK_ROWS):
+        csv_writer.writerows(chunk)
+    text_file.flush()
+    text_file.detach() # Leave binary_file open for the caller
+    if compressed is not None:
+        compressed.close()
+
+def build_export_file(rows, columns, export_format):
+    """Writes an export through a spooled temp file and returns its bytes for st.download_button."""
+    with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES) as export_file:
+        write_export(rows, columns, export_format, export_file)
+        export_file.seek(0)
+        return export_file.read() # The download button needs the finished bytes
+
+def build_performance_export(kind, export_format):
+    """Builds the "summary" (latest result per attempted quiz) or "detail" (one row per answer, every attempt) export."""
+    storage = get_storage()
+    if kind == "detail":
+        return build_export_file(iter_detail_export_rows(storage), DETAIL_EXPORT_COLUMNS, export_format)
+    return build_export_file(iter_summary_export_rows(storage), SUMMARY_EXPORT_COLUMNS, export_format)
+
+# --- Compact Answer Logs ---
+# answers_log entries only store {"q": question ID, "a": chosen option index, "c": 1/0}.
+# Display text is re-hydrated from the question bank at view time through the quiz's
+# ID index, so reviews keep working after a question is edited. Older entries that
+# hold a question position (int) or the full question text are still understood.
+def compact_answer(question, selected_option):
+    """Builds the compact answers_log entry for one submitted answer."""
+    return {
+        "q": question["id"],
+        "a": question["options"].index(selected_option),
+        "c": int(selected_option == question["correct_option"]),
+    }
+
+def hydrate_answer_log(answers_log, question_index):
+    """Expands answers_log entries into display dicts (question, selected/correct answer, explanation).
+
+    question_index is the quiz's question ID -> question dict from StorageBackend.get_question_index().
+    """
+    questions_in_order = None # Only materialised for legacy entries
+    questions_by_text = None
+    hydrated = []
+    for entry in answers_log:
+        if "question" in entry: # Legacy full-text entry
+            if questions_by_text is None:
+                questions_by_text = {q["question"]: q for q in question_index.values()}
+            original_question_data = questions_by_text.get(entry["question"])
+            hydrated.append(dict(entry, explanation=original_question_data["explanation"] if original_question_data else entry.get("explanation", "")))
+            continue
+        question_ref = entry["q"]
+        if isinstance(question_ref, int): # Legacy position reference
+            if questions_in_order is None:
+                questions_in_order = list(question_index.values())
+            question = questions_in_order[question_ref] if 0 <= question_ref < len(questions_in_order) else None
+        else:
+            question = question_index.get(question_ref)
+        if question is None:
+            hydrated.append({
+                "question": "(This question has since been removed from the quiz.)",
+                "selected_answer": "-",
+                "correct_answer": "-",
+                "is_correct": bool(entry["c"]),
+                "explanation": "",
+            })
+            continue
+        options = question["options"]
+        hydrated.append({
+            "question": question["question"],
+            "selected_answer": options[entry["a"]] if 0 <= entry["a"] < len(options) else "-",
+            "correct_answer": question["correct_option"],
+            "is_correct": bool(entry["c"]),
+            "explanation": question.get("explanation", ""),
+        })
+    return hydrated
+
+def answer_log_question_index(storage, quiz_id, answers_log):
+    """Returns the question index hydrate_answer_log() needs, loading only the logged questions when it can."""
+    if all(isinstance(entry.get("q"), str) for entry in answers_log):
+        return {question["id"]: question for question in storage.get_questions_by_id(quiz_id, [entry["q"] for entry in answers_log])}
+    return storage.get_question_index(quiz_id) # Legacy entries are matched by text or position
+
+def compact_legacy_answer_log(questions, answers_log):
+    """Converts full-text and position-based answers_log entries to the compact ID format.
+
+    Entries whose question or chosen option can no longer be matched in the bank are kept as they are.
+    """
+    positions = {q["question"]: i for i, q in enumerate(questions)}
+    compacted = []
+    for entry in answers_log:
+        if "question" in entry:
+            position = positions.get(entry["question"])
+            if position is None or entry.get("selected_answer") not in questions[position]["options"]:
+                compacted.append(entry)
+                continue
+            compacted.append({
+                "q": questions[position]["id"],
+                "a": questions[position]["options"].index(entry["selected_answer"]),
+                "c": int(bool(entry["is_correct"])),
+            })
+        elif isinstance(entry["q"], int) and 0 <= entry["q"] < len(questions):
+            compacted.append(dict(entry, q=questions[entry["q"]]["id"]))
+        else:
+            compacted.append(entry)
+    return compacted
+
+def migrate_answer_logs(storage):
+    """Rewrites every stored answers_log in the compact ID format. Safe to run more than once."""
+    bank = {quiz_id: storage.get_questions(quiz_id) for quiz_id in storage.list_quizzes()}
+    storage.rewrite_answer_logs(lambda quiz_id, answers_log: compact_legacy_answer_log(bank.get(quiz_id, []), answers_log))
+
+# --- Item Analytics ---
+# Every stored answer of every attempt, including earlier attempts kept in the attempt history, is
+# flattened into one columnar DataFrame (one row per answer), and the per-question statistics are
+# computed with vectorized group-bys over it. Both are rebuilt only when the answer data changes:
+# on a storage event in this process, or a new storage generation.
+ITEM_TOO_EASY = 0.9 # Difficulty index (share answering correctly) above which a question is flagged too easy
+ITEM_TOO_HARD = 0.3 # ... and below which it is flagged too hard
+ITEM_LOW_DISCRIMINATION = 0.2 # Item-rest correlation below which a question barely separates strong from weak students
+
+def build_answer_frame(storage):
+    """Flattens every attempt's answers_log into columns: attempt, username, quiz_id, question_id, option, correct.
+
+    attempt numbers the attempts within the frame, so answers of the same attempt can be grouped.
+    """
+    columns = {"attempt": [], "username": [], "quiz_id": [], "question_id": [], "option": [], "correct": []}
+    bank = {}
+    for attempt_number, (username, quiz_id, _, answers_log) in enumerate(storage.iter_answer_logs()):
+        if any("question" in entry or isinstance(entry["q"], int) for entry in answers_log):
+            if quiz_id not in bank:
+                bank[quiz_id] = storage.get_questions(quiz_id)
+            answers_log = compact_legacy_answer_log(bank[quiz_id], answers_log)
+        for entry in answers_log:
+            if "question" in entry or isinstance(entry["q"], int):
+                continue # Legacy entry whose question is no longer in the bank
+            columns["attempt"].append(attempt_number)
+            columns["username"].append(username)
+            columns["quiz_id"].append(quiz_id)
+            columns["question_id"].append(entry["q"])
+            columns["option"].append(entry["a"])
+            columns["correct"].append(entry["c"])
+    return pd.DataFrame({
+        "attempt": pd.Series(columns["attempt"], dtype="int64"),
+        "username": pd.Categorical(columns["username"]),
+        "quiz_id": pd.Categorical(columns["quiz_id"]),
+        "question_id": pd.Categorical(columns["question_id"]),
+        "option": pd.Series(columns["option"], dtype="int16"),
+        "correct": pd.Series(columns["correct"], dtype="int8"),
+    })
+
+def compute_item_statistics(answers):
+    """Returns (items, options) DataFrames for an answer frame from build_answer_frame().
+
+    items has one row per (quiz_id, question_id): answers, difficulty (share correct) and
+    discrimination (correlation of the item with the rest of the attempt's score).
+    options has one row per (quiz_id, question_id, option) with its selection count and share.
+    """
+    keys = ["quiz_id", "question_id"]
+    x = answers["correct"].astype("float64")
+    # Rest score: the attempt's total correct answers, excluding the item itself
+    y = answers.groupby("attempt")["correct"].transform("sum").astype("float64") - x
+    moments = pd.DataFrame({"quiz_id": answers["quiz_id"], "question_id": answers["question_id"], "x": x, "y": y, "xx": x * x, "yy": y * y, "xy": x * y})
+    sums = moments.groupby(keys, observed=True).sum()
+    n = moments.groupby(keys, observed=True).size()
+    covariance = n * sums["xy"] - sums["x"] * sums["y"]
+    spread = (n * sums["xx"] - sums["x"] ** 2) * (n * sums["yy"] - sums["y"] ** 2)
+    items = pd.DataFrame({
+        "answers": n,
+        "difficulty": sums["x"] / n,
+        "discrimination": (covariance / spread.where(spread > 0) ** 0.5), # NaN when everyone scored alike
+    }).reset_index()
+
+    options = answers.groupby(keys + ["option"], observed=True).size().rename("count").reset_index()
+    options["share"] = options["count"] / options.groupby(keys, observed=True)["count"].transform("sum")
+    return items, options
+
+def item_flags(difficulty, discrimination, misleading_distractor):
+    """Returns a short comma-separated list of review flags for one question."""
+    flags = []
+    if difficulty > ITEM_TOO_EASY:
+        flags.append("Too easy")
+    elif difficulty < ITEM_TOO_HARD:
+        flags.append("Too hard")
+    if pd.notna(discrimination) and discrimination < ITEM_LOW_DISCRIMINATION:
+        flags.append("Negative discrimination" if discrimination < 0 else "Low discrimination")
+    if misleading_distractor:
+        flags.append("Misleading distractor")
+    return ", ".join(flags)
+
+# Events that change the answer frame. The statistics are joined to the current question bank at view
+# time, so new questions, question text edits and new users don't invalidate them; deleted users and
+# quizzes take their attempts with them, and deleting a question shifts legacy position-based logs.
+ITEM_ANALYTICS_EVENTS = frozenset({"attempt_recorded", "user_deleted", "quiz_deleted", "question_deleted"})
+
+class ItemAnalytics(_StorageListener):
+    """Per-question analytics over all stored answers, recomputed only when the answer data changes."""
+
+    def __init__(self, storage):
+        self._changes = itertools.count()
+        self._change = next(self._changes)
+        super().__init__(storage)
+
+    def _source_generation(self):
+        return (self._storage.generation(), self._change)
+
+    def _rebuild(self):
+        answers = build_answer_frame(self._storage)
+        self._result = (answers,) + compute_item_statistics(answers)
+
+    def storage_changed(self, event, **details):
+        # Only marks the result stale, without taking the lock, so writers never wait on a recompute
+        if event in ITEM_ANALYTICS_EVENTS:
+            self._change = next(self._changes)
+
+    def statistics(self):
+        """Returns (answers, items, options) for the current answer data."""
+        with self._current():
+            return self._result
+
+@st.cache_resource
+def get_item_analytics():
+    """Returns the process-wide ItemAnalytics, invalidated by storage events."""
+    return ItemAnalytics(get_storage())
+
+# --- Question Search ---
+def search_terms(text):
+    """Splits text into lowercase word terms."""
+    return re.findall(r"\w+", text.lower())
+
+class QuestionSearch(_QuestionIndex):
+    """Inverted index over question text, options, explanations and topics across all quizzes.
+
+    A query term matches every indexed
+    term it prefixes: the vocabulary is kept sorted, so the matching terms are one bisected slice,
+    and the terms of a query are ANDed. A lookup costs the postings of the matching terms, never a
+    scan of the bank.
+    """
+
+    def _rebuild(self):
+        self._postings = {} # term -> {doc number}
+        self._vocabulary = None # Sorted terms, sorted once after the rebuild
+        super()._rebuild() # Doc numbers follow quiz and question order, so results sort by them
+        self._vocabulary = sorted(self._postings)
+
+    def _index(self, doc, quiz_id, question):
+        text = " ".join([question["question"], *question["options"], question.get("explanation", ""), question.get("topic", "")])
+        terms = frozenset(search_terms(text))
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = set()
+                if self._vocabulary is not None:
+                    bisect.insort(self._vocabulary, term)
+            postings.add(doc)
+        return (quiz_id, question["id"], question["question"], terms)
+
+    def _unindex(self, doc, entry):
+        for term in entry[3]:
+            postings = self._postings[term]
+            postings.discard(doc)
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, term)]
+
+    def search(self, query, limit=QUESTION_SEARCH_RESULTS):
+        """Returns (the first limit matches as {"quiz_id", "question_id", "question"}, total number of matches)."""
+        terms = set(search_terms(query))
+        if not terms:
+            return [], 0
+        with self._current():
+            term_matches = []
+            for term in terms:
+                start = bisect.bisect_left(self._vocabulary, term)
+                end = bisect.bisect_left(self._vocabulary, term + "\U0010ffff")
+                term_matches.append(set().union(*(self._postings[t] for t in self._vocabulary[start:end])))
+            term_matches.sort(key=len) # Intersect from the rarest term
+            matches = term_matches[0].intersection(*term_matches[1:])
+            hits = []
+            for doc in heapq.nsmallest(limit, matches):
+                quiz_id, question_id, question_text, _ = self._docs[doc]
+                hits.append({"quiz_id": quiz_id, "question_id": question_id, "question": question_text})
+            return hits, len(matches)
+
+@st.cache_resource
+def get_question_search():
+    """Returns the process-wide QuestionSearch index, kept current by storage events."""
+    return QuestionSearch(get_storage())
+
+# --- Near-Duplicate Questions ---
+# Questions are compared by the word-pair shingles of their text and options (options sorted, so
+# reordering them changes nothing). Each question gets a MinHash signature of
+# DUPLICATE_MINHASH_BANDS * DUPLICATE_MINHASH_ROWS values, and locality-sensitive hashing files it
+# under one bucket per band. Only questions sharing a bucket are compared, so a check never scans
+# the bank and a batch scan stays far below comparing every pair.
+_MINHASH_RNG = np.random.default_rng(20240601) # Fixed, so signatures are comparable across rebuilds
+_MINHASH_A = _MINHASH_RNG.integers(1, 2 ** 63, DUPLICATE_MINHASH_BANDS * DUPLICATE_MINHASH_ROWS, dtype=np.uint64) | np.uint64(1)
+_MINHASH_B = _MINHASH_RNG.integers(0, 2 ** 63, DUPLICATE_MINHASH_BANDS * DUPLICATE_MINHASH_ROWS, dtype=np.uint64)
+
+def question_shingles(question):
+    """Returns the set of word-pair shingles of a question's text and (sorted) options."""
+    words = search_terms(question["question"] + " " + " ".join(sorted(option.lower() for option in question["options"])))
+    if len(words) < 2:
+        return set(words)
+    return {f"{first} {second}" for first, second in zip(words, words[1:])}
+
+def shingle_hashes(question):
+    """Returns the sorted, distinct 64-bit hashes of a question's shingles."""
+    # hash() is salted per process, which is fine: hashes and signatures live only in this process's index
+    shingles = question_shingles(question) or {""}
+    return np.unique(np.fromiter((hash(shingle) & 0xFFFFFFFFFFFFFFFF for shingle in shingles), dtype=np.uint64, count=len(shingles)))
+
+def minhash_signature(hashes):
+    """MinHash signature of a set of shingle hashes, by multiply-shift hashing of each one."""
+    return ((np.outer(_MINHASH_A, hashes) + _MINHASH_B[:, None]) >> np.uint64(32)).min(axis=1).astype(np.uint32)
+
+def shingle_similarity(hashes, other_hashes):
+    """Exact Jaccard similarity of two shingle hash sets."""
+    shared = np.intersect1d(hashes, other_hashes, assume_unique=True).size
+    return shared / (hashes.size + other_hashes.size - shared)
+
+def signature_bands(signature):
+    """Returns the LSH bucket keys of a signature, one per band."""
+    rows = DUPLICATE_MINHASH_ROWS
+    return [hash((band, signature[band * rows:(band + 1) * rows].tobytes())) for band in range(DUPLICATE_MINHASH_BANDS)]
+
+class DuplicateIndex(_QuestionIndex):
+    """LSH index of MinHash signatures for every question, for near-duplicate checks and scans.
+
+    Signatures are rows of one matrix indexed by doc
+    number, so a question is compared with all its bucket-mates in a single numpy operation;
+    pairs whose estimate comes close are then confirmed with their exact shingle similarity.
+    """
+
+    def _rebuild(self):
+        self._signatures = np.empty((1024, DUPLICATE_MINHASH_BANDS * DUPLICATE_MINHASH_ROWS), dtype=np.uint32) # Row per doc number
+        self._buckets = {} # bucket key -> doc number, or a list of them once shared (most buckets hold one)
+        super()._rebuild()
+
+    def _index(self, doc, quiz_id, question):
+        hashes = shingle_hashes(question)
+        signature = minhash_signature(hashes)
+        keys = signature_bands(signature)
+        if doc == len(self._signatures):
+            self._signatures = np.concatenate([self._signatures, np.empty_like(self._signatures)])
+        self._signatures[doc] = signature
+        for key in keys:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                self._buckets[key] = doc
+            elif isinstance(bucket, list):
+                bucket.append(doc)
+            else:
+                self._buckets[key] = [bucket, doc]
+        return (quiz_id, question["id"], question["question"], hashes, keys)
+
+    def _unindex(self, doc, entry):
+        for key in entry[4]:
+            bucket = self._buckets[key]
+            if not isinstance(bucket, list):
+                del self._buckets[key]
+                continue
+            bucket.remove(doc)
+            if len(bucket) == 1:
+                self._buckets[key] = bucket[0]
+
+    def _match(self, doc, similarity):
+        quiz_id, question_id, question_text = self._docs[doc][:3]
+        return {"quiz_id": quiz_id, "question_id": question_id, "question": question_text, "similarity": round(similarity, 2)}
+
+    def _similar_docs(self, hashes, signature, keys):
+        """Returns [(similarity, doc number)] of indexed questions at or above DUPLICATE_SIMILARITY, most similar first."""
+        candidates = set()
+        for key in keys:
+            bucket = self._buckets.get(key)
+            if isinstance(bucket, list):
+                candidates.update(bucket)
+            elif bucket is not None:
+                candidates.add(bucket)
+        candidates = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        estimates = (self._signatures[candidates] == signature).mean(axis=1)
+        matches = []
+        for doc in candidates[estimates >= DUPLICATE_SIMILARITY - 0.1]: # Estimates are within ~0.06 at 64 values
+            similarity = shingle_similarity(hashes, self._docs[doc][3])
+            if similarity >= DUPLICATE_SIMILARITY:
+                matches.append((similarity, int(doc)))
+        return sorted(matches, reverse=True)
+
+    def similar(self, question, limit=5):
+        """Returns up to limit indexed questions near-duplicating question, most similar first.
+
+        Each match is {"quiz_id", "question_id", "question", "similarity"}. A question already
+        in the bank matches itself.
+        """
+        with self._current():
+            hashes = shingle_hashes(question)
+            signature = minhash_signature(hashes)
+            return [self._match(doc, similarity) for similarity, doc in self._similar_docs(hashes, signature, signature_bands(signature))[:limit]]
+
+    def check_batch(self, questions):
+        """Finds near-duplicates for a batch of new questions, in the bank or earlier in the batch.
+
+        Returns {position in questions: best match}. A match within the batch has "quiz_id" None
+        and "batch_position" set to the earlier question's position.
+        """
+        with self._current():
+            batch_hashes = []
+            batch_buckets = {}
+            duplicates = {}
+            for position, question in enumerate(questions):
+                hashes = shingle_hashes(question)
+                signature = minhash_signature(hashes)
+                keys = signature_bands(signature)
+                matches = self._similar_docs(hashes, signature, keys)
+                if matches:
+                    duplicates[position] = self._match(matches[0][1], matches[0][0])
+                for other in sorted({other for key in keys for other in batch_buckets.get(key, ())}):
+                    similarity = shingle_similarity(hashes, batch_hashes[other])
+                    if similarity >= DUPLICATE_SIMILARITY and similarity > duplicates.get(position, {"similarity": 0})["similarity"]:
+                        duplicates[position] = {"quiz_id": None, "batch_position": other, "question": questions[other]["question"], "similarity": round(similarity, 2)}
+                batch_hashes.append(hashes)
+                for key in keys:
+                    batch_buckets.setdefault(key, []).append(position)
+            return duplicates
+
+    def clusters(self):
+        """Groups near-duplicate questions across all quizzes; returns lists of matches, largest first.
+
+        Each shared bucket's signatures are compared all-pairs in one numpy operation, pairs with
+        a close estimate are confirmed exactly, and groups joined through any bucket merge. Each
+        similarity is to the cluster's first question.
+        """
+        with self._current():
+            parent = {}
+            def find(doc):
+                while parent.get(doc, doc) != doc:
+                    parent[doc] = parent.get(parent[doc], parent[doc]) # Path halving
+                    doc = parent[doc]
+                return doc
+            min_agreeing = (DUPLICATE_SIMILARITY - 0.1) * self._signatures.shape[1] # Estimates are within ~0.06 at 64 values
+            for bucket in self._buckets.values():
+                if not isinstance(bucket, list) or len(bucket) > DUPLICATE_BUCKET_LIMIT:
+                    continue # True duplicates also share several other, smaller buckets
+                signatures = self._signatures[bucket]
+                agreeing = (signatures[:, None, :] == signatures[None, :, :]).sum(axis=2)
+                for first, second in zip(*np.nonzero(np.triu(agreeing >= min_agreeing, k=1))):
+                    doc, other = bucket[first], bucket[second]
+                    if find(doc) != find(other) and shingle_similarity(self._docs[doc][3], self._docs[other][3]) >= DUPLICATE_SIMILARITY:
+                        parent[find(doc)] = find(other)
+            groups = {}
+            for doc in list(parent):
+                groups.setdefault(find(doc), set()).update((doc, find(doc)))
+            clusters = []
+            for docs in groups.values():
+                docs = sorted(docs)
+                first_hashes = self._docs[docs[0]][3]
+                clusters.append([self._match(doc, shingle_similarity(first_hashes, self._docs[doc][3])) for doc in docs])
+            return sorted(clusters, key=len, reverse=True)
+
+@st.cache_resource
+def get_duplicate_index():
+    """Returns the process-wide DuplicateIndex, kept current by storage events."""
+    return DuplicateIndex(get_storage())
+
+# --- Question Import/Export ---
+# Uploaded CSV/JSONL files are parsed row by row, every row is checked with the same rules
+# as the add-question form, and the accepted questions are saved with one add_questions()
+# call, i.e. one file write or one SQLite transaction for the whole batch.
+QUESTION_FILE_FORMATS = {
+    "CSV": {"extension": "csv", "mime": "text/csv"},
+    "JSONL": {"extension": "jsonl", "mime": "application/x-ndjson"},
+}
+
+def validate_question(question_text, options, correct_option, explanation):
+    """Returns an error message if a question is incomplete or inconsistent, else None."""
+    if not (question_text and options and correct_option and explanation):
+        return "Please fill in all mandatory fields (Question, at least one Option, Correct Option, and Explanation)."
+    if correct_option not in options:
+        return "Correct option must be one of the provided options."
+    return None
+
+def question_file_format(filename):
+    """Guesses the question file format from its name: "JSONL" for .jsonl/.ndjson, otherwise "CSV"."""
+    return "JSONL" if filename.lower().endswith((".jsonl", ".ndjson")) else "CSV"
+
+def iter_question_file_rows(binary_file, file_format):
+    """Yields (row number, fields or None, parse error or None) for each record of an uploaded file.
+
+    CSV files need question, correct_option and explanation columns plus option_1, option_2, ... and
+    may have a topic column. JSONL files hold one {"question", "options", "correct_option", "explanation"}
+    object per line, optionally with a "topic".
+    """
+    text_file = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="" if file_format == "CSV" else None)
+    try:
+        if file_format == "CSV":
+            reader = csv.DictReader(text_file)
+            option_columns = sorted(
+                (column for column in reader.fieldnames or [] if re.fullmatch(r"option_\d+", column)),
+                key=lambda column: int(column.split("_")[1]),
+            )
+            for row in reader:
+                yield reader.line_num, {
+                    "question": (row.get("question") or "").strip(),
+                    "options": [row[column].strip() for column in option_columns if (row.get(column) or "").strip()],
+                    "correct_option": (row.get("correct_option") or "").strip(),
+                    "explanation": (row.get("explanation") or "").strip(),
+                    "topic": (row.get("topic") or "").strip(),
+                }, None
+        else:
+            for line_number, line in enumerate(text_file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    yield line_number, None, f"Invalid JSON: {exc.msg}."
+                    continue
+                if not isinstance(record, dict) or not isinstance(record.get("options", []), list):
+                    yield line_number, None, "Expected an object with an \"options\" list."
+                    continue
+                yield line_number, {
+                    "question": str(record.get("question") or "").strip(),
+                    "options": [str(option).strip() for option in record.get("options", []) if str(option).strip()],
+                    "correct_option": str(record.get("correct_option") or "").strip(),
+                    "explanation": str(record.get("explanation") or "").strip(),
+                    "topic": str(record.get("topic") or "").strip(),
+                }, None
+    except UnicodeDecodeError:
+        yield 0, None, "The file is not UTF-8 encoded text."
+    finally:
+        text_file.detach() # Leave the uploaded file open for the caller
+
+def prepare_question_import(rows):
+    """Validates parsed rows in one pass; returns (new questions with IDs, [(row number, error)])."""
+    questions, errors = [], []
+    for row_number, fields, parse_error in rows:
+        error = parse_error or validate_question(fields["question"], fields["options"], fields["correct_option"], fields["explanation"])
+        if error:
+            errors.append((row_number, error))
+        else:
+            fields = {key: value for key, value in fields.items() if key != "topic" or value} # Topics are optional
+            questions.append(dict(id=new_question_id(), **fields)) # Always fresh IDs so re-imports never clash
+    return questions, errors
+
+def write_question_export(questions, file_format, binary_file):
+    """Streams a quiz's questions to binary_file as CSV (one column per option) or JSONL."""
+    text_file = io.TextIOWrapper(binary_file, encoding="utf-8", newline="" if file_format == "CSV" else None)
+    if file_format == "CSV":
+        option_count = max((len(q["options"]) for q in questions), default=4)
+        csv_writer = csv.writer(text_file)
+        csv_writer.writerow(["id", "question"] + [f"option_{i + 1}" for i in range(option_count)] + ["correct_option", "explanation", "topic"])
+        for q in questions:
+            options = q["options"] + [""] * (option_count - len(q["options"]))
+            csv_writer.writerow([q["id"], q["question"]] + options + [q["correct_option"], q["explanation"], q.get("topic", "")])
+    else:
+        for q in questions:
+            text_file.write(json.dumps(q, ensure_ascii=False) + "\n")
+    text_file.flush()
+    text_file.detach()
+
+def build_question_export(quiz_id, file_format):
+    """Returns the bytes of a quiz's question export for st.download_button."""
+    with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES) as export_file:
+        write_question_export(get_storage().get_questions(quiz_id), file_format, export_file)
+        export_file.seek(0)
+        return export_file.read()
+
+# --- User Provisioning ---
+# Bulk account creation/deletion from an uploaded CSV. Rows are checked against an in-memory
+# set of existing and already-seen user IDs, and the accepted accounts are written with one
+# add_users()/delete_users() call: one users-file write plus one progress record (or one
+# SQLite transaction) for the whole batch.
+USER_ROLES = ["student", "admin"]
+GENERATED_PASSWORD_BYTES = 9 # secrets.token_urlsafe(9) gives a 12-character password
+
+def iter_user_file_rows(binary_file):
+    """Yields (row number, {"username", "password", "role"}) for each row of an uploaded users CSV.
+
+    The file needs a username (or user_id) column; password and role columns are optional.
+    """
+    text_file = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.DictReader(text_file)
+        for row in reader:
+            row = {(key or "").strip().lower(): (value or "").strip() for key, value in row.items()}
+            yield reader.line_num, {
+                "username": row.get("username") or row.get("user_id", ""),
+                "password": row.get("password", ""),
+                "role": row.get("role", "").lower(),
+            }
+    finally:
+        text_file.detach() # Leave the uploaded file open for the caller
+
+def prepare_user_import(rows, existing_usernames):
+    """Validates rows in one pass; returns (username -> record, [(row number, error)], [(username, generated password)]).
+
+    Passwords of the accepted rows are hashed together on the password worker pool.
+    """
+    seen = set(existing_usernames)
+    records, errors, generated = {}, [], []
+    for row_number, fields in rows:
+        username, role = fields["username"], fields["role"] or "student"
+        if not username:
+            errors.append((row_number, "Missing user ID."))
+        elif username in seen:
+            errors.append((row_number, f"User ID '{username}' already exists." if username in existing_usernames else f"User ID '{username}' appears more than once in the file."))
+        elif role not in USER_ROLES:
+            errors.append((row_number, f"Unknown role '{fields['role']}' (use {' or '.join(USER_ROLES)})."))
+        else:
+            seen.add(username)
+            password = fields["password"]
+            if not password:
+                password = secrets.token_urlsafe(GENERATED_PASSWORD_BYTES)
+                generated.append((username, password))
+            records[username] = {"password": password, "role": role}
+    passwords = [record.pop("password") for record in records.values()]
+    for record, password_hash in zip(records.values(), hash_passwords(passwords)):
+        record["password_hash"] = password_hash
+    return records, errors, generated
+
+def prepare_user_deletion(rows, users, current_username):
+    """Checks a bulk-delete list; returns ([usernames to delete], [(row number, error)])."""
+    usernames, errors, seen = [], [], set()
+    for row_number, fields in rows:
+        username = fields["username"]
+        if username in seen:
+            continue
+        seen.add(username)
+        if username not in users:
+            errors.append((row_number, f"User ID '{username}' does not exist."))
+        elif username == current_username or users[username]["role"] == "admin": # Same rule as the per-user delete
+            errors.append((row_number, f"Admin account '{username}' can't be deleted here."))
+        else:
+            usernames.append(username)
+    return usernames, errors
 
-            /* Sidebar styling */
-            .stSidebar > div:first-child {{
-                background-color: var(--card-background); /* Sidebar uses card background */
-                padding: 2.5rem 2rem; /* More padding */
-                box-shadow: var(--shadow);
-                border-radius: var(--border-radius);
-                transition: background-color 0.4s ease, box-shadow 0.4s ease;
-            }}
-            .stSidebar .stButton > button {{
-                width: 100%;
-                margin-bottom: 0.75rem; /* More space between sidebar buttons */
-            }}
+# --- Quiz Checkpoints ---
+# An in-progress quiz is checkpointed to CHECKPOINTS_DIR/<user>/<attempt_id>.jsonl: a header line
+# {"attempt_id", "quiz_id", "question_ids" (the questions drawn), "started_at"} followed by one compact answer entry per submitted answer
+# (see compact_answer). Each answer costs one small append, and resuming replays the answers in
+# O(answers). The file is removed once the attempt is committed; abandoned ones expire after
+# CHECKPOINT_TTL_SECONDS.
+class QuizCheckpoints:
+    """Append-only checkpoint files for quizzes in progress."""
 
-            /* Metrics */
-            [data-testid="stMetric"] {{
-                background-color: var(--card-background);
-                padding: 1.5rem; /* More padding */
-                border-radius: var(--border-radius);
-                box-shadow: var(--shadow);
-                text-align: center;
-                margin-bottom: 1.5rem;
-            }}
-            [data-testid="stMetric"] > div > div:first-child {{
-                color: var(--secondary-color);
-                font-size: 1rem; /* Slightly larger label */
-            }}
-            [data-testid="stMetric"] > div > div:last-child {{
-                color: var(--primary-color);
-                font-size: 2.2rem; /* Larger value */
-                font-weight: 700;
-            }}
+    def __init__(self, directory):
+        self._directory = directory
+        self._gc_lock = threading.Lock()
+        self._last_gc = 0.0
 
-            /* Success/Error/Info messages */
-            .stAlert {{
-                border-radius: var(--border-radius);
-                padding: 1.2rem; /* More padding */
-                margin-bottom: 1.2rem;
-                font-size: 1.05rem; /* Slightly larger text */
-            }}
-            .stAlert.success {{
-                background-color: var(--success-bg);
-                color: var(--success-text);
-                border-color: var(--success-border);
-            }}
-            .stAlert.error {{
-                background-color: var(--error-bg);
-                color: var(--error-text);
-                border-color: var(--error-border);
-            }}
-            .stAlert.info {{
-                background-color: var(--info-bg);
-                color: var(--info-text);
-                border-color: var(--info-border);
-            }}
+    def _user_dir(self, username):
+        slug = re.sub(r"[^a-z0-9]+", "-", username.lower()).strip("-")[:40] or "user"
+        return os.path.join(self._directory, f"{slug}-{hashlib.sha1(username.encode('utf-8')).hexdigest()[:8]}")
 
-            /* Logo Container (for login page) */
-            .logo-container {{
-                text-align: center;
-                margin-bottom: 2.5rem; /* More margin below logo */
-                padding-bottom: 1.5rem;
-                border-bottom: 1px solid var(--border-color); /* Use dynamic border color */
-            }}
-            /* Fixed button container at the bottom for quiz */
-            .fixed-bottom-buttons {{
-                position: fixed;
-                bottom: 0;
-                left: 0;
-                right: 0;
-                width: 100%;
-                background-color: var(--card-background); /* Match card background */
-                padding: 1rem 2rem;
-                box-shadow: rgba(0, 0, 0, 0.2) 0px -5px 15px -3px; /* Shadow above buttons */
-                display: flex;
-                justify-content: flex-end; /* Align to the right */
-                gap: 1rem; /* Space between buttons */
-                z-index: 1000; /* Ensure buttons are on top */
-                border-top-left-radius: var(--border-radius);
-                border-top-right-radius: var(--border-radius);
-            }}
-            .fixed-bottom-buttons .stButton {{
-                flex-grow: 0; /* Prevent buttons from growing */
-                flex-shrink: 0; /* Prevent buttons from shrinking */
-                width: auto; /* Allow button width to be determined by content + padding */
-            }}
-            .fixed-bottom-buttons .stButton > button {{
-                width: auto; /* Make buttons fill their flex container */
-                min-width: 180px; /* Ensure a minimum width for better appearance */
-            }}
+    def _path(self, username, attempt_id):
+        return os.path.join(self._user_dir(username), f"{attempt_id}.jsonl")
 
-            /* Adjust main content padding when fixed buttons are present */
-            .main {{
-                padding-bottom: 6rem; /* Add padding to main content to prevent overlap with fixed buttons */
-            }}
+    def record_answer(self, username, attempt_id, quiz_id, question_ids, answer):
+        """Appends one answer entry, starting the checkpoint file with its header on the first answer."""
+        path = self._path(username, attempt_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a") as f:
+            lines = json.dumps(answer, separators=(",", ":")) + "\n"
+            if f.tell() == 0:
+                header = {"attempt_id": attempt_id, "quiz_id": quiz_id, "question_ids": question_ids, "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+                lines = json.dumps(header, separators=(",", ":")) + "\n" + lines
+            f.write(lines) # Not fsynced: this survives process restarts, and the finished attempt itself is durable
+            count_io(written_bytes=len(lines))
 
-            /* Hide the internal Streamlit buttons that are triggered by custom HTML */
-            /* Targeting the container div of the button by its data-testid */
-            [data-testid="stButton-submit_answer_internal_btn"],
-            [data-testid="stButton-next_question_internal_btn"] {{
-                display: none !important;
-            }}
-            /* Hide the internal submit/next/finish button that is triggered by custom HTML */
-            [data-testid="stButton-next_question_submit_quiz_internal_btn"] {{
-                display: none !important;
-            }}
-        </style>
-    """, unsafe_allow_html=True)
+    def load(self, username, attempt_id):
+        """Returns (header, answers) of a checkpoint, or (None, []) if there is none."""
+        try:
+            with open(self._path(username, attempt_id), "r") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return None, []
+        records = []
+        for line in lines:
+            count_io(read_bytes=len(line))
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break # A torn final record from an interrupted append
+        return (records[0], records[1:]) if records else (None, [])
 
-# --- Helper Functions for JSON files ---
-def load_json_file(filepath, default_content={}):
-    """Loads data from a JSON file, creating it with default content if it doesn't exist."""
-    if not os.path.exists(filepath):
-        with open(filepath, "w") as f:
-            json.dump(default_content, f, indent=2)
-        return default_content
-    with open(filepath, "r") as f:
-        return json.load(f)
+    def in_progress(self, username):
+        """Returns the user's checkpoints as {"attempt_id", "quiz_id", "answered", "total", "updated_at"}, newest first."""
+        user_dir = self._user_dir(username)
+        checkpoints = []
+        with contextlib.suppress(FileNotFoundError):
+            for name in os.listdir(user_dir):
+                if not name.endswith(".jsonl"):
+                    continue
+                attempt_id = name[:-len(".jsonl")]
+                header, answers = self.load(username, attempt_id)
+                with contextlib.suppress(FileNotFoundError):
+                    updated_at = os.path.getmtime(os.path.join(user_dir, name))
+                    if header is not None and time.time() - updated_at <= CHECKPOINT_TTL_SECONDS:
+                        checkpoints.append({"attempt_id": attempt_id, "quiz_id": header["quiz_id"], "answered": len(answers), "total": len(header.get("question_ids") or []) or None, "updated_at": updated_at})
+        return sorted(checkpoints, key=lambda checkpoint: checkpoint["updated_at"], reverse=True)
+
+    def discard(self, username, attempt_id):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._path(username, attempt_id))
 
-def save_json_file(filepath, data):
-    """Saves data to a JSON file."""
-    with open(filepath, "w") as f:
-        json.dump(data, f, indent=2)
+    def collect_garbage(self, force=False):
+        """Removes checkpoints untouched for CHECKPOINT_TTL_SECONDS; runs at most every CHECKPOINT_GC_INTERVAL_SECONDS.
+
+        Returns the number of checkpoints removed.
+        """
+        with self._gc_lock:
+            now = time.time()
+            if not force and now - self._last_gc < CHECKPOINT_GC_INTERVAL_SECONDS:
+                return 0
+            self._last_gc = now
+        removed = 0
+        with contextlib.suppress(FileNotFoundError):
+            for user_dir in os.scandir(self._directory):
+                if not user_dir.is_dir():
+                    continue
+                for entry in os.scandir(user_dir.path):
+                    with contextlib.suppress(FileNotFoundError):
+                        if entry.name.endswith(".jsonl") and now - entry.stat().st_mtime > CHECKPOINT_TTL_SECONDS:
+                            os.remove(entry.path)
+                            removed += 1
+                with contextlib.suppress(OSError): # Still has checkpoints, or one was just started
+                    os.rmdir(user_dir.path)
+        return removed
+
+    def storage_changed(self, event, **details):
+        if event == "user_deleted":
+            shutil.rmtree(self._user_dir(details["username"]), ignore_errors=True)
+
+@st.cache_resource
+def get_quiz_checkpoints():
+    """Returns the process-wide QuizCheckpoints, which also drops a deleted user's checkpoints."""
+    checkpoints = QuizCheckpoints(CHECKPOINTS_DIR)
+    get_storage().add_listener(checkpoints)
+    return checkpoints
 
 # --- Session State Initialization ---
+@instrumented()
 def initialize_session_state():
-    """Initializes all necessary session state variables and loads data."""
+    """Initializes all necessary session state variables. Data itself is read through get_storage()."""
     if "logged_in" not in st.session_state:
         st.session_state.logged_in = False
     if "user_role" not in st.session_state:
@@ -362,6 +3540,8 @@ def initialize_session_state():
         st.session_state.quiz_started = False
     if "current_quiz_id" not in st.session_state:
         st.session_state.current_quiz_id = None
+    if "quiz_questions" not in st.session_state:
+        st.session_state.quiz_questions = [] # Only the questions drawn for the current attempt
     if "current_question_index" not in st.session_state:
         st.session_state.current_question_index = 0
     if "score" not in st.session_state:
@@ -369,7 +3549,7 @@ def initialize_session_state():
     if "attempted_questions_count" not in st.session_state:
         st.session_state.attempted_questions_count = 0
     if "student_answers" not in st.session_state:
-        # Stores (question_index, selected_option, correct_option_string, is_correct) for current quiz
+        # Stores compact {"q", "a", "c"} answer entries for the current quiz (see compact_answer)
         st.session_state.student_answers = []
     if "show_explanation" not in st.session_state:
         st.session_state.show_explanation = False
@@ -379,24 +3559,16 @@ def initialize_session_state():
         st.session_state.feedback_message = ""
     if "quiz_completed" not in st.session_state:
         st.session_state.quiz_completed = False
+    if "attempt_id" not in st.session_state:
+        st.session_state.attempt_id = None # Chosen when a quiz starts; committing it twice is a no-op
+    if "attempt_committed" not in st.session_state:
+        st.session_state.attempt_committed = False
+    if "retaking_quiz" not in st.session_state:
+        st.session_state.retaking_quiz = False
 
-    # Data loaded from files
-    if os.path.exists(QUESTIONS_FILE):
-        with open(QUESTIONS_FILE, "r") as f:
-            initial_questions_data = json.load(f)
-        if isinstance(initial_questions_data, list):
-            # This conversion warning should now appear after set_page_config
-            st.warning(f"Converting '{QUESTIONS_FILE}' from old list format to new multi-quiz format. Please review.")
-            initial_questions_data = {"SAP Security Quiz": initial_questions_data}
-            save_json_file(QUESTIONS_FILE, initial_questions_data)
-    else:
-        initial_questions_data = {"SAP Security Quiz": []}
-        save_json_file(QUESTIONS_FILE, initial_questions_data)
-
-    st.session_state.questions = initial_questions_data
-    st.session_state.users = load_json_file(USERS_FILE, {"admin": {"password": "adminpassword", "role": "admin"}})
-    st.session_state.user_progress = load_json_file(USER_PROGRESS_FILE, {})
-
+    # Admin State
+    if "editing_question_id" not in st.session_state:
+        st.session_state.editing_question_id = None # Only this question gets a full editor in Manage Questions
 
 def reset_quiz_state():
     """Resets quiz-specific session state variables for a new quiz."""
@@ -409,6 +3581,42 @@ def reset_quiz_state():
     st.session_state.selected_option = None # Ensure no option is selected for a new question
     st.session_state.feedback_message = ""
     st.session_state.quiz_completed = False
+    st.session_state.attempt_id = new_attempt_id()
+    st.session_state.attempt_committed = False
+    st.session_state.retaking_quiz = False
+
+def start_quiz(quiz_id):
+    """Starts a new attempt at a quiz, drawing its questions from the quiz's pool."""
+    st.session_state.current_quiz_id = quiz_id
+    reset_quiz_state() # Reset state for the new quiz
+    st.session_state.quiz_questions = draw_quiz_questions(get_storage(), quiz_id, st.session_state.username, st.session_state.attempt_id)
+    st.session_state.quiz_started = True
+
+def resume_quiz(checkpoint):
+    """Restores an unfinished quiz from its checkpoint. Returns False if the quiz has changed since."""
+    header, answers = get_quiz_checkpoints().load(st.session_state.username, checkpoint["attempt_id"])
+    if header is None:
+        return False
+    storage = get_storage()
+    question_ids = header.get("question_ids") or storage.question_pool(header["quiz_id"]).ids
+    questions = storage.get_questions_by_id(header["quiz_id"], question_ids)
+    # Answers are positional, so every drawn question must still exist and the answered ones come first, in order
+    if len(questions) != len(question_ids) or [answer["q"] for answer in answers] != question_ids[:len(answers)]:
+        return False
+    reset_quiz_state()
+    st.session_state.update(
+        current_quiz_id=header["quiz_id"],
+        quiz_questions=questions,
+        attempt_id=header["attempt_id"],
+        quiz_started=True,
+        retaking_quiz=True, # Skip the "already completed" notice; this attempt was started deliberately
+        current_question_index=len(answers),
+        score=sum(answer["c"] for answer in answers),
+        attempted_questions_count=len(answers),
+        student_answers=answers,
+        quiz_completed=len(answers) == len(question_ids),
+    )
+    return True
 
 # --- Logo Placeholder ---
 def display_logo():
@@ -434,10 +3642,14 @@ def login_page():
             submit_button = st.form_submit_button("Login")
 
             if submit_button:
-                users_data = st.session_state.users
-                user = users_data.get(username)
+                storage = get_storage()
+                try:
+                    user = authenticate(storage, username, password)
+                except concurrent.futures.TimeoutError:
+                    st.error("The server is busy. Please try logging in again in a moment.")
+                    return
 
-                if user and user["password"] == password:
+                if user:
                     st.session_state.logged_in = True
                     st.session_state.user_role = user["role"]
                     st.session_state.username = username
@@ -445,9 +3657,12 @@ def login_page():
                     st.success(f"Welcome, {username}!")
 
                     # Initialize user progress for this user if not exists
-                    if username not in st.session_state.user_progress:
-                         st.session_state.user_progress[username] = {}
-                    save_json_file(USER_PROGRESS_FILE, st.session_state.user_progress)
+                    storage.ensure_user_progress(username)
+                    if user["role"] == "student":
+                        checkpoints = get_quiz_checkpoints()
+                        checkpoints.collect_garbage()
+                        if checkpoints.in_progress(username):
+                            st.session_state.current_page = "Take Quiz" # Straight to the offer to resume
                     st.rerun()
                 else:
                     st.error("Invalid User ID or Password.")
@@ -460,7 +3675,7 @@ def home_page():
     st.markdown("---")
     st.subheader("What would you like to do?")
     if st.session_state.user_role == 'student':
-        col1, col2 = st.columns(2)
+        col1, col2, col3 = st.columns(3)
         with col1:
             if st.button("Take a Quiz"):
                 st.session_state.current_page = "Take Quiz"
@@ -469,6 +3684,10 @@ def home_page():
             if st.button("View My Scores"):
                 st.session_state.current_page = "View My Scores"
                 st.rerun()
+        with col3:
+            if st.button("Leaderboard"):
+                st.session_state.current_page = "Leaderboard"
+                st.rerun()
     elif st.session_state.user_role == 'admin':
         st.write("Use the sidebar to navigate to Admin actions.")
 
@@ -488,25 +3707,55 @@ def student_quiz_page():
     """Manages the student's quiz experience."""
     st.title(f"Take a Quiz, {st.session_state.username}!")
 
-    available_quizzes = list(st.session_state.questions.keys())
+    storage = get_storage()
+    available_quizzes = storage.list_quizzes()
     if not available_quizzes:
         st.warning("No quizzes available. Please ask an administrator to add questions.")
         return
 
     # Quiz selection
     if st.session_state.current_quiz_id is None:
+        question_counts = storage.question_counts() # Only quiz names and counts; no question shard is loaded here
+        checkpoints = get_quiz_checkpoints()
+        unfinished = [checkpoint for checkpoint in checkpoints.in_progress(st.session_state.username) if checkpoint["quiz_id"] in question_counts]
+        if unfinished:
+            st.subheader("Resume an Unfinished Quiz")
+            for checkpoint in unfinished:
+                col_info, col_resume, col_discard = st.columns([4, 1, 1])
+                with col_info:
+                    saved_at = time.strftime("%Y-%m-%d %H:%M", time.localtime(checkpoint["updated_at"]))
+                    st.write(f"**{checkpoint['quiz_id']}**: {checkpoint['answered']} of {checkpoint['total'] or question_counts[checkpoint['quiz_id']]} answered (last saved {saved_at})")
+                with col_resume:
+                    if st.button("Resume", key=f"resume_{checkpoint['attempt_id']}"):
+                        if resume_quiz(checkpoint):
+                            st.rerun()
+                        checkpoints.discard(st.session_state.username, checkpoint["attempt_id"])
+                        st.warning(f"'{checkpoint['quiz_id']}' has changed since this attempt was started, so it can't be resumed. Please start it again.")
+                with col_discard:
+                    if st.button("Discard", key=f"discard_{checkpoint['attempt_id']}"):
+                        checkpoints.discard(st.session_state.username, checkpoint["attempt_id"])
+                        st.rerun()
+            st.markdown("---")
+
         st.subheader("Select a Quiz")
-        selected_quiz = st.selectbox("Choose a quiz to start:", available_quizzes, key="quiz_selector")
+        def quiz_label(quiz_id):
+            question_count = question_counts.get(quiz_id, 0)
+            draw_count = storage.get_quiz_settings(quiz_id)["draw_count"]
+            if draw_count and draw_count < question_count:
+                return f"{quiz_id} ({draw_count} questions drawn from {question_count})"
+            return f"{quiz_id} ({question_count} questions)"
+        selected_quiz = st.selectbox("Choose a quiz to start:", available_quizzes, key="quiz_selector", format_func=quiz_label)
         if st.button("Start Selected Quiz"):
-            st.session_state.current_quiz_id = selected_quiz
-            reset_quiz_state() # Reset state for the new quiz
-            st.session_state.quiz_started = True
+            for checkpoint in unfinished:
+                if checkpoint["quiz_id"] == selected_quiz: # Starting over replaces the unfinished attempt
+                    checkpoints.discard(st.session_state.username, checkpoint["attempt_id"])
+            start_quiz(selected_quiz)
             st.rerun()
         return
 
-    # Once a quiz is selected and started
+    # Once a quiz is selected and started; only the questions drawn for this attempt are used from here on
     current_quiz_id = st.session_state.current_quiz_id
-    questions = st.session_state.questions.get(current_quiz_id, [])
+    questions = st.session_state.quiz_questions
     total_questions = len(questions)
 
     if not questions:
@@ -516,39 +3765,51 @@ def student_quiz_page():
 
     st.header(f"Quiz: {current_quiz_id}")
 
-    # Display progress bar
-    st.progress((st.session_state.current_question_index) / total_questions, text=f"Progress: {st.session_state.current_question_index}/{total_questions} questions answered.")
-
-
-    # Check if the student has already completed THIS quiz
-    user_quiz_progress = st.session_state.user_progress.get(st.session_state.username, {}).get(current_quiz_id, {})
-    if isinstance(user_quiz_progress, dict) and user_quiz_progress.get("attempted", False) and user_quiz_progress.get("total", 0) == total_questions:
+    # Check if the student has already completed THIS quiz; they can look at the result or retake it
+    user_quiz_progress = storage.get_user_progress(st.session_state.username).get(current_quiz_id, {})
+    if isinstance(user_quiz_progress, dict) and user_quiz_progress.get("attempted", False) and not st.session_state.quiz_completed and not st.session_state.retaking_quiz:
         st.info(f"You have already completed the '{current_quiz_id}' quiz.")
-        col_score, col_accuracy = st.columns(2)
+        col_score, col_accuracy, col_best = st.columns(3)
         with col_score:
-            st.metric("Your Previous Score", f"{user_quiz_progress['score']} / {user_quiz_progress['total']}")
+            st.metric("Your Latest Score", f"{user_quiz_progress['score']} / {user_quiz_progress['total']}")
         with col_accuracy:
             prev_accuracy = (user_quiz_progress['score'] / user_quiz_progress['total'] * 100) if user_quiz_progress['total'] > 0 else 0
-            st.metric("Your Previous Accuracy", f"{prev_accuracy:.2f}%")
-        st.write("You can view detailed results in 'View My Scores'.")
-        if st.button("Choose another Quiz"):
-            st.session_state.current_quiz_id = None
-            st.session_state.quiz_started = False
-            st.rerun()
+            st.metric("Your Latest Accuracy", f"{prev_accuracy:.2f}%")
+        with col_best:
+            st.metric("Your Best Score", f"{user_quiz_progress.get('best_score', user_quiz_progress['score'])} / {user_quiz_progress.get('best_total', user_quiz_progress['total'])}",
+                      help=f"Attempts so far: {summary_attempt_count(user_quiz_progress)}")
+        st.write("You can view detailed results and past attempts in 'View My Scores'.")
+        col_retake, col_other = st.columns(2)
+        with col_retake:
+            if st.button("Retake Quiz"):
+                start_quiz(current_quiz_id) # A fresh attempt ID and draw; the earlier attempts stay in the history
+                st.session_state.retaking_quiz = True
+                st.rerun()
+        with col_other:
+            if st.button("Choose another Quiz"):
+                st.session_state.current_quiz_id = None
+                st.session_state.quiz_started = False
+                st.rerun()
         return
 
     if st.session_state.quiz_completed:
         display_quiz_dashboard(total_questions, current_quiz_id)
-        # Update user progress for the specific quiz
-        if st.session_state.username not in st.session_state.user_progress:
-            st.session_state.user_progress[st.session_state.username] = {}
-        st.session_state.user_progress[st.session_state.username][current_quiz_id] = {
-            "score": st.session_state.score,
-            "total": total_questions,
-            "attempted": True,
-            "answers_log": st.session_state.student_answers # Save detailed log
-        }
-        save_json_file(USER_PROGRESS_FILE, st.session_state.user_progress)
+        if not st.session_state.attempt_committed:
+            # Committed once per attempt: reruns while the dashboard is on screen (e.g. a theme toggle) write nothing
+            try:
+                storage.record_attempt(st.session_state.username, current_quiz_id, {
+                    "attempt_id": st.session_state.attempt_id,
+                    "score": st.session_state.score,
+                    "total": total_questions,
+                    "answers_log": st.session_state.student_answers # Save detailed log
+                })
+            except concurrent.futures.TimeoutError:
+                # The write may still land; a retry commits the same attempt ID, so it is never counted twice
+                st.warning(f"Saving your results for '{current_quiz_id}'… The server is busy, so this is taking longer than usual.")
+                st.button("Retry Saving") # The click reruns the page, which retries the save
+                return
+            st.session_state.attempt_committed = True
+            get_quiz_checkpoints().discard(st.session_state.username, st.session_state.attempt_id)
         st.success(f"Your results for '{current_quiz_id}' have been saved!")
 
         if st.button("Take another Quiz"):
@@ -557,13 +3818,28 @@ def student_quiz_page():
             st.rerun()
         return
 
-    current_q_index = st.session_state.current_question_index
+    # Everything below runs in a fragment: answering a question reruns only the card, not the whole page
+    quiz_question_card(current_quiz_id)
+
+@st.fragment
+@instrumented("fragment:quiz_question_card") # Fragment reruns skip main(), so they are timed on their own
+def quiz_question_card(current_quiz_id):
+    """Question card, answer feedback and next/finish controls.
 
-    if current_q_index >= total_questions:
+    Runs as a fragment, so clicks made while answering rerun only this function; the whole
+    page reruns once the quiz is completed.
+    """
+    questions = st.session_state.quiz_questions
+    total_questions = len(questions)
+    current_q_index = st.session_state.current_question_index
+    if st.session_state.quiz_completed or current_q_index >= total_questions:
         st.session_state.quiz_completed = True
-        st.rerun() # Rerun to display dashboard
+        st.rerun() # Full rerun so the page shows the dashboard and saves the results
         return
 
+    # Display progress bar
+    st.progress(current_q_index / total_questions, text=f"Progress: {current_q_index}/{total_questions} questions answered.")
+
     current_question = questions[current_q_index]
     is_last_question = (current_q_index + 1 == total_questions)
 
@@ -572,6 +3848,20 @@ def student_quiz_page():
         # with the value from the radio button when its value changes.
         st.session_state.selected_option = st.session_state[f"radio_q_{st.session_state.current_question_index}_{current_quiz_id}"]
 
+    def submit_answer():
+        is_correct = st.session_state.selected_option == current_question["correct_option"]
+        answer = compact_answer(current_question, st.session_state.selected_option)
+        st.session_state.update(
+            attempted_questions_count=st.session_state.attempted_questions_count + 1,
+            score=st.session_state.score + (1 if is_correct else 0),
+            feedback_message="✅ Correct!" if is_correct else f"❌ Wrong! The correct answer was: **{current_question['correct_option']}**",
+            show_explanation=True,
+            student_answers=st.session_state.student_answers + [answer]
+        )
+        # One small append per answer, so the quiz can be resumed after a reconnect or restart
+        question_ids = [question["id"] for question in questions]
+        get_quiz_checkpoints().record_answer(st.session_state.username, st.session_state.attempt_id, current_quiz_id, question_ids, answer)
+
     with st.container():
         st.subheader(f"Question {current_q_index + 1} of {total_questions}")
         st.markdown(f"**{current_question['question']}**")
@@ -597,19 +3887,7 @@ def student_quiz_page():
                 "Submit Answer",
                 key="submit_answer_button",
                 disabled=st.session_state.selected_option is None,
-                on_click=lambda q=current_question: st.session_state.update(
-                    attempted_questions_count=st.session_state.attempted_questions_count + 1,
-                    score=st.session_state.score + (1 if st.session_state.selected_option == q["correct_option"] else 0),
-                    feedback_message="✅ Correct!" if st.session_state.selected_option == q["correct_option"] else f"❌ Wrong! The correct answer was: **{q['correct_option']}**",
-                    show_explanation=True,
-                    student_answers=st.session_state.student_answers + [{
-                        "question": q["question"],
-                        "selected_answer": st.session_state.selected_option,
-                        "correct_answer": q["correct_option"],
-                        "is_correct": (st.session_state.selected_option == q["correct_option"]),
-                        "explanation": q["explanation"]
-                    }]
-                )
+                on_click=submit_answer
             ):
                 pass # This block is necessary for Streamlit button to trigger on_click
 
@@ -647,23 +3925,23 @@ def display_quiz_dashboard(total_questions, quiz_id):
 
     st.write("---")
     st.subheader("Your Answers:")
-    for i, answer_log in enumerate(st.session_state.student_answers):
+    question_index = {question["id"]: question for question in st.session_state.quiz_questions}
+    for i, answer_log in enumerate(hydrate_answer_log(st.session_state.student_answers, question_index)):
         with st.container():
             status_icon = "✅" if answer_log["is_correct"] else "❌"
             st.markdown(f"**Q{i+1}:** {answer_log['question']}")
             st.markdown(f"Your Answer: **{answer_log['selected_answer']}** {status_icon}")
             if not answer_log["is_correct"]:
                 st.markdown(f"Correct Answer: **{answer_log['correct_answer']}**")
-            # Fetch original explanation if available in questions_sample.json
-            original_question_data = next((q for q in st.session_state.questions.get(quiz_id, []) if q['question'] == answer_log['question']), None)
-            if original_question_data and original_question_data.get('explanation'):
-                st.info(f"Explanation: {original_question_data['explanation']}")
+            if answer_log["explanation"]:
+                st.info(f"Explanation: {answer_log['explanation']}")
             st.markdown("---")
 
 def view_my_scores_page():
     st.title(f"My Quiz Scores, {st.session_state.username}!")
     
-    user_progress = st.session_state.user_progress.get(st.session_state.username, {})
+    storage = get_storage()
+    user_progress = storage.get_user_progress(st.session_state.username)
     
     if not user_progress:
         st.info("You haven't attempted any quizzes yet.")
@@ -677,7 +3955,9 @@ def view_my_scores_page():
             attempted_quizzes_summary.append({
                 "Quiz Name": quiz_id,
                 "Score": f"{data['score']} / {data['total']}",
-                "Accuracy": f"{accuracy:.2f}%"
+                "Accuracy": f"{accuracy:.2f}%",
+                "Best Score": f"{data.get('best_score', data['score'])} / {data.get('best_total', data['total'])}",
+                "Attempts": summary_attempt_count(data),
             })
     
     if not attempted_quizzes_summary:
@@ -701,26 +3981,74 @@ def view_my_scores_page():
     selected_quiz_to_review = st.selectbox("Select a completed quiz to review:", quizzes_with_logs, key="review_quiz_selector")
 
     if selected_quiz_to_review:
-        quiz_log = user_progress[selected_quiz_to_review]["answers_log"]
-        total_questions_reviewed = user_progress[selected_quiz_to_review]["total"]
-        score_reviewed = user_progress[selected_quiz_to_review]["score"]
+        latest = user_progress[selected_quiz_to_review]
+        quiz_log, total_questions_reviewed, score_reviewed = latest["answers_log"], latest["total"], latest["score"]
+
+        # Earlier attempts are read from the attempt history only when picked; the latest is in the summary
+        history = storage.attempt_history(st.session_state.username, selected_quiz_to_review)
+        if len(history) > 1:
+            st.dataframe(pd.DataFrame([{
+                "Attempt": entry["number"],
+                "Completed (UTC)": entry["completed_at"].replace("T", " ").rstrip("Z"),
+                "Score": f"{entry['score']} / {entry['total']}",
+                "Accuracy": f"{(entry['score'] / entry['total'] * 100) if entry['total'] > 0 else 0:.2f}%",
+            } for entry in reversed(history)]), hide_index=True)
+            selected_attempt = st.selectbox(
+                "Select an attempt to review:", list(reversed(history)), key="review_attempt_selector",
+                format_func=lambda entry: f"Attempt {entry['number']} ({entry['score']} / {entry['total']})",
+            )
+            if selected_attempt["attempt_id"] != latest.get("attempt_id"):
+                attempt = storage.get_attempt(selected_attempt["attempt_id"])
+                if attempt is not None:
+                    quiz_log, total_questions_reviewed, score_reviewed = attempt["answers_log"], attempt["total"], attempt["score"]
 
         st.markdown(f"#### Detailed Review for: {selected_quiz_to_review}")
         st.metric("Score", f"{score_reviewed} / {total_questions_reviewed}")
 
-        for i, answer_log in enumerate(quiz_log):
+        for i, answer_log in enumerate(hydrate_answer_log(quiz_log, answer_log_question_index(storage, selected_quiz_to_review, quiz_log))):
             with st.container():
                 status_icon = "✅" if answer_log["is_correct"] else "❌"
                 st.markdown(f"**Q{i+1}:** {answer_log['question']}")
                 st.markdown(f"Your Answer: **{answer_log['selected_answer']}** {status_icon}")
                 if not answer_log["is_correct"]:
                     st.markdown(f"Correct Answer: **{answer_log['correct_answer']}**")
-                # Fetch original explanation if available in questions_sample.json
-                original_question_data = next((q for q in st.session_state.questions.get(selected_quiz_to_review, []) if q['question'] == answer_log['question']), None)
-                if original_question_data and original_question_data.get('explanation'):
-                    st.info(f"Explanation: {original_question_data['explanation']}")
+                if answer_log["explanation"]:
+                    st.info(f"Explanation: {answer_log['explanation']}")
                 st.markdown("---")
 
+def leaderboard_page():
+    """Top students overall and per quiz, with the current student's own rank."""
+    st.title("Leaderboard")
+    leaderboards = get_leaderboards()
+    username = st.session_state.username
+    board = st.selectbox(
+        "Leaderboard", [LEADERBOARD_OVERALL] + leaderboards.boards(), key="leaderboard_selector",
+        format_func=lambda board: "Overall (sum of best scores)" if board is LEADERBOARD_OVERALL else f"{board} (best accuracy)",
+    )
+    rows, tied_beyond = leaderboards.top(board)
+    if not rows:
+        st.info("No one has completed a quiz yet.")
+        return
+
+    def display_row(row):
+        display = {"Rank": row["rank"], "Student": f"{row['username']} (you)" if row["username"] == username else row["username"]}
+        if board is LEADERBOARD_OVERALL:
+            display.update({"Total Best Score": f"{row['score']} / {row['total']}", "Quizzes": row["quizzes"]})
+        else:
+            display.update({"Best Score": f"{row['score']} / {row['total']}", "Accuracy": f"{(row['score'] / row['total'] * 100) if row['total'] > 0 else 0:.2f}%"})
+        return display
+
+    st.dataframe(pd.DataFrame([display_row(row) for row in rows]), hide_index=True)
+    if tied_beyond:
+        st.caption(f"{tied_beyond} more student(s) share rank {rows[-1]['rank']}.")
+
+    standing = leaderboards.standing(username, board)
+    if standing is None:
+        st.info("Complete a quiz to appear on this leaderboard." if board is LEADERBOARD_OVERALL else "Complete this quiz to appear on its leaderboard.")
+        return
+    st.metric("Your Rank", f"{standing['rank']} of {standing['of']}")
+    if all(row["username"] != username for row in rows):
+        st.dataframe(pd.DataFrame([display_row(standing)]), hide_index=True)
 
 # --- Admin Flow ---
 def admin_page():
@@ -730,7 +4058,7 @@ def admin_page():
     st.sidebar.header("Admin Actions")
     admin_action = st.sidebar.radio(
         "Choose an action:",
-        ["Manage Questions", "Manage Users", "View Trainee Performance"],
+        ["Manage Questions", "Manage Users", "View Trainee Performance", "Item Analytics"],
         key="admin_sidebar_radio" # Unique key for admin sidebar
     )
 
@@ -740,22 +4068,24 @@ def admin_page():
         manage_users_section()
     elif admin_action == "View Trainee Performance":
         view_trainee_performance_section()
+    elif admin_action == "Item Analytics":
+        item_analytics_section()
 
 def manage_questions_section():
     """Admin section for adding, editing, and deleting questions."""
     st.header("Manage Quiz Questions")
 
     # Admin can select which quiz to manage questions for
-    quiz_ids = list(st.session_state.questions.keys())
+    storage = get_storage()
+    quiz_ids = storage.list_quizzes()
     
     new_quiz_name_input = st.text_input("Create New Quiz Name:", key="new_quiz_name_input")
     if st.button("Create Quiz", key="create_new_quiz_button"):
         if new_quiz_name_input:
-            if new_quiz_name_input in st.session_state.questions:
+            if new_quiz_name_input in quiz_ids:
                 st.error(f"Quiz '{new_quiz_name_input}' already exists.")
             else:
-                st.session_state.questions[new_quiz_name_input] = []
-                save_json_file(QUESTIONS_FILE, st.session_state.questions)
+                storage.create_quiz(new_quiz_name_input)
                 st.success(f"Quiz '{new_quiz_name_input}' created. You can now add questions to it.")
                 st.rerun()
         else:
@@ -765,8 +4095,11 @@ def manage_questions_section():
         st.info("No quizzes defined yet. Create one above to start adding questions.")
         return
 
+    question_search_panel()
+    duplicate_scan_panel()
+
     selected_quiz_for_management = st.selectbox("Select Quiz to Manage:", quiz_ids, key="manage_quiz_selector")
-    questions_for_selected_quiz = st.session_state.questions.get(selected_quiz_for_management, [])
+    questions_for_selected_quiz = storage.get_questions(selected_quiz_for_management)
 
     # --- Delete Quiz Section ---
     if selected_quiz_for_management:
@@ -776,14 +4109,8 @@ def manage_questions_section():
         confirm_delete_quiz_checkbox = st.checkbox(f"I understand that deleting '{selected_quiz_for_management}' is irreversible and will remove all associated student progress.", key=f"confirm_delete_quiz_checkbox_{selected_quiz_for_management}")
         if st.button(f"Delete Quiz '{selected_quiz_for_management}' Permanently", key=f"delete_quiz_button_{selected_quiz_for_management}", disabled=not confirm_delete_quiz_checkbox):
             if confirm_delete_quiz_checkbox:
-                del st.session_state.questions[selected_quiz_for_management]
-                save_json_file(QUESTIONS_FILE, st.session_state.questions)
-                
-                # Remove associated user progress for this quiz
-                for user_id in list(st.session_state.user_progress.keys()): # Iterate over a copy of keys
-                    if selected_quiz_for_management in st.session_state.user_progress[user_id]:
-                        del st.session_state.user_progress[user_id][selected_quiz_for_management]
-                save_json_file(USER_PROGRESS_FILE, st.session_state.user_progress)
+                # Removes the quiz together with the associated user progress
+                storage.delete_quiz(selected_quiz_for_management)
                 
                 st.success(f"Quiz '{selected_quiz_for_management}' and its associated progress deleted successfully.")
                 st.session_state.current_quiz_id = None # Clear current quiz if it was deleted
@@ -806,92 +4133,265 @@ def manage_questions_section():
 
             new_correct_option = st.selectbox("Correct Option", options=new_options_inputs if new_options_inputs else ["Select an option"], key="add_correct_opt")
             new_explanation = st.text_area("Explanation", key="add_explanation")
+            new_topic = st.text_input("Topic (optional, used to stratify question draws)", key="add_topic")
+            allow_duplicate = st.checkbox("Add even if it is a near-duplicate of an existing question", key="add_allow_duplicate")
             add_button = st.form_submit_button("Add Question")
 
             if add_button:
-                if not (new_question_text and new_options_inputs and new_correct_option and new_explanation):
-                    st.error("Please fill in all mandatory fields (Question, at least one Option, Correct Option, and Explanation).")
-                elif new_correct_option not in new_options_inputs:
-                    st.error("Correct option must be one of the provided options.")
+                error = validate_question(new_question_text, new_options_inputs, new_correct_option, new_explanation)
+                if error:
+                    st.error(error)
                 else:
                     new_q = {
+                        "id": new_question_id(), # Persistent ID used by answer logs and lookups
                         "question": new_question_text,
                         "options": new_options_inputs, # Save only the provided options
                         "correct_option": new_correct_option, # Storing as string
                         "explanation": new_explanation
                     }
-                    st.session_state.questions[selected_quiz_for_management].append(new_q)
-                    save_json_file(QUESTIONS_FILE, st.session_state.questions)
-                    st.success("Question added successfully!")
-                    st.rerun()
+                    if new_topic.strip():
+                        new_q["topic"] = new_topic.strip()
+                    duplicates = [] if allow_duplicate else get_duplicate_index().similar(new_q)
+                    if duplicates:
+                        st.warning("This question is a near-duplicate of existing questions, so it was not added. Tick the box above to add it anyway.")
+                        st.dataframe(duplicate_matches_frame(duplicates), hide_index=True)
+                    else:
+                        storage.add_question(selected_quiz_for_management, new_q)
+                        st.success("Question added successfully!")
+                        st.rerun()
+
+    quiz_pool_settings(storage, selected_quiz_for_management, questions_for_selected_quiz)
+    if question_import_export(storage, selected_quiz_for_management, questions_for_selected_quiz):
+        questions_for_selected_quiz = storage.get_questions(selected_quiz_for_management) # Include the imported questions below
 
     st.subheader(f"Existing Questions in '{selected_quiz_for_management}'")
     if not questions_for_selected_quiz:
         st.info("No questions available for this quiz. Add some using the form above.")
         return
 
-    for i, q in enumerate(questions_for_selected_quiz):
+    # Paginate: one compact read-only row per question, and a full editor only for the question being edited
+    col_page_size, col_page = st.columns(2)
+    with col_page_size:
+        page_size = st.selectbox("Questions per page", QUESTIONS_PAGE_SIZE_OPTIONS, index=QUESTIONS_PAGE_SIZE_OPTIONS.index(QUESTIONS_PAGE_SIZE), key="questions_page_size")
+    page_count = max(1, -(-len(questions_for_selected_quiz) // page_size))
+    page_key = f"questions_page_{selected_quiz_for_management}"
+    if st.session_state.get(page_key, 1) > page_count: # The last page may have disappeared after deletions
+        st.session_state[page_key] = page_count
+    with col_page:
+        page_number = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, step=1, key=page_key)
+    first_index = (page_number - 1) * page_size
+    page_questions = questions_for_selected_quiz[first_index:first_index + page_size]
+    st.caption(f"Showing questions {first_index + 1}-{first_index + len(page_questions)} of {len(questions_for_selected_quiz)}.")
+
+    for i, q in enumerate(page_questions, start=first_index):
         with st.container():
-            with st.expander(f"Question {i+1}: {q['question'][:70]}..."): # Truncate for display
-                st.write(f"**Question:** {q['question']}")
-                st.write(f"**Options:** {', '.join(q['options'])}")
-                st.write(f"**Correct Option:** {q['correct_option']}")
-                st.write(f"**Explanation:** {q['explanation']}")
+            col_text, col_action = st.columns([0.85, 0.15])
+            with col_text:
+                st.markdown(f"**Question {i+1}:** {q['question'][:120]}{'...' if len(q['question']) > 120 else ''}")
+                st.caption(f"Correct option: {q['correct_option']}")
+            with col_action:
+                if st.session_state.editing_question_id != q["id"]:
+                    if st.button("Edit", key=f"edit_q_{q['id']}"):
+                        st.session_state.editing_question_id = q["id"]
+                        st.rerun()
+                elif st.button("Close", key=f"close_q_{q['id']}"):
+                    st.session_state.editing_question_id = None
+                    st.rerun()
+            if st.session_state.editing_question_id == q["id"]:
+                question_editor(storage, selected_quiz_for_management, q, i)
+            st.markdown("---")
 
-                st.markdown("---")
-                st.write("Edit this question:")
-                edited_question = st.text_area("Question Text", value=q["question"], key=f"edit_q_text_{selected_quiz_for_management}_{i}")
-                
-                # Dynamically generate text inputs for existing options, and empty for up to 4 if less exist
-                edited_options = []
-                for j in range(max(len(q["options"]), 4)): # Ensure at least 4 input fields are shown for editing
-                    option_value = q["options"][j] if j < len(q["options"]) else ""
-                    edited_option_input = st.text_input(f"Option {j+1}", value=option_value, key=f"edit_opt_{selected_quiz_for_management}_{i}_{j}")
-                    if edited_option_input: # Only include non-empty options in the final list
-                        edited_options.append(edited_option_input)
+def question_search_panel():
+    """Search box over every quiz's questions; each match opens that question's editor below."""
+    query = st.text_input("Search all questions", key="question_search_query", placeholder="Words or word beginnings, e.g. \"auth sap\"")
+    if not query.strip():
+        return
+    hits, match_count = get_question_search().search(query)
+    if not match_count:
+        st.info("No questions match all of these words.")
+        return
+    st.caption(f"{match_count} matching question(s)" + (f", showing the first {len(hits)}." if match_count > len(hits) else "."))
+    for hit in hits:
+        col_text, col_action = st.columns([0.85, 0.15])
+        with col_text:
+            st.markdown(f"**{hit['quiz_id']}:** {hit['question'][:120]}{'...' if len(hit['question']) > 120 else ''}")
+        with col_action:
+            st.button("Open", key=f"search_open_{hit['question_id']}", on_click=open_question_editor, args=(hit["quiz_id"], hit["question_id"]))
+    st.markdown("---")
 
-                try:
-                    # Find the index of the current correct option within the *edited* options
-                    current_correct_index = edited_options.index(q["correct_option"])
-                except ValueError:
-                    # If the correct option string is not found in the current edited options, default to the first option or None
-                    current_correct_index = 0 if edited_options else None
-
-                edited_correct_option = st.selectbox(
-                    "Correct Option",
-                    options=edited_options if edited_options else ["Select an option"],
-                    index=current_correct_index,
-                    key=f"edit_correct_opt_{selected_quiz_for_management}_{i}"
-                )
-                edited_explanation = st.text_area("Explanation", value=q["explanation"], key=f"edit_explanation_{selected_quiz_for_management}_{i}")
-
-                col_edit, col_delete = st.columns(2)
-                with col_edit:
-                    if st.button("Save Changes", key=f"save_q_{selected_quiz_for_management}_{i}"):
-                        if not (edited_question and edited_options and edited_correct_option and edited_explanation):
-                            st.error("Please fill in all mandatory fields (Question, at least one Option, Correct Option, and Explanation).")
-                        elif edited_correct_option not in edited_options:
-                            st.error("Correct option must be one of the provided options.")
-                        else:
-                            st.session_state.questions[selected_quiz_for_management][i] = {
-                                "question": edited_question,
-                                "options": edited_options, # Save only the valid, non-empty options
-                                "correct_option": edited_correct_option,
-                                "explanation": edited_explanation
-                            }
-                            save_json_file(QUESTIONS_FILE, st.session_state.questions)
-                            st.success(f"Question {i+1} updated successfully!")
-                            st.rerun()
-                with col_delete:
-                    if st.button("Delete Question", key=f"delete_q_{selected_quiz_for_management}_{i}"):
-                        st.session_state.questions[selected_quiz_for_management].pop(i)
-                        save_json_file(QUESTIONS_FILE, st.session_state.questions)
-                        st.warning(f"Question {i+1} deleted from '{selected_quiz_for_management}'.")
-                        st.rerun()
+def duplicate_matches_frame(matches):
+    """Table of near-duplicate matches from DuplicateIndex.similar() or clusters()."""
+    return pd.DataFrame(
+        [(match["quiz_id"], match["question_id"], match["question"], match["similarity"]) for match in matches],
+        columns=["Quiz", "Question ID", "Question", "Similarity"],
+    )
+
+def duplicate_scan_panel():
+    """Scan of every quiz for groups of near-duplicate questions."""
+    with st.expander("Find Near-Duplicate Questions"):
+        st.caption(f"Groups questions, across all quizzes, whose text and options overlap by at least {DUPLICATE_SIMILARITY:.0%}.")
+        if not st.button("Scan All Quizzes", key="duplicate_scan_button"):
+            return
+        clusters = get_duplicate_index().clusters()
+        if not clusters:
+            st.success("No near-duplicate questions found.")
+            return
+        st.warning(f"Found {len(clusters)} group(s) of near-duplicate questions.")
+        for number, cluster in enumerate(clusters, start=1):
+            st.markdown(f"**Group {number}** ({len(cluster)} questions)")
+            st.dataframe(duplicate_matches_frame(cluster), hide_index=True)
+
+def open_question_editor(quiz_id, question_id):
+    """Button callback: selects the quiz, turns to the page holding the question and opens its editor."""
+    question_ids = get_storage().question_pool(quiz_id).ids
+    if question_id not in question_ids:
+        return # Deleted since the search ran
+    page_size = st.session_state.get("questions_page_size", QUESTIONS_PAGE_SIZE)
+    st.session_state.manage_quiz_selector = quiz_id
+    st.session_state[f"questions_page_{quiz_id}"] = question_ids.index(question_id) // page_size + 1
+    st.session_state.editing_question_id = question_id
+
+def question_import_export(storage, quiz_id, questions):
+    """Bulk import of questions from a CSV/JSONL upload, and export of the quiz's questions. Returns True after an import."""
+    imported = False
+    with st.expander(f"Bulk Import / Export Questions for '{quiz_id}'"):
+        st.caption(
+            "CSV columns: question, option_1, option_2, ... , correct_option, explanation and an optional topic. "
+            "JSONL: one {\"question\", \"options\", \"correct_option\", \"explanation\"} object per line, optionally with a \"topic\"."
+        )
+        uploaded_file = st.file_uploader("Upload questions", type=["csv", "jsonl", "ndjson"], key=f"import_questions_file_{quiz_id}")
+        skip_invalid = st.checkbox("Import the valid rows even if some rows have errors", key=f"import_questions_skip_invalid_{quiz_id}")
+        allow_duplicates = st.checkbox("Also import questions that are near-duplicates of existing ones", key=f"import_questions_allow_duplicates_{quiz_id}")
+        if uploaded_file is not None and st.button("Import Questions", key=f"import_questions_button_{quiz_id}"):
+            new_questions, errors = prepare_question_import(iter_question_file_rows(uploaded_file, question_file_format(uploaded_file.name)))
+            if errors:
+                st.error(f"{len(errors)} row(s) have errors.")
+                st.dataframe(pd.DataFrame(errors, columns=["Row", "Error"]), hide_index=True)
+            duplicates = get_duplicate_index().check_batch(new_questions) if new_questions and not (errors and not skip_invalid) else {}
+            if duplicates:
+                st.warning(f"{len(duplicates)} question(s) are near-duplicates" + (" and were imported anyway." if allow_duplicates else " and were skipped."))
+                st.dataframe(import_duplicates_frame(new_questions, duplicates), hide_index=True)
+                if not allow_duplicates:
+                    new_questions = [question for position, question in enumerate(new_questions) if position not in duplicates]
+            if errors and not skip_invalid:
+                st.info("Nothing was imported. Fix the rows above, or choose to import only the valid rows.")
+            elif new_questions:
+                storage.add_questions(quiz_id, new_questions)
+                st.success(f"Imported {len(new_questions)} question(s) into '{quiz_id}'.")
+                imported = True
+            elif not errors and not duplicates:
+                st.warning("The uploaded file contains no questions.")
+
+        export_format = st.selectbox("Export format", list(QUESTION_FILE_FORMATS), key=f"export_questions_format_{quiz_id}")
+        st.download_button(
+            label=f"Download {len(questions)} Question(s) as {export_format}",
+            data=lambda: build_question_export(quiz_id, export_format), # Written only when clicked
+            file_name=f"{question_shard_filename(quiz_id)[:-len('.json')]}.{QUESTION_FILE_FORMATS[export_format]['extension']}",
+            mime=QUESTION_FILE_FORMATS[export_format]["mime"],
+            key=f"export_questions_download_{quiz_id}",
+            disabled=not questions,
+        )
+    return imported
+
+def import_duplicates_frame(questions, duplicates):
+    """Table of the imported questions DuplicateIndex.check_batch() flagged, with what each duplicates."""
+    return pd.DataFrame(
+        [
+            (
+                questions[position]["question"],
+                f"{match['quiz_id']}: {match['question']}" if match["quiz_id"] is not None else f"Earlier in this file: {match['question']}",
+                match["similarity"],
+            )
+            for position, match in sorted(duplicates.items())
+        ],
+        columns=["Question", "Near-Duplicate Of", "Similarity"],
+    )
+
+def quiz_pool_settings(storage, quiz_id, questions):
+    """How many questions each attempt draws from the quiz's pool, and whether the draw keeps topic shares."""
+    with st.expander(f"Question Draw Settings for '{quiz_id}'"):
+        settings = storage.get_quiz_settings(quiz_id)
+        topic_counts = {topic: len(question_ids) for topic, question_ids in storage.question_pool(quiz_id).by_topic.items()}
+        st.caption(f"The pool has {len(questions)} question(s) in {len(topic_counts)} topic(s). Each attempt draws its own seeded random selection.")
+        if len(topic_counts) > 1:
+            st.dataframe(pd.DataFrame(sorted(topic_counts.items()), columns=["Topic", "Questions"]).replace({"Topic": {"": "(no topic)"}}), hide_index=True)
+        draw_count = st.number_input(
+            "Questions drawn per attempt (0 = every question, in order)", min_value=0, step=1,
+            value=settings["draw_count"] or 0, key=f"quiz_draw_count_{quiz_id}",
+        )
+        stratify = st.checkbox("Keep each topic's share of the pool in every draw", value=settings["stratify_by_topic"], key=f"quiz_stratify_{quiz_id}")
+        if st.button("Save Draw Settings", key=f"save_quiz_settings_{quiz_id}"):
+            storage.update_quiz_settings(quiz_id, {"draw_count": int(draw_count) or None, "stratify_by_topic": stratify})
+            st.success("Draw settings saved. They apply to attempts started from now on.")
+
+def question_editor(storage, quiz_id, q, i):
+    """Full edit form for a single question (i is its position in the quiz, for display)."""
+    with st.container():
+        st.write(f"**Question:** {q['question']}")
+        st.write(f"**Options:** {', '.join(q['options'])}")
+        st.write(f"**Correct Option:** {q['correct_option']}")
+        st.write(f"**Explanation:** {q['explanation']}")
+        if q.get("topic"):
+            st.write(f"**Topic:** {q['topic']}")
+
+        st.markdown("---")
+        st.write("Edit this question:")
+        edited_question = st.text_area("Question Text", value=q["question"], key=f"edit_q_text_{quiz_id}_{q['id']}")
+
+        # Dynamically generate text inputs for existing options, and empty for up to 4 if less exist
+        edited_options = []
+        for j in range(max(len(q["options"]), 4)): # Ensure at least 4 input fields are shown for editing
+            option_value = q["options"][j] if j < len(q["options"]) else ""
+            edited_option_input = st.text_input(f"Option {j+1}", value=option_value, key=f"edit_opt_{quiz_id}_{q['id']}_{j}")
+            if edited_option_input: # Only include non-empty options in the final list
+                edited_options.append(edited_option_input)
+
+        try:
+            # Find the index of the current correct option within the *edited* options
+            current_correct_index = edited_options.index(q["correct_option"])
+        except ValueError:
+            # If the correct option string is not found in the current edited options, default to the first option or None
+            current_correct_index = 0 if edited_options else None
+
+        edited_correct_option = st.selectbox(
+            "Correct Option",
+            options=edited_options if edited_options else ["Select an option"],
+            index=current_correct_index,
+            key=f"edit_correct_opt_{quiz_id}_{q['id']}"
+        )
+        edited_explanation = st.text_area("Explanation", value=q["explanation"], key=f"edit_explanation_{quiz_id}_{q['id']}")
+        edited_topic = st.text_input("Topic (optional)", value=q.get("topic", ""), key=f"edit_topic_{quiz_id}_{q['id']}")
+
+        col_edit, col_delete = st.columns(2)
+        with col_edit:
+            if st.button("Save Changes", key=f"save_q_{quiz_id}_{q['id']}"):
+                error = validate_question(edited_question, edited_options, edited_correct_option, edited_explanation)
+                if error:
+                    st.error(error)
+                else:
+                    edited_q = {
+                        "question": edited_question,
+                        "options": edited_options, # Save only the valid, non-empty options
+                        "correct_option": edited_correct_option,
+                        "explanation": edited_explanation
+                    }
+                    if edited_topic.strip():
+                        edited_q["topic"] = edited_topic.strip()
+                    storage.update_question(quiz_id, q['id'], edited_q)
+                    st.success(f"Question {i+1} updated successfully!")
+                    st.rerun()
+        with col_delete:
+            if st.button("Delete Question", key=f"delete_q_{quiz_id}_{q['id']}"):
+                storage.delete_question(quiz_id, q['id'])
+                st.session_state.editing_question_id = None
+                st.warning(f"Question {i+1} deleted from '{quiz_id}'.")
+                st.rerun()
 
 def manage_users_section():
     """Admin section to create student accounts and manage existing ones."""
     st.header("Manage User Accounts")
+    storage = get_storage()
+    users = storage.get_users()
 
     with st.container():
         st.subheader("Create New Student Account")
@@ -902,22 +4402,21 @@ def manage_users_section():
 
             if create_button:
                 if new_username and new_password:
-                    if new_username in st.session_state.users:
+                    if new_username in users:
                         st.error(f"User ID '{new_username}' already exists.")
                     else:
-                        st.session_state.users[new_username] = {"password": new_password, "role": "student"}
-                        save_json_file(USERS_FILE, st.session_state.users)
-                        # Initialize progress for the new student
-                        if new_username not in st.session_state.user_progress:
-                            st.session_state.user_progress[new_username] = {} # Initialize as empty dict for quizzes
-                            save_json_file(USER_PROGRESS_FILE, st.session_state.user_progress)
+                        # Also initializes an empty progress record for the new student
+                        storage.add_user(new_username, {"password_hash": hash_passwords([new_password])[0], "role": "student"})
                         st.success(f"Student account '{new_username}' created successfully!")
                         st.rerun()
                 else:
                     st.error("Please provide both username and password.")
 
+    if bulk_user_provisioning(storage, users):
+        users = storage.get_users() # List the accounts as they are after the bulk change
+
     st.subheader("Existing Users")
-    if not st.session_state.users:
+    if not users:
         st.info("No users found.")
         return
 
@@ -932,8 +4431,8 @@ def manage_users_section():
         st.markdown("**Action**")
     st.markdown("---")
 
-    for u in list(st.session_state.users.keys()): # Iterate over a copy of keys for safe deletion
-        user_data = st.session_state.users[u]
+    for u in list(users.keys()): # Iterate over a copy of keys for safe deletion
+        user_data = users[u]
         col_user, col_role, col_delete_btn = st.columns([0.4, 0.3, 0.3])
         
         with col_user:
@@ -954,12 +4453,8 @@ def manage_users_section():
                 confirm_delete_user_checkbox = st.checkbox(f"Confirm delete {u}", key=delete_key_checkbox)
                 if st.button(f"Delete {u}", key=delete_key_button, disabled=not confirm_delete_user_checkbox):
                     if confirm_delete_user_checkbox:
-                        del st.session_state.users[u]
-                        save_json_file(USERS_FILE, st.session_state.users)
-                        # Remove user's progress data
-                        if u in st.session_state.user_progress:
-                            del st.session_state.user_progress[u]
-                            save_json_file(USER_PROGRESS_FILE, st.session_state.user_progress)
+                        # Removes the user's progress data as well
+                        storage.delete_user(u)
                         st.success(f"User '{u}' and their progress deleted successfully.")
                         st.rerun()
                     else:
@@ -967,44 +4462,82 @@ def manage_users_section():
         st.markdown("---")
 
 
+def bulk_user_provisioning(storage, users):
+    """Bulk creation of accounts from a CSV upload, and bulk deletion of the accounts listed in a CSV. Returns True after a change."""
+    changed = False
+    with st.expander("Bulk Create Accounts from CSV"):
+        st.caption("Columns: username, and optionally password and role (student or admin; defaults to student). Missing passwords are generated.")
+        uploaded_file = st.file_uploader("Upload users CSV", type=["csv"], key="bulk_create_users_file")
+        skip_invalid = st.checkbox("Create the valid accounts even if some rows have errors", key="bulk_create_users_skip_invalid")
+        if uploaded_file is not None and st.button("Create Accounts", key="bulk_create_users_button"):
+            records, errors, generated = prepare_user_import(iter_user_file_rows(uploaded_file), users.keys())
+            if errors:
+                st.error(f"{len(errors)} row(s) have errors.")
+                st.dataframe(pd.DataFrame(errors, columns=["Row", "Error"]), hide_index=True)
+            if errors and not skip_invalid:
+                st.info("No accounts were created. Fix the rows above, or choose to create only the valid accounts.")
+            elif records:
+                storage.add_users(records)
+                changed = True
+                st.success(f"Created {len(records)} account(s).")
+                if generated:
+                    st.warning("Passwords were generated for some accounts. Download them now; they are not shown again.")
+                    st.download_button(
+                        label=f"Download {len(generated)} Generated Password(s) (CSV)",
+                        data=build_export_file(generated, ["username", "password"], "CSV"),
+                        file_name="generated_passwords.csv",
+                        mime="text/csv",
+                        key="bulk_create_users_passwords",
+                        on_click="ignore", # Keep this result on screen after the download
+                    )
+            elif not errors:
+                st.warning("The uploaded file contains no users.")
+
+    with st.expander("Bulk Delete Accounts from CSV"):
+        st.caption("Upload a CSV with a username column. Admin accounts are never deleted here.")
+        uploaded_file = st.file_uploader("Upload usernames CSV", type=["csv"], key="bulk_delete_users_file")
+        confirm = st.checkbox("I understand that the listed accounts and all their progress will be deleted permanently.", key="bulk_delete_users_confirm")
+        if uploaded_file is not None and st.button("Delete Accounts", key="bulk_delete_users_button", disabled=not confirm):
+            usernames, errors = prepare_user_deletion(iter_user_file_rows(uploaded_file), users, st.session_state.username)
+            if errors:
+                st.warning(f"{len(errors)} row(s) were skipped.")
+                st.dataframe(pd.DataFrame(errors, columns=["Row", "Error"]), hide_index=True)
+            if usernames:
+                storage.delete_users(usernames)
+                changed = True
+                st.success(f"Deleted {len(usernames)} account(s) and their progress.")
+    return changed
+
 def view_trainee_performance_section():
     """Admin section for viewing and downloading trainee performance, categorized by attempted status."""
     st.header("Trainee Performance Overview")
 
-    all_users = st.session_state.users
-    user_progress = st.session_state.user_progress
-
-    attempted_students_summary = []
-    not_attempted_students = []
+    # Reads the materialized summary; nothing here scans all users or progress records
+    summary = get_performance_summary()
+    overview = summary.overview()
+    col_students, col_attempted, col_not_attempted, col_accuracy = st.columns(4)
+    with col_students:
+        st.metric("Students", overview["students"])
+    with col_attempted:
+        st.metric("Attempted a Quiz", overview["attempted"])
+    with col_not_attempted:
+        st.metric("Not Attempted", overview["not_attempted"])
+    with col_accuracy:
+        st.metric("Overall Accuracy", f"{overview['accuracy']:.2f}%")
 
-    for username, user_data in all_users.items():
-        if user_data["role"] == "student":
-            student_quizzes_progress = user_progress.get(username, {})
-            
-            has_attempted_any_quiz = False
-            for quiz_id, quiz_data in student_quizzes_progress.items():
-                # Ensure quiz_data is a dictionary before trying to use .get()
-                if isinstance(quiz_data, dict) and quiz_data.get("attempted"):
-                    has_attempted_any_quiz = True
-                    accuracy = (quiz_data['score'] / quiz_data['total'] * 100) if quiz_data['total'] > 0 else 0
-                    attempted_students_summary.append({
-                        "Student ID": username,
-                        "Quiz Name": quiz_id,
-                        "Score": f"{quiz_data['score']} / {quiz_data['total']}",
-                        "Accuracy": f"{accuracy:.2f}%"
-                    })
-            if not has_attempted_any_quiz:
-                not_attempted_students.append({"Student ID": username})
+    quiz_rows = summary.quiz_rows()
+    if quiz_rows:
+        st.subheader("📊 Results by Quiz")
+        st.dataframe(pd.DataFrame(quiz_rows), hide_index=True)
 
     with st.container():
         st.subheader("✅ Students Who Attempted Quizzes")
-        if attempted_students_summary:
-            df_attempted = pd.DataFrame(attempted_students_summary)
-            st.dataframe(df_attempted, hide_index=True)
-            csv_data_attempted = df_attempted.to_csv(index=False).encode('utf-8')
+        if overview["results"]:
+            offset = performance_page_offset("attempted", overview["results"])
+            st.dataframe(pd.DataFrame([performance_row(*row) for row in summary.attempted_rows_page(offset, PERFORMANCE_PAGE_SIZE)]), hide_index=True)
             st.download_button(
                 label="Download Attempted Students Data (CSV)",
-                data=csv_data_attempted,
+                data=attempted_students_csv, # Generated only when the button is clicked
                 file_name="attempted_students_performance.csv",
                 mime="text/csv",
             )
@@ -1013,20 +4546,158 @@ def view_trainee_performance_section():
 
     with st.container():
         st.subheader("❌ Students Who Haven't Attempted Any Quiz")
-        if not_attempted_students:
-            df_not_attempted = pd.DataFrame(not_attempted_students)
-            st.dataframe(df_not_attempted, hide_index=True)
-            csv_data_not_attempted = df_not_attempted.to_csv(index=False).encode('utf-8')
+        if overview["not_attempted"]:
+            offset = performance_page_offset("not_attempted", overview["not_attempted"])
+            st.dataframe(pd.DataFrame({"Student ID": summary.not_attempted_page(offset, PERFORMANCE_PAGE_SIZE)}), hide_index=True)
             st.download_button(
                 label="Download Not Attempted Students Data (CSV)",
-                data=csv_data_not_attempted,
+                data=not_attempted_students_csv, # Generated only when the button is clicked
                 file_name="not_attempted_students.csv",
                 mime="text/csv",
             )
         else:
             st.info("All students have attempted at least one quiz.")
 
+    with st.container():
+        st.subheader("📦 Export Performance Data")
+        col_kind, col_format = st.columns(2)
+        with col_kind:
+            export_kind = st.selectbox(
+                "Export",
+                ["summary", "detail"],
+                format_func=lambda kind: "One row per attempted quiz" if kind == "summary" else "One row per answer, every attempt (detailed)",
+                key="performance_export_kind",
+            )
+        with col_format:
+            export_formats = available_export_formats()
+            export_format = st.selectbox(
+                "Format", export_formats, key="performance_export_format",
+                help=None if "Parquet" in export_formats else "Parquet needs the optional 'pyarrow' package (pip install pyarrow).",
+            )
+        st.download_button(
+            label=f"Download {export_format} Export",
+            data=lambda: build_performance_export(export_kind, export_format), # Streamed only when clicked
+            file_name=f"trainee_performance_{export_kind}.{EXPORT_FORMATS[export_format]['extension']}",
+            mime=EXPORT_FORMATS[export_format]["mime"],
+            key="performance_export_download",
+        )
+
+def performance_page_offset(table_key, row_count):
+    """Shows a page picker for a performance table and returns the first row index to display."""
+    page_count = max(1, -(-row_count // PERFORMANCE_PAGE_SIZE))
+    if page_count == 1:
+        return 0
+    page_key = f"performance_page_{table_key}"
+    if st.session_state.get(page_key, 1) > page_count:
+        st.session_state[page_key] = page_count
+    page_number = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, step=1, key=page_key)
+    return (page_number - 1) * PERFORMANCE_PAGE_SIZE
+
+def item_analytics_section():
+    """Admin section showing per-question difficulty, discrimination and option choices for a quiz."""
+    st.header("Item Analytics")
+    storage = get_storage()
+    answers, items, options = get_item_analytics().statistics()
+    if answers.empty:
+        st.info("No answers have been recorded yet.")
+        return
+
+    quizzes = [quiz_id for quiz_id in storage.list_quizzes() if quiz_id in set(items["quiz_id"])]
+    if not quizzes:
+        st.info("No answers have been recorded for the current quizzes yet.")
+        return
+    quiz_id = st.selectbox("Select a quiz:", quizzes, key="item_analytics_quiz")
+    quiz_items = items[items["quiz_id"] == quiz_id].set_index("question_id")
+    quiz_options = options[options["quiz_id"] == quiz_id]
+    quiz_answers = answers[answers["quiz_id"] == quiz_id]
+
+    col_answers, col_students, col_accuracy = st.columns(3)
+    with col_answers:
+        st.metric("Answers Analysed", len(quiz_answers))
+    with col_students:
+        st.metric("Students", quiz_answers["username"].nunique())
+    with col_accuracy:
+        st.metric("Overall Accuracy", f"{quiz_answers['correct'].mean() * 100:.2f}%")
+
+    # Join the statistics to the current question bank, in quiz order
+    questions = [q for q in storage.get_questions(quiz_id) if q["id"] in quiz_items.index]
+    top_choices = quiz_options.sort_values("count", ascending=False).drop_duplicates("question_id").set_index("question_id")["option"]
+    rows = []
+    for number, q in enumerate(questions, start=1):
+        item = quiz_items.loc[q["id"]]
+        correct_index = q["options"].index(q["correct_option"]) if q["correct_option"] in q["options"] else None
+        rows.append({
+            "No": number,
+            "Question": q["question"],
+            "Answers": int(item["answers"]),
+            "Difficulty (% correct)": round(item["difficulty"] * 100, 1),
+            "Discrimination": round(item["discrimination"], 2) if pd.notna(item["discrimination"]) else None,
+            "Flags": item_flags(item["difficulty"], item["discrimination"], top_choices.get(q["id"]) != correct_index),
+        })
+    st.subheader("📋 Questions")
+    st.caption(
+        "Difficulty is the share of answers that were correct. Discrimination is the correlation between answering "
+        "the question correctly and the rest of that attempt's score, over every attempt including retakes; low or negative values deserve a review."
+    )
+    st.dataframe(pd.DataFrame(rows), hide_index=True)
+    removed = len(quiz_items) - len(questions)
+    if removed:
+        st.caption(f"{removed} question(s) with recorded answers have since been removed from the quiz.")
+
+    st.subheader("🔎 Option Choices")
+    position = st.selectbox(
+        "Select a question:",
+        range(len(questions)),
+        format_func=lambda i: f"{i + 1}. {questions[i]['question']}",
+        key=f"item_analytics_question_{quiz_id}",
+    )
+    question = questions[position]
+    counts = quiz_options[quiz_options["question_id"] == question["id"]].set_index("option")
+    st.dataframe(pd.DataFrame([
+        {
+            "Option": option,
+            "Correct": "✅" if option == question["correct_option"] else "",
+            "Chosen": int(counts["count"].get(i, 0)),
+            "Share (%)": round(counts["share"].get(i, 0) * 100, 1),
+        }
+        for i, option in enumerate(question["options"])
+    ]), hide_index=True)
+
+def diagnostics_section():
+    """Hidden admin page showing the per-stage timings and I/O recorded by the instrumentation."""
+    st.header("Diagnostics")
+    if not METRICS_ENABLED:
+        st.info("Instrumentation is off. Set METRICS_ENABLED = True in app.py and restart the app to record timings.")
+        return
+    metrics = get_metrics()
+    stages = metrics.snapshot()
+    if not stages:
+        st.info("No timings recorded yet.")
+        return
+    st.caption(f"Per-stage timings for this server process. Percentiles are histogram bucket upper bounds. Also exported to '{METRICS_FILE}' every {METRICS_EXPORT_SECONDS:g}s.")
+    st.dataframe(pd.DataFrame([
+        {
+            "Stage": stage,
+            "Calls": totals["count"],
+            "Mean (ms)": round(totals["seconds"] / totals["count"] * 1000, 2),
+            "p50 (ms) ≤": histogram_percentile(totals["buckets"], 0.5) * 1000,
+            "p95 (ms) ≤": histogram_percentile(totals["buckets"], 0.95) * 1000,
+            "Total (s)": round(totals["seconds"], 3),
+            "Read (KB)": round(totals["read_bytes"] / 1024, 1),
+            "Written (KB)": round(totals["written_bytes"] / 1024, 1),
+        }
+        for stage, totals in sorted(stages.items(), key=lambda item: -item[1]["seconds"])
+    ]), hide_index=True)
+    col_download, col_reset = st.columns(2)
+    with col_download:
+        st.download_button("Download Prometheus Metrics", data=metrics.prometheus_text, file_name="metrics.prom", mime="text/plain")
+    with col_reset:
+        if st.button("Reset Metrics", key="diagnostics_reset"):
+            metrics.reset()
+            st.rerun()
+
 # --- Main Application Logic ---
+@instrumented("rerun")
 def main():
     # set_page_config must be the first Streamlit command
     # Set layout to "wide" for full screen and sidebar to "collapsed" for mobile view
@@ -1072,6 +4743,11 @@ def main():
                     st.session_state.current_quiz_id = None # Reset quiz selection
                     reset_quiz_state()
                     st.rerun()
+                if st.button("Leaderboard", key="nav_leaderboard"):
+                    st.session_state.current_page = "Leaderboard"
+                    st.session_state.current_quiz_id = None # Reset quiz selection
+                    reset_quiz_state()
+                    st.rerun()
             elif st.session_state.user_role == 'admin':
                 st.header("Admin Panel")
                 if st.button("Manage Questions", key="admin_nav_manage_questions"):
@@ -1083,6 +4759,9 @@ def main():
                 if st.button("View Trainee Performance", key="admin_nav_view_performance"):
                     st.session_state.current_page = "View Trainee Performance"
                     st.rerun()
+                if st.button("Item Analytics", key="admin_nav_item_analytics"):
+                    st.session_state.current_page = "Item Analytics"
+                    st.rerun()
             
             st.markdown("---")
             if st.button("Logout", key="sidebar_logout_button"):
@@ -1097,25 +4776,34 @@ def main():
             display_logo() 
 
     # Main content area based on current_page
-    if not st.session_state.logged_in:
-        login_page()
-    else:
-        if st.session_state.current_page == "Home":
-            home_page()
-        elif st.session_state.current_page == "Take Quiz" and st.session_state.user_role == 'student':
-            student_quiz_page()
-        elif st.session_state.current_page == "View My Scores" and st.session_state.user_role == 'student':
-            view_my_scores_page()
-        elif st.session_state.current_page == "Manage Questions" and st.session_state.user_role == 'admin':
-            manage_questions_section()
-        elif st.session_state.current_page == "Manage Users" and st.session_state.user_role == 'admin':
-            manage_users_section()
-        elif st.session_state.current_page == "View Trainee Performance" and st.session_state.user_role == 'admin':
-            view_trainee_performance_section()
+    show_diagnostics = st.session_state.logged_in and st.session_state.user_role == 'admin' and "diagnostics" in st.query_params
+    page_name = "Diagnostics" if show_diagnostics else st.session_state.current_page if st.session_state.logged_in else "Login"
+    with measure(f"page:{page_name}"):
+        if not st.session_state.logged_in:
+            login_page()
         else:
-            # Fallback for unexpected page/role combinations, redirect to home
-            st.session_state.current_page = "Home"
-            st.rerun()
+            if show_diagnostics: # Hidden page: only reachable with ?diagnostics in the URL
+                diagnostics_section()
+            elif st.session_state.current_page == "Home":
+                home_page()
+            elif st.session_state.current_page == "Take Quiz" and st.session_state.user_role == 'student':
+                student_quiz_page()
+            elif st.session_state.current_page == "View My Scores" and st.session_state.user_role == 'student':
+                view_my_scores_page()
+            elif st.session_state.current_page == "Leaderboard" and st.session_state.user_role == 'student':
+                leaderboard_page()
+            elif st.session_state.current_page == "Manage Questions" and st.session_state.user_role == 'admin':
+                manage_questions_section()
+            elif st.session_state.current_page == "Manage Users" and st.session_state.user_role == 'admin':
+                manage_users_section()
+            elif st.session_state.current_page == "View Trainee Performance" and st.session_state.user_role == 'admin':
+                view_trainee_performance_section()
+            elif st.session_state.current_page == "Item Analytics" and st.session_state.user_role == 'admin':
+                item_analytics_section()
+            else:
+                # Fallback for unexpected page/role combinations, redirect to home
+                st.session_state.current_page = "Home"
+                st.rerun()
 
 
 if __name__ == "__main__":
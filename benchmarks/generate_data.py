@@ -0,0 +1,99 @@
+"""Writes a synthetic users.json, question bank and user_progress.json of any size.
+
+Every generated student has the password "Password@123". To keep generation fast at 10^5
+accounts they all share one salted hash, which is fine for benchmarking but not for real use.
+
+Usage:
+    python benchmarks/generate_data.py --users 10000 --output /tmp/nai-data
+    python benchmarks/generate_data.py --users 100000 --quizzes 5 --questions 40 --large-quiz 100000 --output /tmp/nai-data
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+
+PASSWORD = "Password@123"
+LARGE_QUIZ_ID = "Large Quiz"
+TOPICS = ["Access Control", "Auditing", "Identity", "Networking"]
+WORDS = "access role user audit control policy system data network secure token session client server identity".split()
+
+
+def student_name(number):
+    return f"student{number:06d}"
+
+
+def make_question(rng, quiz_number, question_number):
+    options = [f"Option {letter} for question {question_number + 1}" for letter in "ABCD"]
+    return {
+        "id": f"{quiz_number:04x}{question_number:08x}",
+        "question": f"Synthetic question {question_number + 1} of quiz {quiz_number + 1}: " + " ".join(rng.choice(WORDS) for _ in range(12)) + "?",
+        "options": options,
+        "correct_option": rng.choice(options),
+        "explanation": "Synthetic explanation: " + " ".join(rng.choice(WORDS) for _ in range(20)) + ".",
+        "topic": TOPICS[question_number % len(TOPICS)],
+    }
+
+
+def generate(directory, users=100, quizzes=3, questions_per_quiz=20, attempted_share=0.8, large_quiz_questions=0, seed=0):
+    """Writes the three data files into directory; returns a dict of what was generated.
+
+    Each student attempts at most one quiz (with probability attempted_share). large_quiz_questions
+    adds an extra, never-attempted quiz of that many questions for question-management benchmarks.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    password_hash = app.hash_password(PASSWORD)
+    users_data = {"admin": {"password_hash": app.hash_password("adminpassword"), "role": "admin"}}
+    users_data.update({student_name(i): {"password_hash": password_hash, "role": "student"} for i in range(users)})
+
+    questions_data = {f"Quiz {q + 1}": [make_question(rng, q, i) for i in range(questions_per_quiz)] for q in range(quizzes)}
+    if large_quiz_questions:
+        questions_data[LARGE_QUIZ_ID] = [make_question(rng, quizzes, i) for i in range(large_quiz_questions)]
+
+    progress_data = {"admin": {}}
+    answers = 0
+    quiz_ids = list(questions_data)[:quizzes]
+    for i in range(users):
+        user_progress = progress_data.setdefault(student_name(i), {})
+        if not quiz_ids or rng.random() >= attempted_share:
+            continue
+        quiz_id = rng.choice(quiz_ids)
+        ability = rng.random()
+        log = []
+        for question in questions_data[quiz_id]:
+            correct = rng.random() < ability
+            chosen = question["options"].index(question["correct_option"]) if correct else rng.randrange(len(question["options"]))
+            log.append({"q": question["id"], "a": chosen, "c": int(question["options"][chosen] == question["correct_option"])})
+        user_progress[quiz_id] = {"score": sum(entry["c"] for entry in log), "total": len(log), "attempted": True, "answers_log": log}
+        answers += len(log)
+
+    for filename, data, compact in (
+        (app.USERS_FILE, users_data, False),
+        (app.QUESTIONS_FILE, questions_data, False),
+        (app.USER_PROGRESS_FILE, progress_data, True),
+    ):
+        with open(os.path.join(directory, filename), "w") as f:
+            json.dump(data, f, separators=(",", ":")) if compact else json.dump(data, f, indent=2)
+    return {"users": users, "quizzes": len(questions_data), "answers": answers}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic NeuroverseAI data files.")
+    parser.add_argument("--users", type=int, default=1000, help="Number of student accounts.")
+    parser.add_argument("--quizzes", type=int, default=3)
+    parser.add_argument("--questions", type=int, default=20, help="Questions per quiz.")
+    parser.add_argument("--attempted-share", type=float, default=0.8, help="Share of students who attempted a quiz.")
+    parser.add_argument("--large-quiz", type=int, default=0, help=f"Also add '{LARGE_QUIZ_ID}' with this many questions.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True, help="Directory to write the data files to.")
+    args = parser.parse_args()
+    counts = generate(args.output, args.users, args.quizzes, args.questions, args.attempted_share, args.large_quiz, args.seed)
+    print(f"Wrote {counts['users']} students, {counts['quizzes']} quizzes and {counts['answers']} answers to '{args.output}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Shared helpers for the benchmark scripts: throwaway workspaces, latency percentiles and I/O counters."""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_workspace(prefix="nai-bench-"):
+    """Copies the app into a new temp directory, makes it the working directory and importable as `app`."""
+    directory = tempfile.mkdtemp(prefix=prefix)
+    for name in ("app.py", "manage.py"):
+        shutil.copy(os.path.join(APP_DIR, name), directory)
+    if os.path.isdir(os.path.join(APP_DIR, ".streamlit")):
+        shutil.copytree(os.path.join(APP_DIR, ".streamlit"), os.path.join(directory, ".streamlit"))
+    os.chdir(directory)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    return directory
+
+
+def io_counters():
+    """Returns (bytes read, bytes written) through read/write calls by this process, or None off Linux."""
+    try:
+        with open("/proc/self/io") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+class Measurement:
+    """Context manager recording the wall time and process I/O of the enclosed block."""
+
+    def __enter__(self):
+        self._io = io_counters()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self._started
+        io_now = io_counters()
+        self.read_bytes, self.written_bytes = (
+            (io_now[0] - self._io[0], io_now[1] - self._io[1]) if io_now and self._io else (None, None)
+        )
+        return False
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def latency_summary(seconds):
+    """Returns p50/p95/p99/max (in ms) and the count of a list of latencies in seconds."""
+    return {
+        "count": len(seconds),
+        "p50 ms": percentile(seconds, 0.50) * 1000,
+        "p95 ms": percentile(seconds, 0.95) * 1000,
+        "p99 ms": percentile(seconds, 0.99) * 1000,
+        "max ms": max(seconds) * 1000,
+    }
+
+
+def format_bytes(count):
+    if count is None:
+        return "n/a"
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(count) < 1024 or unit == "GB":
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+
+
+def print_table(rows):
+    """Prints a list of dicts as an aligned text table (floats with one decimal)."""
+    if not rows:
+        return
+    columns = list(rows[0])
+    cells = [[f"{row[c]:.1f}" if isinstance(row[c], float) else str(row[c]) for c in columns] for row in rows]
+    widths = [max(len(column), *(len(line[i]) for line in cells)) for i, column in enumerate(columns)]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for line in cells:
+        print("  ".join(cell.rjust(width) for cell, width in zip(line, widths)))
@@ -0,0 +1,72 @@
+"""Measures password KDF cost against login latency when many students log in at once.
+
+Each login is a check_password_hash() call submitted to a pool of --workers threads, like
+the app's password worker pool. For every cost setting the script reports the time of a single
+hash and the p50/p95/max latency of a burst of simultaneous logins, so PASSWORD_SCRYPT_N (or
+PASSWORD_PBKDF2_ITERATIONS) and PASSWORD_WORKERS in app.py can be tuned to the server.
+
+Usage:
+    python benchmarks/kdf_benchmark.py
+    python benchmarks/kdf_benchmark.py --scheme pbkdf2_sha256 --costs 200000 600000 --logins 50 200 --workers 2 4
+"""
+import argparse
+import concurrent.futures
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+
+DEFAULT_COSTS = {"scrypt": [2 ** 12, 2 ** 13, 2 ** 14, 2 ** 15], "pbkdf2_sha256": [100_000, 300_000, 600_000]}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def single_hash_seconds(password_hash):
+    started = time.perf_counter()
+    app.check_password_hash("Password@123", password_hash)
+    return time.perf_counter() - started
+
+
+def login_burst(password_hash, logins, workers):
+    """Submits all verifications at once; returns (per-login latencies, wall time) in seconds."""
+    def verify(submitted_at):
+        app.check_password_hash("Password@123", password_hash)
+        return time.perf_counter() - submitted_at
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        started = time.perf_counter()
+        futures = [executor.submit(verify, time.perf_counter()) for _ in range(logins)]
+        latencies = [future.result() for future in futures]
+    return latencies, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scheme", choices=list(DEFAULT_COSTS), default=app.PASSWORD_HASH_SCHEME)
+    parser.add_argument("--costs", type=int, nargs="+", help="scrypt n values or PBKDF2 iteration counts to try.")
+    parser.add_argument("--logins", type=int, nargs="+", default=[20, 100], help="Simultaneous logins per burst.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[app.PASSWORD_WORKERS], help="Password worker pool sizes.")
+    args = parser.parse_args()
+
+    print(f"{'scheme':<14} {'cost':>8} {'hash ms':>8} {'logins':>6} {'workers':>7} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'logins/s':>9}")
+    for cost in args.costs or DEFAULT_COSTS[args.scheme]:
+        password_hash = app.hash_password("Password@123", scheme=args.scheme, cost=cost)
+        single = min(single_hash_seconds(password_hash) for _ in range(3))
+        for logins in args.logins:
+            for workers in args.workers:
+                latencies, wall = login_burst(password_hash, logins, workers)
+                print(
+                    f"{args.scheme:<14} {cost:>8} {single * 1000:>8.1f} {logins:>6} {workers:>7} "
+                    f"{statistics.median(latencies) * 1000:>8.1f} {percentile(latencies, 0.95) * 1000:>8.1f} "
+                    f"{max(latencies) * 1000:>8.1f} {logins / wall:>9.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Headless load test: N simulated students log in, take a whole quiz and submit it, in parallel.
+
+Each student drives a streamlit.testing.v1.AppTest session against a copy of the app running on
+synthetic data (see generate_data.py). AppTest keeps one global runtime per process, so every
+student runs in its own worker process; they all start together and share the same data files,
+locks and journal, like a class starting a quiz at once against several server workers. The
+report lists per-rerun latency percentiles for each step of the flow and the file I/O per rerun
+(from /proc/self/io).
+
+Usage:
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --students 50 --users 10000 --questions 20
+"""
+import argparse
+import collections
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+
+import harness
+
+STEPS = ["login", "start quiz", "select option", "submit answer", "next question", "finish quiz"]
+_start_barrier = None
+
+
+class Student:
+    """Scripts one student's session and records the latency of every rerun by step."""
+
+    def __init__(self, username, timeout):
+        from streamlit.testing.v1 import AppTest
+        self.username = username
+        self.at = AppTest.from_file(os.path.abspath("app.py"), default_timeout=timeout) # The workspace copy
+        self.latencies = collections.defaultdict(list)
+
+    def rerun(self, step, action=None):
+        if action is not None:
+            action()
+        with harness.Measurement() as measurement:
+            self.at.run()
+        if self.at.exception:
+            raise RuntimeError(f"{self.username} failed during '{step}': {self.at.exception[0].value}")
+        self.latencies[step].append(measurement.seconds)
+
+    def button(self, label):
+        for button in self.at.button:
+            if button.label == label:
+                return button
+        raise RuntimeError(f"{self.username}: no '{label}' button; page shows {[e.value for e in self.at.error + self.at.warning]}")
+
+    def take_quiz(self):
+        self.at.run()
+        self.at.text_input(key="login_username").input(self.username)
+        self.at.text_input(key="login_password").input("Password@123")
+        self.rerun("login", self.button("Login").click)
+        self.at.session_state.current_page = "Take Quiz"
+        self.at.run()
+        self.rerun("start quiz", self.button("Start Selected Quiz").click)
+        while not self.at.session_state.quiz_completed:
+            radio = self.at.radio[0]
+            self.rerun("select option", lambda: radio.set_value(radio.options[0]))
+            self.rerun("submit answer", self.button("Submit Answer").click)
+            finishing = any(b.label == "Submit Quiz" for b in self.at.button)
+            self.rerun("finish quiz" if finishing else "next question", self.button("Submit Quiz" if finishing else "Next Question").click)
+
+
+def _init_worker(barrier):
+    global _start_barrier
+    _start_barrier = barrier
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+
+def simulate_student(username, timeout):
+    """Runs one student's quiz in this worker process; returns (latencies by step, bytes read, bytes written)."""
+    student = Student(username, timeout)
+    _start_barrier.wait() # Start every session together, like a class logging in at 9:00
+    with harness.Measurement() as measurement:
+        student.take_quiz()
+    return dict(student.latencies), measurement.read_bytes, measurement.written_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many students taking a quiz at once.")
+    parser.add_argument("--students", type=int, default=20, help="Simulated students running in parallel.")
+    parser.add_argument("--users", type=int, default=1000, help="Accounts in the generated users.json (at least --students).")
+    parser.add_argument("--questions", type=int, default=10, help="Questions per quiz.")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds allowed per rerun.")
+    args = parser.parse_args()
+
+    directory = harness.make_workspace()
+    import generate_data
+    generate_data.generate(directory, users=max(args.users, args.students), quizzes=3, questions_per_quiz=args.questions, attempted_share=0)
+    print(f"Workspace: {directory}")
+
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(args.students + 1)
+    with concurrent.futures.ProcessPoolExecutor(args.students, mp_context=context, initializer=_init_worker, initargs=(barrier,)) as executor:
+        futures = [executor.submit(simulate_student, generate_data.student_name(i), args.timeout) for i in range(args.students)]
+        barrier.wait() # Time from the moment every worker is ready
+        with harness.Measurement() as total:
+            results = [future.result() for future in futures]
+
+    latencies = collections.defaultdict(list)
+    for student_latencies, _, _ in results:
+        for step, seconds in student_latencies.items():
+            latencies[step].extend(seconds)
+    rows = [dict(step=step, **harness.latency_summary(latencies[step])) for step in STEPS if latencies[step]]
+    all_latencies = [seconds for step in STEPS for seconds in latencies[step]]
+    rows.append(dict(step="all reruns", **harness.latency_summary(all_latencies)))
+    harness.print_table(rows)
+
+    reruns = len(all_latencies)
+    print(f"\n{args.students} students, {reruns} reruns in {total.seconds:.1f}s ({reruns / total.seconds:.1f} reruns/s)")
+    if all(read is not None for _, read, _ in results):
+        read_bytes = sum(read for _, read, _ in results)
+        written_bytes = sum(written for _, _, written in results)
+        print(f"File I/O: {harness.format_bytes(read_bytes)} read, {harness.format_bytes(written_bytes)} written "
+              f"({harness.format_bytes(read_bytes / reruns)} read, {harness.format_bytes(written_bytes / reruns)} written per rerun)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Micro-benchmarks for the JSON file helpers and the heaviest admin pages at several data sizes.
+
+For each scale (number of students, and number of questions in an extra "Large Quiz") a fresh
+workspace is generated with generate_data.py, then:
+  * load_json_file / save_json_file are timed on the users, question and progress files;
+  * draw_quiz_questions draws a stratified 20-question attempt from the "Large Quiz" pool;
+  * DuplicateIndex.similar checks one question for near-duplicates, and clusters() scans the bank
+    (once, as it is an on-demand admin action);
+  * Leaderboards.top and standing read the overall board and one student's rank;
+  * view_trainee_performance_section and manage_questions_section are rendered through AppTest
+    in an admin session: one cold rerun (empty caches) followed by --repeats warm reruns.
+Each row reports latency percentiles and the file I/O per call or rerun (from /proc/self/io).
+
+Usage:
+    python benchmarks/micro.py
+    python benchmarks/micro.py --scales 100 10000 --repeats 10
+"""
+import argparse
+import logging
+import os
+
+import harness
+
+PAGES = {"View Trainee Performance": "view_trainee_performance_section", "Manage Questions": "manage_questions_section"}
+
+
+def measure(function, repeats):
+    """Calls function repeats times; returns (latency summary, mean bytes read, mean bytes written)."""
+    measurements = []
+    for _ in range(repeats):
+        with harness.Measurement() as measurement:
+            function()
+        measurements.append(measurement)
+    return summarize(measurements)
+
+
+def summarize(measurements):
+    row = harness.latency_summary([m.seconds for m in measurements])
+    row.pop("p99 ms")
+    if measurements[0].read_bytes is None:
+        return dict(row, read="n/a", written="n/a")
+    return dict(
+        row,
+        read=harness.format_bytes(sum(m.read_bytes for m in measurements) / len(measurements)),
+        written=harness.format_bytes(sum(m.written_bytes for m in measurements) / len(measurements)),
+    )
+
+
+def benchmark_scale(scale, repeats):
+    directory = harness.make_workspace()
+    import generate_data
+    import app
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    generate_data.generate(directory, users=scale, large_quiz_questions=scale)
+    st.cache_resource.clear() # Caches from the previous scale point at other files
+    rows = []
+    for filename in (app.USERS_FILE, app.QUESTIONS_FILE, app.USER_PROGRESS_FILE):
+        size = harness.format_bytes(os.path.getsize(filename))
+        rows.append(dict(scale=scale, benchmark=f"load_json_file({filename}, {size})", **measure(lambda: app.load_json_file(filename), repeats)))
+    progress = app.load_json_file(app.USER_PROGRESS_FILE)
+    rows.append(dict(scale=scale, benchmark=f"save_json_file({app.USER_PROGRESS_FILE})", **measure(lambda: app.save_json_file(app.USER_PROGRESS_FILE, progress, compact=True), repeats)))
+    storage = app.get_storage()
+    storage.update_quiz_settings(generate_data.LARGE_QUIZ_ID, {"draw_count": 20, "stratify_by_topic": True})
+    draw = lambda: app.draw_quiz_questions(storage, generate_data.LARGE_QUIZ_ID, generate_data.student_name(0), app.new_attempt_id())
+    rows.append(dict(scale=scale, benchmark="draw_quiz_questions (20, stratified)", **measure(draw, repeats)))
+    duplicates = app.get_duplicate_index()
+    question = storage.get_questions(generate_data.LARGE_QUIZ_ID)[0]
+    rows.append(dict(scale=scale, benchmark="DuplicateIndex build + similar (cold)", **measure(lambda: duplicates.similar(question), 1)))
+    rows.append(dict(scale=scale, benchmark="DuplicateIndex.similar (warm)", **measure(lambda: duplicates.similar(question), repeats)))
+    rows.append(dict(scale=scale, benchmark="DuplicateIndex.clusters", **measure(duplicates.clusters, 1)))
+    leaderboards = app.get_leaderboards()
+    leaderboard_view = lambda: (leaderboards.top(), leaderboards.standing(generate_data.student_name(0)))
+    rows.append(dict(scale=scale, benchmark="Leaderboards build + view (cold)", **measure(leaderboard_view, 1)))
+    rows.append(dict(scale=scale, benchmark="Leaderboards top + standing (warm)", **measure(leaderboard_view, repeats)))
+
+    for page, function_name in PAGES.items():
+        at = AppTest.from_file(os.path.join(directory, "app.py"), default_timeout=600)
+        at.session_state.logged_in = True
+        at.session_state.user_role = "admin"
+        at.session_state.username = "admin"
+        at.session_state.current_page = page
+        at.session_state.manage_quiz_selector = generate_data.LARGE_QUIZ_ID
+
+        def rerun():
+            at.run()
+            if at.exception:
+                raise RuntimeError(f"{page} failed: {at.exception[0].value}")
+        st.cache_resource.clear()
+        rows.append(dict(scale=scale, benchmark=f"{function_name} (cold)", **measure(rerun, 1)))
+        rows.append(dict(scale=scale, benchmark=f"{function_name} (warm)", **measure(rerun, repeats)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the JSON helpers and admin pages at several data sizes.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10 ** 2, 10 ** 4, 10 ** 5], help="Students (and Large Quiz questions) per run.")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed calls or warm reruns per benchmark.")
+    args = parser.parse_args()
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    rows = []
+    for scale in args.scales:
+        rows.extend(benchmark_scale(scale, args.repeats))
+    harness.print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Command-line maintenance tasks for the NeuroverseAI quiz platform.
+
+Usage:
+    python manage.py import-json [--db nai.sqlite3]
+    python manage.py compact-answer-logs
+    python manage.py shard-questions
+    python manage.py export [--kind summary|detail] [--format csv|csv.gz|parquet] [--output FILE]
+    python manage.py import-questions QUIZ FILE [--skip-invalid] [--allow-duplicates]
+    python manage.py export-questions QUIZ [--format csv|jsonl] [--output FILE]
+    python manage.py find-duplicates
+    python manage.py hash-passwords
+"""
+import argparse
+
+import app
+
+
+def import_json_command(args):
+    """Copies the JSON question bank, users and progress into a SQLite database."""
+    counts = app.import_json_into_sqlite(args.db)
+    print(f"Imported {counts['quizzes']} quizzes, {counts['questions']} questions, "
+          f"{counts['users']} users and {counts['attempts']} quiz results into '{args.db}'.")
+    print("Set STORAGE_BACKEND = \"sqlite\" in app.py to serve the app from this database.")
+
+
+def compact_answer_logs_command(args):
+    """Converts stored full-text answer logs to the compact question/option-index format."""
+    app.migrate_answer_logs(app.get_storage())
+    print("Answer logs converted to the compact format.")
+
+
+def shard_questions_command(args):
+    """Splits the single question bank file into one file per quiz plus a manifest."""
+    quiz_count = app.shard_question_bank()
+    print(f"Wrote {quiz_count} quiz shards and '{app.QUESTIONS_MANIFEST}'. Restart the app to serve questions from the shards.")
+
+
+EXPORT_FORMAT_CHOICES = {"csv": "CSV", "csv.gz": "CSV (gzip)", "parquet": "Parquet"}
+
+
+def export_command(args):
+    """Streams trainee performance straight to a file, chunk by chunk."""
+    storage = app.get_storage()
+    if args.kind == "detail":
+        rows, columns = app.iter_detail_export_rows(storage), app.DETAIL_EXPORT_COLUMNS
+    else:
+        rows, columns = app.iter_summary_export_rows(storage), app.SUMMARY_EXPORT_COLUMNS
+    output = args.output or f"trainee_performance_{args.kind}.{args.format}"
+    with open(output, "wb") as export_file:
+        app.write_export(rows, columns, EXPORT_FORMAT_CHOICES[args.format], export_file)
+    print(f"Wrote the {args.kind} performance export to '{output}'.")
+
+
+def import_questions_command(args):
+    """Validates a CSV/JSONL question file and adds its questions to a quiz in one write."""
+    storage = app.get_storage()
+    if args.quiz not in storage.list_quizzes():
+        raise SystemExit(f"Quiz '{args.quiz}' does not exist.")
+    with open(args.file, "rb") as question_file:
+        questions, errors = app.prepare_question_import(app.iter_question_file_rows(question_file, app.question_file_format(args.file)))
+    for row_number, error in errors:
+        print(f"Row {row_number}: {error}")
+    if errors and not args.skip_invalid:
+        raise SystemExit(f"{len(errors)} row(s) have errors; nothing was imported (use --skip-invalid to import the valid rows).")
+    duplicates = app.get_duplicate_index().check_batch(questions)
+    for position, match in sorted(duplicates.items()):
+        original = f"'{match['quiz_id']}' question {match['question_id']}" if match["quiz_id"] is not None else "an earlier question in the file"
+        print(f"Near-duplicate ({match['similarity']:.0%}) of {original}: {questions[position]['question']}")
+    if duplicates and not args.allow_duplicates:
+        questions = [question for position, question in enumerate(questions) if position not in duplicates]
+        print(f"Skipped {len(duplicates)} near-duplicate question(s) (use --allow-duplicates to import them).")
+    if questions:
+        storage.add_questions(args.quiz, questions)
+    print(f"Imported {len(questions)} question(s) into '{args.quiz}'.")
+
+
+def export_questions_command(args):
+    """Writes one quiz's questions to a CSV or JSONL file."""
+    storage = app.get_storage()
+    if args.quiz not in storage.list_quizzes():
+        raise SystemExit(f"Quiz '{args.quiz}' does not exist.")
+    output = args.output or app.question_shard_filename(args.quiz)[:-len(".json")] + f".{args.format}"
+    with open(output, "wb") as export_file:
+        app.write_question_export(storage.get_questions(args.quiz), args.format.upper(), export_file)
+    print(f"Wrote the questions of '{args.quiz}' to '{output}'.")
+
+
+def find_duplicates_command(args):
+    """Lists groups of near-duplicate questions across all quizzes."""
+    clusters = app.get_duplicate_index().clusters()
+    for number, cluster in enumerate(clusters, start=1):
+        print(f"Group {number}:")
+        for match in cluster:
+            print(f"  [{match['quiz_id']} / {match['question_id']}, {match['similarity']:.0%}] {match['question']}")
+    print(f"Found {len(clusters)} group(s) of near-duplicate questions.")
+
+
+def hash_passwords_command(args):
+    """Replaces stored plaintext passwords with salted hashes."""
+    migrated = app.migrate_password_hashes(app.get_storage())
+    print(f"Hashed the passwords of {migrated} account(s).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NeuroverseAI quiz platform maintenance tasks.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import-json", help="Import the JSON data files into a SQLite database.")
+    import_parser.add_argument("--db", default=app.SQLITE_DB_FILE, help="Path of the SQLite database to create or update.")
+    import_parser.set_defaults(func=import_json_command)
+
+    compact_parser = subparsers.add_parser("compact-answer-logs", help="Rewrite stored answer logs in the compact format.")
+    compact_parser.set_defaults(func=compact_answer_logs_command)
+
+    shard_parser = subparsers.add_parser("shard-questions", help="Split the question bank into one file per quiz.")
+    shard_parser.set_defaults(func=shard_questions_command)
+
+    export_parser = subparsers.add_parser("export", help="Export trainee performance to CSV, gzipped CSV or Parquet.")
+    export_parser.add_argument("--kind", choices=["summary", "detail"], default="summary", help="One row per attempted quiz (latest result), or one row per answer of every attempt.")
+    export_parser.add_argument("--format", choices=list(EXPORT_FORMAT_CHOICES), default="csv", help="Output file format.")
+    export_parser.add_argument("--output", help="Output file path (defaults to trainee_performance_<kind>.<format>).")
+    export_parser.set_defaults(func=export_command)
+
+    import_questions_parser = subparsers.add_parser("import-questions", help="Add questions to a quiz from a CSV or JSONL file.")
+    import_questions_parser.add_argument("quiz", help="Name of the quiz to add the questions to.")
+    import_questions_parser.add_argument("file", help="CSV or JSONL (.jsonl/.ndjson) file of questions.")
+    import_questions_parser.add_argument("--skip-invalid", action="store_true", help="Import the valid rows even if some rows have errors.")
+    import_questions_parser.add_argument("--allow-duplicates", action="store_true", help="Also import questions that are near-duplicates of existing ones.")
+    import_questions_parser.set_defaults(func=import_questions_command)
+
+    export_questions_parser = subparsers.add_parser("export-questions", help="Export a quiz's questions to CSV or JSONL.")
+    export_questions_parser.add_argument("quiz", help="Name of the quiz to export.")
+    export_questions_parser.add_argument("--format", choices=["csv", "jsonl"], default="csv", help="Output file format.")
+    export_questions_parser.add_argument("--output", help="Output file path (defaults to a file named after the quiz).")
+    export_questions_parser.set_defaults(func=export_questions_command)
+
+    duplicates_parser = subparsers.add_parser("find-duplicates", help="List groups of near-duplicate questions across all quizzes.")
+    duplicates_parser.set_defaults(func=find_duplicates_command)
+
+    hash_parser = subparsers.add_parser("hash-passwords", help="Replace stored plaintext passwords with salted hashes.")
+    hash_parser.set_defaults(func=hash_passwords_command)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
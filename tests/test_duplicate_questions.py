@@ -0,0 +1,50 @@
+import app
+
+
+def question(question_id, text, options=("Roles", "Profiles", "Users")):
+    return {"id": question_id, "question": text, "options": list(options), "correct_option": options[0], "explanation": "", "topic": ""}
+
+
+ORIGINAL = "Which object bundles the authorizations that are assigned to a user in SAP systems"
+
+
+def build(storage):
+    storage.create_quiz("Security")
+    storage.create_quiz("Basis")
+    storage.add_questions("Security", [question("s1", ORIGINAL), question("s2", "What does the security audit log record for each dialog logon")])
+    storage.add_questions("Basis", [question("b1", "Which transaction schedules background jobs", ("SM36", "SM37", "SE38"))])
+    return app.DuplicateIndex(storage)
+
+
+def test_near_duplicates_are_found_and_distinct_questions_are_not(workspace):
+    index = build(app.JsonStorage())
+    reworded = question("new", ORIGINAL + " today", ("Users", "Roles", "Profiles")) # Option order doesn't matter
+    matches = index.similar(reworded)
+    assert [(m["quiz_id"], m["question_id"]) for m in matches] == [("Security", "s1")]
+    assert app.DUPLICATE_SIMILARITY <= matches[0]["similarity"] < 1
+    assert index.similar(question("new", "How are transport requests released to production"), limit=5) == []
+
+
+def test_batch_check_finds_duplicates_in_the_bank_and_the_batch(workspace):
+    index = build(app.JsonStorage())
+    batch = [
+        question("n1", "Which tool compares client settings across two systems at once"),
+        question("n2", ORIGINAL),
+        question("n3", "Which tool compares client settings across two systems at once"),
+    ]
+    duplicates = index.check_batch(batch)
+    assert sorted(duplicates) == [1, 2]
+    assert (duplicates[1]["question_id"], duplicates[1]["similarity"]) == ("s1", 1.0)
+    assert (duplicates[2]["quiz_id"], duplicates[2]["batch_position"]) == (None, 0)
+
+
+def test_clusters_follow_question_events(workspace):
+    storage = app.JsonStorage()
+    index = build(storage)
+    assert index.clusters() == []
+    storage.add_question("Basis", question("b2", ORIGINAL))
+    assert [[(m["quiz_id"], m["question_id"]) for m in cluster] for cluster in index.clusters()] == [[("Security", "s1"), ("Basis", "b2")]]
+    storage.delete_question("Basis", "b2")
+    assert index.clusters() == []
+    storage.delete_quiz("Security")
+    assert index.similar(question("new", ORIGINAL)) == []
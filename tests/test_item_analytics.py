@@ -0,0 +1,65 @@
+import pytest
+
+import app
+
+
+QUESTION = {"id": "q1", "question": "2 + 2?", "options": ["3", "4"], "correct_option": "4", "explanation": ""}
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def storage(request, workspace, monkeypatch):
+    monkeypatch.setattr(app, "PROGRESS_WRITE_BEHIND", False)
+    if request.param == "sqlite":
+        return app.SqliteStorage(str(workspace / "nai.sqlite3"))
+    return app.JsonStorage()
+
+
+def record(storage, username, answer):
+    entry = app.compact_answer(QUESTION, answer)
+    storage.record_attempt(username, "Quiz", {
+        "attempt_id": app.new_attempt_id(), "score": entry["c"], "total": 1, "answers_log": [entry],
+    })
+
+
+def test_answer_frame_covers_earlier_attempts(storage):
+    storage.create_quiz("Quiz")
+    storage.add_questions("Quiz", [QUESTION])
+    record(storage, "alice", "3")
+    record(storage, "alice", "4") # Retake; the summary now holds only this attempt
+    record(storage, "bob", "4")
+
+    answers = app.build_answer_frame(storage)
+    assert len(answers) == 3
+    assert answers["attempt"].nunique() == 3
+    items, _ = app.compute_item_statistics(answers)
+    assert items.iloc[0]["difficulty"] == pytest.approx(2 / 3)
+
+
+def test_answer_frame_drops_history_of_deleted_users(storage):
+    storage.create_quiz("Quiz")
+    storage.add_questions("Quiz", [QUESTION])
+    record(storage, "alice", "3")
+    record(storage, "alice", "4")
+    storage.delete_user("alice")
+    assert app.build_answer_frame(storage).empty
+
+
+def test_statistics_are_recomputed_only_for_answer_changes(storage, monkeypatch):
+    storage.create_quiz("Quiz")
+    storage.add_questions("Quiz", [QUESTION])
+    storage.add_user("alice", {"password_hash": "", "role": "student"})
+    record(storage, "alice", "4")
+    analytics = app.ItemAnalytics(storage)
+    assert len(analytics.statistics()[0]) == 1
+    builds = []
+    original = app.build_answer_frame
+    monkeypatch.setattr(app, "build_answer_frame", lambda storage: builds.append(storage) or original(storage))
+
+    storage.add_user("bob", {"password_hash": "", "role": "student"})
+    storage.update_question("Quiz", "q1", dict(QUESTION, question="Two plus two?"))
+    analytics.statistics()
+    assert builds == []
+
+    record(storage, "bob", "3")
+    assert len(analytics.statistics()[0]) == 2
+    assert len(builds) == 1
@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+import app
+
+
+def question(text):
+    return {"id": app.new_question_id(), "question": text, "options": ["a", "b"], "correct_option": "a", "explanation": ""}
+
+
+def test_question_edit_copies_only_the_edited_quiz(workspace):
+    storage = app.JsonStorage()
+    storage.create_quiz("One")
+    storage.create_quiz("Two")
+    storage.add_question("One", question("First"))
+    before = storage._questions()
+    one, two = before["One"], before["Two"]
+
+    storage.add_question("One", question("Second"))
+    after = storage._questions()
+    assert after is not before and len(one) == 1 # Readers holding the old data see no change
+    assert len(after["One"]) == 2
+    assert after["Two"] is two # Untouched quizzes are shared, not copied
+    assert after["One"][0] is one[0]
+
+
+def test_manifest_edit_leaves_the_shared_entries_alone(workspace):
+    os.makedirs(app.QUESTIONS_DIR)
+    storage = app.ShardedJsonStorage()
+    storage.create_quiz("One")
+    storage.create_quiz("Two")
+    entries = storage._manifest()["quizzes"]
+
+    storage.add_question("One", question("First"))
+    assert [entry["question_count"] for entry in entries] == [0, 0]
+    assert storage.question_counts() == {"One": 1, "Two": 0}
+    assert storage._manifest()["quizzes"][1] is entries[1]
+
+
+def test_failed_save_publishes_nothing(workspace, monkeypatch):
+    storage = app.JsonStorage()
+    users = storage.get_users()
+
+    def failing(*args, **kwargs):
+        raise OSError("No space left on device")
+    monkeypatch.setattr(app, "write_json_atomic", failing)
+    with pytest.raises(OSError):
+        storage.add_user("alice", {"password": "", "role": "student"})
+    assert "alice" not in users and "alice" not in storage.get_users()
+
+
+def test_append_jsonl_starts_after_a_torn_record(workspace):
+    with open("log.jsonl", "w") as f:
+        f.write('{"n": 1}\n{"n": 2, "tor')
+    app.append_jsonl("log.jsonl", [{"n": 3}, {"n": 4}])
+    with open("log.jsonl") as f:
+        assert f.read().splitlines()[2:] == ['{"n":3}', '{"n":4}']
+
+
+def test_failed_atomic_write_keeps_the_old_file(workspace):
+    app.write_json_atomic("data.json", {"old": True})
+
+    def failing_write(f):
+        f.write("partial")
+        raise OSError("No space left on device")
+    with pytest.raises(OSError):
+        app.write_file_atomic("data.json", failing_write)
+    assert app.load_json_file("data.json") == {"old": True}
+    assert os.listdir(workspace) == ["data.json"] # No temp file left behind
@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def storage(workspace, monkeypatch):
+    monkeypatch.setattr(app, "PROGRESS_WRITE_BEHIND", False)
+    storage = app.JsonStorage()
+    for username in ("alice", "bob", "carol"):
+        storage.add_user(username, {"password_hash": "", "role": "student"})
+    storage.create_quiz("One")
+    storage.create_quiz("Two")
+    return storage
+
+
+def record(storage, username, quiz_id, score, total=4):
+    storage.record_attempt(username, quiz_id, {"attempt_id": app.new_attempt_id(), "score": score, "total": total, "answers_log": []})
+
+
+def ranking(leaderboards, board=app.LEADERBOARD_OVERALL):
+    return [(row["rank"], row["username"], row["score"]) for row in leaderboards.top(board)[0]]
+
+
+def test_tied_students_share_a_rank(storage):
+    leaderboards = app.Leaderboards(storage)
+    record(storage, "alice", "One", 3)
+    record(storage, "bob", "One", 3)
+    record(storage, "carol", "One", 1)
+    assert ranking(leaderboards, "One") == [(1, "alice", 3), (1, "bob", 3), (3, "carol", 1)]
+    assert leaderboards.top("One", limit=1) == ([{"rank": 1, "username": "alice", "score": 3, "total": 4}], 1) # bob is tied at the cut-off
+    assert leaderboards.standing("bob", "One") == {"rank": 1, "username": "bob", "score": 3, "total": 4, "of": 3}
+
+
+def test_retake_keeps_the_best_result(storage):
+    leaderboards = app.Leaderboards(storage)
+    record(storage, "alice", "One", 3)
+    record(storage, "bob", "One", 2)
+    record(storage, "alice", "One", 1) # A worse retake
+    assert ranking(leaderboards, "One") == [(1, "alice", 3), (2, "bob", 2)]
+    record(storage, "bob", "One", 4)
+    assert ranking(leaderboards, "One") == [(1, "bob", 4), (2, "alice", 3)]
+    assert ranking(app.Leaderboards(storage), "One") == ranking(leaderboards, "One") # A rebuild agrees
+
+
+def test_deleted_users_and_quizzes_leave_the_boards(storage):
+    leaderboards = app.Leaderboards(storage)
+    record(storage, "alice", "One", 3)
+    record(storage, "alice", "Two", 2)
+    record(storage, "bob", "One", 4)
+    record(storage, "carol", "Two", 4)
+    assert ranking(leaderboards) == [(1, "alice", 5), (2, "bob", 4), (2, "carol", 4)]
+
+    storage.delete_user("bob")
+    assert ranking(leaderboards, "One") == [(1, "alice", 3)]
+    assert leaderboards.standing("bob") is None
+    storage.delete_quiz("Two")
+    assert leaderboards.boards() == ["One"]
+    assert ranking(leaderboards) == [(1, "alice", 3)] # carol has no quiz left to rank her
+    assert leaderboards.standing("carol") is None
+
+
+def test_ranked_board_matches_a_sorted_list(monkeypatch):
+    monkeypatch.setattr(app, "LEADERBOARD_CHUNK_ENTRIES", 3) # Small chunks, so they split and empty
+    rng = random.Random(7)
+    expected = sorted((-rng.randrange(10), f"user{n}") for n in range(20))
+    board = app._RankedBoard(list(expected))
+    for _ in range(500):
+        if expected and rng.random() < 0.5:
+            entry = expected.pop(rng.randrange(len(expected)))
+            board.remove(entry)
+        else:
+            entry = (-rng.randrange(10), f"user{rng.randrange(1000)}")
+            if entry in expected:
+                continue
+            expected.append(entry)
+            expected.sort()
+            board.add(entry)
+        key = (-rng.randrange(10),)
+        assert len(board) == len(expected)
+        assert board.bisect_left(key) == sum(entry < key for entry in expected)
+    assert board.head(len(expected) + 1) == expected
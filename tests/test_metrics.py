@@ -0,0 +1,30 @@
+import errno
+import os
+
+import app
+
+
+def test_stages_are_exported_in_the_background(workspace, monkeypatch):
+    monkeypatch.setattr(app, "METRICS_EXPORT_SECONDS", 0.01)
+    monkeypatch.setattr(app, "METRICS_ENABLED", True)
+    metrics = app.get_metrics()
+    with app.measure("stage"):
+        app.count_io(written_bytes=10)
+    metrics.close()
+    with open(app.METRICS_FILE) as f:
+        assert 'nai_stage_written_bytes_total{stage="stage"} 10' in f.read()
+
+
+def test_failed_export_never_raises_into_the_measured_stage(workspace, monkeypatch):
+    def full_disk(*args):
+        raise OSError(errno.ENOSPC, "No space left on device")
+    monkeypatch.setattr(app.os, "replace", full_disk)
+    monkeypatch.setattr(app, "METRICS_EXPORT_SECONDS", 0.01)
+    monkeypatch.setattr(app, "METRICS_ENABLED", True)
+    metrics = app.get_metrics()
+    with app.measure("stage"):
+        pass
+    metrics.close()
+    assert metrics.snapshot()["stage"]["count"] == 1
+    assert metrics.export() is False
+    assert os.listdir(workspace) == [] # The temp file was removed
@@ -0,0 +1,28 @@
+import pytest
+
+import app
+
+
+@pytest.mark.parametrize("scheme", ["scrypt", "pbkdf2_sha256"])
+def test_round_trip(scheme):
+    password_hash = app.hash_password("Password@123", scheme=scheme)
+    assert app.check_password_hash("Password@123", password_hash)
+    assert not app.check_password_hash("password@123", password_hash)
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda h: h[:len(h) // 2], # Truncated
+    lambda h: h.rsplit("$", 1)[0], # Missing the hash field
+    lambda h: h[:-3] + "!!!", # Not base64
+    lambda h: h.replace("$", "$x", 1), # Non-numeric cost
+    lambda h: "",
+])
+@pytest.mark.parametrize("scheme", ["scrypt", "pbkdf2_sha256"])
+def test_corrupted_hash_never_matches(scheme, corrupt):
+    password_hash = corrupt(app.hash_password("Password@123", scheme=scheme))
+    assert app.check_password_hash("Password@123", password_hash) is False
+
+
+def test_corrupted_hash_fails_login_without_raising():
+    user = {"password_hash": "scrypt$16384$8", "role": "student"}
+    assert app.verify_password("Password@123", user) is False
@@ -0,0 +1,23 @@
+import app
+
+
+def test_parquet_is_offered_only_with_pyarrow(monkeypatch):
+    monkeypatch.setattr(app.importlib.util, "find_spec", lambda name: None)
+    assert app.available_export_formats() == ["CSV", "CSV (gzip)"]
+    monkeypatch.setattr(app.importlib.util, "find_spec", lambda name: object())
+    assert app.available_export_formats() == ["CSV", "CSV (gzip)", "Parquet"]
+
+
+def test_detail_export_covers_every_attempt(workspace, monkeypatch):
+    monkeypatch.setattr(app, "PROGRESS_WRITE_BEHIND", False)
+    storage = app.JsonStorage()
+    storage.add_user("alice", {"password_hash": "", "role": "student"})
+    storage.create_quiz("Quiz")
+    storage.add_question("Quiz", {"id": "q1", "question": "Q1?", "options": ["a", "b"], "correct_option": "a", "explanation": "", "topic": ""})
+    first, second = app.new_attempt_id(), app.new_attempt_id()
+    storage.record_attempt("alice", "Quiz", {"attempt_id": first, "score": 0, "total": 1, "answers_log": [{"q": "q1", "a": 1, "c": 0}]})
+    storage.record_attempt("alice", "Quiz", {"attempt_id": second, "score": 1, "total": 1, "answers_log": [{"q": "q1", "a": 0, "c": 1}]})
+
+    rows = list(app.iter_detail_export_rows(storage))
+    assert [(row[2], row[6], row[8]) for row in rows] == [(first, "b", False), (second, "a", True)]
+    assert all(len(row) == len(app.DETAIL_EXPORT_COLUMNS) for row in rows)
@@ -0,0 +1,48 @@
+import pytest
+
+import app
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def storage(request, workspace):
+    if request.param == "sqlite":
+        return app.SqliteStorage(str(workspace / "nai.sqlite3"))
+    return app.JsonStorage()
+
+
+def add_students(storage, *usernames):
+    for username in usernames:
+        storage.add_user(username, {"password": "", "role": "student"})
+
+
+def record(storage, username, quiz_id, score, total):
+    storage.record_attempt(username, quiz_id, {"attempt_id": app.new_attempt_id(), "score": score, "total": total, "answers_log": []})
+
+
+def test_summary_is_built_from_the_performance_rows(storage):
+    add_students(storage, "alice", "bob", "carol")
+    storage.create_quiz("Quiz")
+    record(storage, "alice", "Quiz", 1, 2)
+    record(storage, "carol", "Quiz", 2, 2)
+
+    summary = app.PerformanceSummary(storage)
+    overview = summary.overview()
+    assert (overview["students"], overview["attempted"], overview["not_attempted"]) == (3, 2, 1) # The admin is not a student
+    assert overview["accuracy"] == pytest.approx(75.0)
+    assert summary.not_attempted_usernames() == ["bob"]
+    assert sorted(summary.iter_attempted_rows()) == [("alice", "Quiz", 1, 2), ("carol", "Quiz", 2, 2)]
+
+
+def test_summary_follows_attempts_and_user_changes(storage):
+    add_students(storage, "alice")
+    storage.create_quiz("Quiz")
+    summary = app.PerformanceSummary(storage)
+    assert summary.overview()["attempted"] == 0
+
+    add_students(storage, "bob")
+    storage.add_user("root", {"password": "", "role": "admin"})
+    record(storage, "bob", "Quiz", 1, 2)
+    record(storage, "bob", "Quiz", 2, 2) # The latest result counts
+    assert list(summary.iter_attempted_rows()) == [("bob", "Quiz", 2, 2)]
+    storage.delete_quiz("Quiz")
+    assert (summary.overview()["students"], summary.overview()["attempted"]) == (2, 0)
@@ -0,0 +1,79 @@
+import concurrent.futures
+import errno
+import threading
+
+import pytest
+
+import app
+
+
+def attempt(attempt_id, score):
+    return {"attempt_id": attempt_id, "score": score, "total": 2, "answers_log": []}
+
+
+def fail_once(monkeypatch, name):
+    """Makes app.<name> raise ENOSPC on its next call only."""
+    original = getattr(app, name)
+    calls = []
+
+    def failing(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise OSError(errno.ENOSPC, "No space left on device")
+        return original(*args, **kwargs)
+    monkeypatch.setattr(app, name, failing)
+
+
+@pytest.mark.parametrize("write_behind", [False, True])
+@pytest.mark.parametrize("persistence, failing_write", [
+    ("journal", "append_progress_journal"),
+    ("journal", "append_attempt_history"),
+    ("snapshot", "write_json_atomic"),
+])
+def test_failed_flush_is_not_committed_and_retry_persists(workspace, monkeypatch, write_behind, persistence, failing_write):
+    monkeypatch.setattr(app, "PROGRESS_WRITE_BEHIND", write_behind)
+    monkeypatch.setattr(app, "PROGRESS_PERSISTENCE", persistence)
+    storage = app.JsonStorage()
+    storage.ensure_user_progress("alice")
+    fail_once(monkeypatch, failing_write)
+
+    with pytest.raises(OSError):
+        storage.record_attempt("alice", "Quiz", attempt("A1", 1))
+    assert "Quiz" not in storage.get_user_progress("alice") # Nothing half-committed is visible
+
+    storage.record_attempt("alice", "Quiz", attempt("A1", 1)) # The session's retry
+    assert storage.get_user_progress("alice")["Quiz"]["attempt_id"] == "A1"
+    from_disk = app.load_user_progress()["alice"]["Quiz"]
+    assert (from_disk["attempt_id"], from_disk["attempts"], from_disk["score"]) == ("A1", 1, 1)
+    assert [entry["attempt_id"] for entry in storage.attempt_history("alice", "Quiz")] == ["A1"]
+
+
+def test_journal_append_after_a_torn_record_keeps_later_records(workspace, monkeypatch):
+    monkeypatch.setattr(app, "PROGRESS_WRITE_BEHIND", False)
+    storage = app.JsonStorage()
+    storage.record_attempt("alice", "Quiz", attempt("A1", 1))
+    with open(app.USER_PROGRESS_JOURNAL, "a") as journal:
+        journal.write('{"op":"record_attempt","att') # A write cut short, e.g. by a full disk
+    storage.record_attempt("alice", "Quiz", attempt("A2", 2))
+    from_disk = app.load_user_progress()["alice"]["Quiz"]
+    assert (from_disk["attempt_id"], from_disk["attempts"]) == ("A2", 2)
+
+
+def test_timed_out_commit_lands_later_and_the_retry_adds_nothing(workspace, monkeypatch):
+    monkeypatch.setattr(app, "PROGRESS_WRITE_BEHIND", True)
+    storage = app.JsonStorage()
+    storage.ensure_user_progress("alice")
+    monkeypatch.setattr(app, "PROGRESS_WRITE_TIMEOUT_SECONDS", 0.05)
+    slow_disk = threading.Event()
+    original = app.persist_progress_changes
+    monkeypatch.setattr(app, "persist_progress_changes", lambda changes: slow_disk.wait() and original(changes))
+
+    with pytest.raises(concurrent.futures.TimeoutError):
+        storage.record_attempt("alice", "Quiz", attempt("A1", 1))
+    monkeypatch.setattr(app, "PROGRESS_WRITE_TIMEOUT_SECONDS", 30)
+    slow_disk.set()
+    app.get_progress_writer().close() # Waits for the delayed flush
+    assert app.load_user_progress()["alice"]["Quiz"]["attempt_id"] == "A1" # It landed after the timeout
+    storage.record_attempt("alice", "Quiz", attempt("A1", 1)) # The session's retry
+    assert storage.get_user_progress("alice")["Quiz"]["attempts"] == 1
+    assert [entry["attempt_id"] for entry in storage.attempt_history("alice", "Quiz")] == ["A1"]
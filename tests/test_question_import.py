@@ -0,0 +1,58 @@
+import io
+
+import app
+
+
+def parse(text, file_format):
+    return app.prepare_question_import(app.iter_question_file_rows(io.BytesIO(text.encode("utf-8")), file_format))
+
+
+def test_csv_rows_are_validated_one_by_one():
+    questions, errors = parse(
+        "question,option_1,option_2,option_3,correct_option,explanation\n"
+        "What is RBAC?,Roles,Colours,,Roles,Access by role\n"
+        "Missing explanation?,Yes,No,,Yes,\n"
+        "Wrong answer?,Yes,No,,Maybe,Not an option\n",
+        "CSV",
+    )
+    assert [(q["question"], q["options"]) for q in questions] == [("What is RBAC?", ["Roles", "Colours"])] # Blank options are dropped
+    assert [row for row, _ in errors] == [3, 4]
+    assert "mandatory" in errors[0][1] and "must be one of" in errors[1][1]
+
+
+def test_jsonl_reports_bad_lines_and_skips_blank_ones():
+    questions, errors = parse(
+        '{"question": "Q1?", "options": ["a", "b"], "correct_option": "a", "explanation": "E"}\n'
+        "\n"
+        "{not json\n"
+        '{"question": "Q2?", "options": "a", "correct_option": "a", "explanation": "E"}\n'
+        '["a list"]\n',
+        "JSONL",
+    )
+    assert [q["question"] for q in questions] == ["Q1?"]
+    assert [row for row, _ in errors] == [3, 4, 5]
+    assert errors[0][1].startswith("Invalid JSON")
+
+
+def test_imported_questions_get_fresh_ids():
+    line = '{"id": "keep-me", "question": "Q?", "options": ["a"], "correct_option": "a", "explanation": "E"}\n'
+    questions, _ = parse(line * 2, "JSONL")
+    assert len({q["id"] for q in questions}) == 2 and "keep-me" not in {q["id"] for q in questions}
+
+
+def test_non_utf8_upload_is_an_error():
+    rows = list(app.iter_question_file_rows(io.BytesIO("question\n\xe9t\xe9\n".encode("latin-1")), "CSV"))
+    assert rows[-1] == (0, None, "The file is not UTF-8 encoded text.")
+
+
+def test_export_round_trips_through_import():
+    exported = [
+        {"id": "q1", "question": "Q1?", "options": ["a", "b", "c"], "correct_option": "c", "explanation": "E1"},
+        {"id": "q2", "question": "Q2, with a comma?", "options": ["x", "y"], "correct_option": "x", "explanation": "E2"},
+    ]
+    for file_format in ("CSV", "JSONL"):
+        export_file = io.BytesIO()
+        app.write_question_export(exported, file_format, export_file)
+        questions, errors = parse(export_file.getvalue().decode("utf-8"), file_format)
+        assert errors == []
+        assert [(q["question"], q["options"], q["correct_option"]) for q in questions] == [(q["question"], q["options"], q["correct_option"]) for q in exported]
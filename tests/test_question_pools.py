@@ -0,0 +1,50 @@
+import collections
+
+import pytest
+
+import app
+
+
+def pool(**topic_sizes):
+    return app.QuestionPool((f"{topic}{n}", topic) for topic, size in topic_sizes.items() for n in range(size))
+
+
+def test_same_seed_draws_the_same_questions():
+    questions = pool(iam=6, grc=3, basis=1)
+    seed = app.attempt_seed("alice", "Quiz", "a1")
+    assert questions.draw(5, seed, stratify=True) == questions.draw(5, seed, stratify=True)
+    assert questions.draw(5, seed) == questions.draw(5, seed)
+    draws = {tuple(questions.draw(5, app.attempt_seed("alice", "Quiz", f"a{n}"), stratify=True)) for n in range(20)}
+    assert len(draws) > 1 # Other attempts draw other questions
+    assert app.attempt_seed("alice", "Quiz", "a1") != app.attempt_seed("bob", "Quiz", "a1")
+
+
+@pytest.mark.parametrize("count, expected", [
+    (5, {"iam": 3, "basis": 1, "grc": 1}), # Shares 3, 1.5 and 0.5: the tied remainders go by topic name
+    (8, {"iam": 5, "grc": 2, "basis": 1}),
+])
+def test_stratified_draw_keeps_each_topics_share(count, expected):
+    questions = pool(iam=6, grc=3, basis=1)
+    for n in range(10):
+        drawn = questions.draw(count, n, stratify=True)
+        assert len(set(drawn)) == count
+        assert collections.Counter(question_id.rstrip("0123456789") for question_id in drawn) == expected
+
+
+def test_unset_or_large_count_keeps_the_stored_order():
+    questions = pool(iam=2, grc=2)
+    assert questions.draw(None, 1) == questions.draw(10, 2, stratify=True) == ["iam0", "iam1", "grc0", "grc1"]
+
+
+def test_attempt_draw_follows_the_quiz_settings(workspace):
+    storage = app.JsonStorage()
+    storage.create_quiz("Quiz")
+    storage.add_questions("Quiz", [
+        {"id": f"q{n}", "question": f"Q{n}?", "options": ["a", "b"], "correct_option": "a", "explanation": "", "topic": "iam" if n < 4 else "grc"}
+        for n in range(6)
+    ])
+    storage.update_quiz_settings("Quiz", {"draw_count": 3, "stratify_by_topic": True})
+
+    drawn = app.draw_quiz_questions(storage, "Quiz", "alice", "a1")
+    assert [q["id"] for q in drawn] == [q["id"] for q in app.draw_quiz_questions(storage, "Quiz", "alice", "a1")]
+    assert sorted(q["topic"] for q in drawn) == ["grc", "iam", "iam"]
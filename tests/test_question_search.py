@@ -0,0 +1,54 @@
+import app
+
+
+def question(question_id, text, topic=""):
+    return {"id": question_id, "question": text, "options": ["Yes", "No"], "correct_option": "Yes", "explanation": "", "topic": topic}
+
+
+def build(storage):
+    storage.create_quiz("Security")
+    storage.create_quiz("Basis")
+    storage.add_questions("Security", [
+        question("s1", "Which role grants user administration?", "authorization"),
+        question("s2", "Who maintains role assignments?"),
+        question("s3", "What does the audit log record?"),
+    ])
+    storage.add_questions("Basis", [question("b1", "Which transaction administers users?")])
+    return app.QuestionSearch(storage)
+
+
+def ids(result):
+    hits, total = result
+    assert total == len(hits)
+    return [(hit["quiz_id"], hit["question_id"]) for hit in hits]
+
+
+def test_terms_match_as_prefixes_and_are_anded(workspace):
+    search = build(app.JsonStorage())
+    assert ids(search.search("role")) == [("Security", "s1"), ("Security", "s2")]
+    assert ids(search.search("admin")) == [("Security", "s1"), ("Basis", "b1")] # administration, administers
+    assert ids(search.search("ADMIN user")) == [("Security", "s1"), ("Basis", "b1")]
+    assert ids(search.search("admin role")) == [("Security", "s1")]
+    assert ids(search.search("authoriz")) == [("Security", "s1")] # Topics are indexed too
+    assert ids(search.search("role audit")) == []
+    assert search.search("  ?! ") == ([], 0)
+
+
+def test_results_are_limited_but_counted(workspace):
+    search = build(app.JsonStorage())
+    hits, total = search.search("yes", limit=2) # Every question has the option
+    assert total == 4 and [hit["question_id"] for hit in hits] == ["s1", "s2"]
+
+
+def test_index_follows_question_edits(workspace):
+    storage = app.JsonStorage()
+    search = build(storage)
+    assert ids(search.search("audit")) == [("Security", "s3")]
+    storage.update_question("Security", "s3", question("s3", "What does the change log record?"))
+    storage.add_question("Basis", question("b2", "Where is the audit trail kept?"))
+    assert ids(search.search("audit")) == [("Basis", "b2")]
+    assert ids(search.search("change")) == [("Security", "s3")]
+    storage.delete_question("Basis", "b2")
+    storage.delete_quiz("Security")
+    assert search.search("audit") == ([], 0) and search.search("role") == ([], 0)
+    assert "audit" not in search._vocabulary # Emptied terms leave the sorted vocabulary
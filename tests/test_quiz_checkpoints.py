@@ -0,0 +1,56 @@
+import os
+import time
+
+import app
+
+
+def answer(question_id, correct):
+    return {"q": question_id, "a": 0, "c": int(correct)}
+
+
+def test_checkpoint_resumes_answers_in_order(workspace):
+    checkpoints = app.QuizCheckpoints(app.CHECKPOINTS_DIR)
+    checkpoints.record_answer("alice", "a1", "Quiz", ["q1", "q2", "q3"], answer("q1", True))
+    checkpoints.record_answer("alice", "a1", "Quiz", ["q1", "q2", "q3"], answer("q2", False))
+
+    header, answers = checkpoints.load("alice", "a1")
+    assert (header["attempt_id"], header["quiz_id"], header["question_ids"]) == ("a1", "Quiz", ["q1", "q2", "q3"])
+    assert answers == [answer("q1", True), answer("q2", False)]
+    assert [(c["attempt_id"], c["answered"], c["total"]) for c in checkpoints.in_progress("alice")] == [("a1", 2, 3)]
+    assert checkpoints.in_progress("bob") == [] and checkpoints.load("bob", "a1") == (None, [])
+
+
+def test_torn_final_answer_is_dropped_on_resume(workspace):
+    checkpoints = app.QuizCheckpoints(app.CHECKPOINTS_DIR)
+    checkpoints.record_answer("alice", "a1", "Quiz", ["q1", "q2"], answer("q1", True))
+    with open(checkpoints._path("alice", "a1"), "a") as f:
+        f.write('{"q": "q2", "a"') # Interrupted append
+    assert checkpoints.load("alice", "a1")[1] == [answer("q1", True)]
+
+
+def test_discard_and_user_deletion_remove_checkpoints(workspace):
+    checkpoints = app.QuizCheckpoints(app.CHECKPOINTS_DIR)
+    checkpoints.record_answer("alice", "a1", "Quiz", ["q1"], answer("q1", True))
+    checkpoints.record_answer("alice", "a2", "Quiz", ["q1"], answer("q1", False))
+    checkpoints.discard("alice", "a1")
+    checkpoints.discard("alice", "a1") # Already gone: not an error
+    assert [c["attempt_id"] for c in checkpoints.in_progress("alice")] == ["a2"]
+
+    checkpoints.storage_changed("user_deleted", username="alice")
+    assert not os.path.exists(checkpoints._user_dir("alice"))
+
+
+def test_gc_removes_only_expired_checkpoints(workspace):
+    checkpoints = app.QuizCheckpoints(app.CHECKPOINTS_DIR)
+    checkpoints.record_answer("alice", "old", "Quiz", ["q1"], answer("q1", True))
+    checkpoints.record_answer("alice", "new", "Quiz", ["q1"], answer("q1", True))
+    checkpoints.record_answer("bob", "old", "Quiz", ["q1"], answer("q1", True))
+    expired = time.time() - app.CHECKPOINT_TTL_SECONDS - 60
+    for username in ("alice", "bob"):
+        os.utime(checkpoints._path(username, "old"), (expired, expired))
+
+    assert [c["attempt_id"] for c in checkpoints.in_progress("alice")] == ["new"] # Expired ones are not offered
+    assert checkpoints.collect_garbage() == 2
+    assert checkpoints.collect_garbage() == 0 # Throttled to once per CHECKPOINT_GC_INTERVAL_SECONDS
+    assert os.listdir(checkpoints._user_dir("alice")) == ["new.jsonl"]
+    assert not os.path.exists(checkpoints._user_dir("bob")) # Emptied user directories are removed
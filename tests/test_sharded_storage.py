@@ -0,0 +1,41 @@
+import os
+
+import app
+
+
+def question(text):
+    return {"id": app.new_question_id(), "question": text, "options": ["a", "b"], "correct_option": "a", "explanation": "", "topic": ""}
+
+
+def sharded_storage(workspace, quiz_ids):
+    os.makedirs(app.QUESTIONS_DIR)
+    storage = app.ShardedJsonStorage()
+    for quiz_id in quiz_ids:
+        storage.create_quiz(quiz_id)
+    return storage
+
+
+def test_question_generation_reads_no_unloaded_shard(workspace, monkeypatch):
+    storage = sharded_storage(workspace, ["One", "Two"])
+    app.get_data_store.clear() # As after a restart: nothing cached yet
+    loads = []
+    original = app.load_json_file
+    monkeypatch.setattr(app, "load_json_file", lambda filepath, *args: loads.append(filepath) or original(filepath, *args))
+
+    token = storage.question_generation()
+    assert loads == [app.QUESTIONS_MANIFEST]
+    storage.get_questions("One") # Loading a shard for the first time is not a change
+    assert storage.question_generation() == token
+
+
+def test_question_generation_changes_on_another_process_edit(workspace, monkeypatch):
+    monkeypatch.setattr(app, "DATA_REVALIDATE_SECONDS", 0)
+    storage = sharded_storage(workspace, ["One", "Two"])
+    storage.get_questions("One")
+    token = storage.question_generation()
+
+    with monkeypatch.context() as other_process: # Same files, its own cache
+        other_process.setattr(app, "get_data_store", lambda store=app.SharedDataStore(): store)
+        app.ShardedJsonStorage().add_questions("Two", [question("Edited elsewhere")])
+    assert storage.question_generation() != token
+    assert storage.question_counts()["Two"] == 1
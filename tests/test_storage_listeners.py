@@ -0,0 +1,26 @@
+import app
+
+
+QUESTION = {"id": "q1", "question": "What does RBAC restrict?", "options": ["Access", "Colour"], "correct_option": "Access", "explanation": "", "topic": ""}
+
+
+def test_views_follow_events_after_their_first_read(workspace, monkeypatch):
+    monkeypatch.setattr(app, "PROGRESS_WRITE_BEHIND", False)
+    storage = app.JsonStorage()
+    storage.create_quiz("Quiz")
+    storage.add_user("alice", {"password_hash": app.hash_password("pw"), "role": "student"})
+    search = app.QuestionSearch(storage)
+    summary = app.PerformanceSummary(storage)
+    assert search.search("rbac") == ([], 0)
+    assert summary.overview()["attempted"] == 0
+
+    rebuilds = []
+    monkeypatch.setattr(app.QuestionSearch, "_rebuild", lambda self: rebuilds.append(self))
+    monkeypatch.setattr(app.PerformanceSummary, "_rebuild", lambda self: rebuilds.append(self))
+    storage.add_questions("Quiz", [QUESTION])
+    storage.add_user("bob", {"password_hash": app.hash_password("pw"), "role": "student"})
+    storage.record_attempt("alice", "Quiz", {"attempt_id": app.new_attempt_id(), "score": 1, "total": 1, "answers_log": []})
+
+    assert search.search("rbac")[1] == 1
+    assert (summary.overview()["students"], summary.overview()["attempted"]) == (2, 1)
+    assert rebuilds == [] # Kept current by the events alone
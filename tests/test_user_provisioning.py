@@ -0,0 +1,46 @@
+import io
+
+import app
+
+
+def rows(text):
+    return list(app.iter_user_file_rows(io.BytesIO(text.encode("utf-8"))))
+
+
+def test_user_import_rejects_bad_and_duplicate_rows():
+    records, errors, generated = app.prepare_user_import(rows(
+        "User_ID,Password,Role\n"
+        "alice,secret,student\n"
+        "bob,,ADMIN\n"
+        ",pw,student\n"
+        "alice,other,student\n"
+        "root,pw,student\n"
+        "carol,pw,teacher\n"
+    ), existing_usernames={"root"})
+    assert {username: record["role"] for username, record in records.items()} == {"alice": "student", "bob": "admin"}
+    assert [username for username, _ in generated] == ["bob"] # Rows without a password get a generated one
+    assert [(row, message.split(" ")[0]) for row, message in errors] == [(4, "Missing"), (5, "User"), (6, "User"), (7, "Unknown")]
+    assert "more than once" in errors[1][1] and "already exists" in errors[2][1]
+
+
+def test_bulk_delete_never_removes_an_admin():
+    users = {"root": {"role": "admin"}, "boss": {"role": "admin"}, "alice": {"role": "student"}, "bob": {"role": "student"}}
+    usernames, errors = app.prepare_user_deletion(rows(
+        "username\nalice\nroot\nboss\nghost\nalice\nbob\n"
+    ), users, current_username="root")
+    assert usernames == ["alice", "bob"] # Duplicates are ignored
+    assert [row for row, _ in errors] == [3, 4, 5]
+    assert all("can't be deleted" in message for _, message in errors[:2])
+
+
+def test_bulk_changes_are_applied_in_one_call(workspace):
+    storage = app.JsonStorage()
+    records, _, _ = app.prepare_user_import(rows("username\nalice\nbob\n"), storage.get_users())
+    storage.add_users(records)
+    assert {"alice", "bob"} <= set(storage.get_users())
+    assert storage.get_user_progress("alice") == {}
+
+    usernames, errors = app.prepare_user_deletion(rows("username\nalice\nadmin\n"), storage.get_users(), current_username="admin")
+    storage.delete_users(usernames)
+    assert set(storage.get_users()) == {"admin", "bob"}
+    assert len(errors) == 1